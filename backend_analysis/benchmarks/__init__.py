@@ -0,0 +1 @@
+# Benchmarks chạy offline, không cần DB hay API key
@@ -0,0 +1,177 @@
+"""
+Chỉ mục bài gần trùng (services/dedup.py): thời gian tính chữ ký MinHash, thời gian tra cứu khi
+chỉ mục đầy (--window bài), bộ nhớ mỗi bài, và tỉ lệ phát hiện theo mức chỉnh sửa giữa các bản
+đăng lại của cùng một tin (thay sapo, thay một phần từ, bỏ/thêm đoạn) so với độ tương đồng Jaccard thật.
+
+Nội dung bài lấy từ trang giả lập của benchmarks/bench_extractors.py, hoặc từ DB (--from-db,
+cần DATABASE_URL) để xem số nhóm trên dữ liệu thật. Chạy từ thư mục backend_analysis:
+
+    python -m benchmarks.bench_dedup --window 20000 --similarity 0.6 0.7 0.8
+    python -m benchmarks.bench_dedup --from-db 5000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from typing import List
+
+from benchmarks.bench_extractors import SYLLABLES, paragraph, sentence, synthetic_article
+from services.analysis_cache import normalize_text
+from services.dedup import DEFAULT_DEDUP_CONFIG, DuplicateIndex, _WORDS
+
+SITES = ["Dan Tri", "VnExpress", "VietnamNet"]
+# Mức chỉnh sửa của bản đăng lại: (tên, tỉ lệ từ bị thay, số đoạn bỏ đi, số đoạn thêm vào)
+EDITS = [
+    ("chỉ thay sapo", 0.0, 0, 0),
+    ("thay 2% từ", 0.02, 0, 1),
+    ("thay 5% từ, bỏ 1 đoạn", 0.05, 1, 1),
+    ("thay 10% từ, bỏ 2 đoạn", 0.10, 2, 1),
+    ("thay 20% từ", 0.20, 1, 1),
+    ("viết lại 40%", 0.40, 2, 2),
+]
+
+
+def story(rng: random.Random) -> str:
+    return synthetic_article(rng, rng.choice(SITES))[2]
+
+
+def rewrite(rng: random.Random, text: str, replace: float, drop: int, add: int) -> str:
+    """Bản đăng lại ở báo khác: sapo mới, thay một phần từ, bỏ/thêm đoạn."""
+    paragraphs = text.split("\n\n")[1:]
+    for _ in range(min(drop, len(paragraphs) - 1)):
+        paragraphs.pop(rng.randrange(len(paragraphs)))
+    for _ in range(add):
+        paragraphs.insert(rng.randrange(len(paragraphs) + 1), paragraph(rng))
+    edited = []
+    for p in paragraphs:
+        words = p.split(" ")
+        edited.append(" ".join(rng.choice(SYLLABLES) if rng.random() < replace else w for w in words))
+    return "\n\n".join([sentence(rng, 30)] + edited)
+
+
+def shingles(text: str, size: int) -> set:
+    words = _WORDS.findall(normalize_text(text))
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: str, b: str, size: int) -> float:
+    x, y = shingles(a, size), shingles(b, size)
+    return len(x & y) / max(len(x | y), 1)
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def load_texts(limit: int) -> List[str]:
+    from db.database import SessionLocal
+    from db.models import CrawledData
+    from services.content import stored_text
+    from services.extractors import ExtractorRegistry
+    from services.settings import load_config
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(CrawledData.url, CrawledData.contents).filter(CrawledData.contents.isnot(None))
+            .order_by(CrawledData.id).limit(limit).all()
+        )
+    finally:
+        db.close()
+    extractors = ExtractorRegistry.from_websites(load_config().get("websites", []))
+    return [text for text in (stored_text(row.url, row.contents, extractors) for row in rows) if text]
+
+
+def from_db(args):
+    texts = load_texts(args.from_db)
+    for threshold in args.similarity:
+        index = DuplicateIndex(window_days=3650, max_entries=len(texts) + 1, shingle_size=args.shingle_size,
+                               similarity=threshold, min_shingles=args.min_shingles)
+        clusters, skipped = set(), 0
+        for article_id, text in enumerate(texts):
+            signature = index.signature(text)
+            if signature is None:
+                skipped += 1
+                continue
+            match = index.lookup(signature)
+            cluster_id = match.cluster_id if match else article_id
+            index.add(article_id, cluster_id, signature)
+            clusters.add(cluster_id)
+        indexed = len(texts) - skipped
+        print(f"similarity {threshold:.2f}: {len(texts)} bài, {skipped} quá ngắn, {len(clusters)} nhóm "
+              f"({1 - len(clusters) / max(indexed, 1):.0%} bài dùng lại được kết quả)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--window", type=int, default=5000, help="số bài trong chỉ mục khi đo tra cứu và bộ nhớ")
+    parser.add_argument("--stories", type=int, default=300, help="số tin gốc khi đo tỉ lệ phát hiện")
+    parser.add_argument("--similarity", type=float, nargs="+", default=[DEFAULT_DEDUP_CONFIG["similarity"]])
+    parser.add_argument("--shingle-size", type=int, default=DEFAULT_DEDUP_CONFIG["shingle_size"])
+    parser.add_argument("--min-shingles", type=int, default=DEFAULT_DEDUP_CONFIG["min_shingles"])
+    parser.add_argument("--from-db", type=int, default=0, help="gom nhóm N bài đầu tiên trong DB thay vì dữ liệu giả lập")
+    args = parser.parse_args()
+    if args.from_db:
+        from_db(args)
+        return
+
+    rng = random.Random(42)
+    texts = [story(rng) for _ in range(args.window)]
+    index = DuplicateIndex(window_days=3650, max_entries=args.window, shingle_size=args.shingle_size,
+                           similarity=args.similarity[0], min_shingles=args.min_shingles)
+    timings = []
+    signatures = []
+    for text in texts:
+        start = time.perf_counter()
+        signatures.append(index.signature(text))
+        timings.append(time.perf_counter() - start)
+    words = sum(len(text.split()) for text in texts) / len(texts)
+    print(f"chữ ký: p50 {percentile(timings, 0.5) * 1000:.2f} ms, p99 {percentile(timings, 0.99) * 1000:.2f} ms "
+          f"(trung bình {words:.0f} âm tiết/bài)")
+
+    tracemalloc.start()
+    for article_id, signature in enumerate(signatures):
+        index.add(article_id, article_id, signature)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"chỉ mục {len(index)} bài: {memory / 2 ** 20:.1f} MiB ({memory / len(index):.0f} byte/bài)")
+
+    probes = [story(rng) for _ in range(500)]
+    hits = [rewrite(rng, text, 0.05, 1, 1) for text in rng.sample(texts, 500)]
+    for name, batch in (("bài mới", probes), ("bản đăng lại", hits)):
+        batch = [signature for signature in map(index.signature, batch) if signature]
+        timings = []
+        for signature in batch:
+            start = time.perf_counter()
+            index.lookup(signature)
+            timings.append(time.perf_counter() - start)
+        print(f"tra cứu {name}: p50 {percentile(timings, 0.5) * 1e6:.0f} µs, p99 {percentile(timings, 0.99) * 1e6:.0f} µs")
+
+    # Tỉ lệ phát hiện: mỗi tin gốc có một bản đăng lại theo từng mức chỉnh sửa; thêm các tin khác hẳn
+    print(f"\n{'mức chỉnh sửa':<26}{'Jaccard thật':>13}" + "".join(f"{'phát hiện @' + format(t, '.2f'):>18}" for t in args.similarity))
+    bases = [story(rng) for _ in range(args.stories)]
+    base_signatures = [index.signature(text) for text in bases]
+    indexes = []
+    for threshold in args.similarity:
+        candidate = DuplicateIndex(window_days=3650, max_entries=args.stories + 1, shingle_size=args.shingle_size,
+                                   similarity=threshold, min_shingles=args.min_shingles)
+        for article_id, signature in enumerate(base_signatures):
+            candidate.add(article_id, article_id, signature)
+        indexes.append(candidate)
+    for name, replace, drop, add in EDITS:
+        variants = [rewrite(rng, text, replace, drop, add) for text in bases]
+        truth = sum(jaccard(a, b, args.shingle_size) for a, b in zip(bases, variants)) / len(bases)
+        signatures = [index.signature(text) for text in variants]
+        rates = []
+        for candidate in indexes:
+            found = sum(1 for i, s in enumerate(signatures) if (match := candidate.lookup(s)) and match.article_id == i)
+            rates.append(found / len(bases))
+        print(f"{name:<26}{truth:>13.2f}" + "".join(f"{rate:>18.0%}" for rate in rates))
+    unrelated = [index.signature(story(rng)) for _ in range(args.stories)]
+    rates = [sum(1 for s in unrelated if candidate.lookup(s)) / len(unrelated) for candidate in indexes]
+    print(f"{'tin khác (dương tính giả)':<26}{0:>13.2f}" + "".join(f"{rate:>18.1%}" for rate in rates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+So sánh extractor theo site (services/extractors.py) với Newspaper3k trên cùng HTML:
+thời gian CPU mỗi bài và chất lượng nội dung (F1 theo từ).
+
+Trang mẫu là các bài báo đã lưu trong một thư mục (manifest.json ánh xạ tên file -> URL).
+--save tải các URL trong file --urls (mỗi dòng một URL) vào thư mục đó trước.
+Với trang đã lưu, F1 được tính so với nội dung chuẩn <tên file>.txt nếu có, không thì so với
+kết quả của Newspaper3k; không có --pages thì dùng
+trang giả lập theo bố cục của Dan Tri, VnExpress, VietnamNet (kèm menu, tin liên quan,
+bình luận, script) và F1 được tính so với nội dung gốc của trang.
+Chạy từ thư mục backend_analysis:
+
+    python -m benchmarks.bench_extractors --save fixtures/articles --urls article_urls.txt
+    python -m benchmarks.bench_extractors --pages fixtures/articles
+    python -m benchmarks.bench_extractors --articles 30
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import List, Optional, Tuple
+
+import requests
+
+from services.extractors import ExtractorRegistry, compiled, decode_html, newspaper_text
+from services.settings import load_config
+
+SYLLABLES = [
+    "người", "dân", "chính", "phủ", "kinh", "tế", "thị", "trường", "giá", "vàng", "tăng", "giảm",
+    "học", "sinh", "bóng", "đá", "đội", "tuyển", "thời", "tiết", "mưa", "bão", "tai", "nạn",
+    "giao", "thông", "bệnh", "viện", "bác", "sĩ", "công", "an", "điều", "tra", "doanh", "nghiệp",
+]
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# (url, html thô, nội dung gốc nếu biết)
+Page = Tuple[str, bytes, Optional[str]]
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(SYLLABLES, k=words)).capitalize() + "."
+
+
+def paragraph(rng: random.Random) -> str:
+    return " ".join(sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(2, 5)))
+
+
+def boilerplate(rng: random.Random, host: str) -> Tuple[str, str]:
+    nav = "".join(f'<li><a href="https://{host}/muc-{i}.htm">{sentence(rng, 2)}</a></li>' for i in range(40))
+    related = "".join(f'<li><a href="https://{host}/tin-{i}.htm">{sentence(rng, 12)}</a></li>' for i in range(15))
+    comments = "".join(f'<div class="comment"><p>{sentence(rng, 25)}</p></div>' for _ in range(10))
+    head = (
+        f'<!DOCTYPE html><html lang="vi"><head><meta charset="utf-8"><title>{sentence(rng, 10)}</title>'
+        f'<script>window.dataLayer = []; var cfg = {{"a": 1}};</script><style>' + ".x{margin:0}" * 300 + "</style></head>"
+        f'<body><header><ul class="menu">{nav}</ul></header>'
+    )
+    tail = (
+        f'<section class="related"><h3>Tin liên quan</h3><ul>{related}</ul></section>'
+        f'<section class="comments">{comments}</section><footer><p>{sentence(rng, 30)}</p></footer></body></html>'
+    )
+    return head, tail
+
+
+def synthetic_article(rng: random.Random, site: str) -> Tuple[str, bytes, str]:
+    """Trang bài báo giả lập theo bố cục của từng site, trả về (url, html, nội dung gốc)."""
+    lead = sentence(rng, 30)
+    paragraphs = [paragraph(rng) for _ in range(rng.randint(6, 14))]
+    caption = f"<figure><img src='x.jpg'><figcaption>{sentence(rng, 8)}</figcaption></figure>"
+    if site == "Dan Tri":
+        url = f"https://dantri.com.vn/xa-hoi/bai-viet-2024{rng.randint(1, 10 ** 9):010d}.htm"
+        body = (
+            f'<article class="singular-container"><h1 class="title-page">{sentence(rng, 12)}</h1>'
+            f'<h2 class="singular-sapo">{lead}</h2><div class="singular-content">'
+            + "".join(f"<p>{p}</p>" + (caption if i == 1 else "") for i, p in enumerate(paragraphs))
+            + '</div><div class="dt-news__author">Nguyễn Văn A</div></article>'
+        )
+    elif site == "VnExpress":
+        url = f"https://vnexpress.net/bai-viet-{rng.randint(4000000, 4900000)}.html"
+        body = (
+            f'<div class="sidebar-1"><h1 class="title-detail">{sentence(rng, 12)}</h1><p class="description">{lead}</p>'
+            '<article class="fck_detail">'
+            + "".join(f'<p class="Normal">{p}</p>' + (caption if i == 1 else "") for i, p in enumerate(paragraphs))
+            + '<p class="Normal" style="text-align:right;"><strong>Minh Anh</strong></p></article></div>'
+        )
+        paragraphs = paragraphs + ["Minh Anh"]
+    else:
+        url = f"https://vietnamnet.vn/bai-viet-{rng.randint(2000000, 2300000)}.html"
+        body = (
+            f'<div class="content-detail"><h1 class="content-detail-title">{sentence(rng, 12)}</h1>'
+            f'<h2 class="content-detail-sapo">{lead}</h2><div class="maincontent main-content">'
+            + "".join(f"<p>{p}</p>" + (caption if i == 1 else "") for i, p in enumerate(paragraphs))
+            + '<div class="article-relate"><p>Xem thêm: bài viết liên quan</p></div></div></div>'
+        )
+    head, tail = boilerplate(rng, url.split("/")[2])
+    return url, (head + body + tail).encode("utf-8"), "\n\n".join([lead] + paragraphs)
+
+
+def words(text: str) -> Counter:
+    return Counter(re.findall(r"\w+", text.lower()))
+
+
+def f1(extracted: str, reference: str) -> float:
+    got, expected = words(extracted), words(reference)
+    overlap = sum((got & expected).values())
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / sum(got.values()), overlap / sum(expected.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def load_pages(args, websites: List[dict]) -> List[Page]:
+    if args.pages:
+        with open(os.path.join(args.pages, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        pages = []
+        for name, url in manifest.items():
+            with open(os.path.join(args.pages, name), "rb") as f:
+                content = f.read()
+            reference = None
+            reference_path = os.path.join(args.pages, os.path.splitext(name)[0] + ".txt")
+            if os.path.exists(reference_path):
+                with open(reference_path, "r", encoding="utf-8") as f:
+                    reference = f.read()
+            pages.append((url, content, reference))
+        return pages
+    rng = random.Random(42)
+    return [synthetic_article(rng, website["name"]) for website in websites for _ in range(args.articles)]
+
+
+def save_pages(directory: str, urls_file: str):
+    os.makedirs(directory, exist_ok=True)
+    with open(urls_file, "r", encoding="utf-8") as f:
+        urls = [line.strip() for line in f if line.strip()]
+    manifest = {}
+    for i, url in enumerate(urls):
+        try:
+            response = requests.get(url, headers=HEADERS, timeout=20)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"bỏ qua {url}: {e}")
+            continue
+        name = f"{i:04d}.html"
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(response.content)
+        manifest[name] = url
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"Đã lưu {len(manifest)}/{len(urls)} trang vào {directory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", help="thư mục trang bài báo đã lưu (có manifest.json)")
+    parser.add_argument("--save", help="tải các URL trong --urls vào thư mục này trước")
+    parser.add_argument("--urls", help="file URL bài báo, mỗi dòng một URL (dùng với --save)")
+    parser.add_argument("--articles", type=int, default=20, help="số trang giả lập mỗi site")
+    args = parser.parse_args()
+
+    websites = [website for website in load_config().get("websites", []) if website.get("extractor")]
+    if args.save:
+        save_pages(args.save, args.urls)
+        args.pages = args.pages or args.save
+    registry = ExtractorRegistry.from_websites(websites)
+    pages = load_pages(args, websites)
+
+    stats = defaultdict(lambda: {"pages": 0, "misses": 0, "site_cpu": 0.0, "newspaper_cpu": 0.0, "site_f1": 0.0, "newspaper_f1": 0.0})
+    for url, content, reference in pages:
+        spec = registry.spec_for(url)
+        if spec is None:
+            continue
+        row = stats[spec.name]
+        start = time.process_time()
+        site = compiled(spec).extract(content)
+        row["site_cpu"] += time.process_time() - start
+        start = time.process_time()
+        fallback = newspaper_text(url, decode_html(content))
+        row["newspaper_cpu"] += time.process_time() - start
+        row["pages"] += 1
+        row["misses"] += 0 if site else 1
+        # Không có nội dung chuẩn (.txt) thì lấy kết quả Newspaper3k làm chuẩn
+        reference = reference if reference is not None else fallback
+        row["site_f1"] += f1(site, reference)
+        row["newspaper_f1"] += f1(fallback, reference) if reference is not fallback else 1.0
+
+    if not stats:
+        print("Không có trang nào thuộc site đã khai báo extractor")
+        sys.exit(1)
+    print(f"{'site':<12}{'trang':>7}{'trượt':>7}{'site ms':>10}{'newspaper ms':>14}{'nhanh hơn':>11}{'F1 site':>9}{'F1 np':>8}")
+    for name, row in stats.items():
+        pages_count = row["pages"]
+        site_ms = row["site_cpu"] / pages_count * 1000
+        newspaper_ms = row["newspaper_cpu"] / pages_count * 1000
+        print(
+            f"{name:<12}{pages_count:>7}{row['misses']:>7}{site_ms:>10.2f}{newspaper_ms:>14.2f}"
+            f"{newspaper_ms / max(site_ms, 1e-6):>10.1f}x{row['site_f1'] / pages_count:>9.3f}{row['newspaper_f1'] / pages_count:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
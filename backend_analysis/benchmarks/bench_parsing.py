@@ -0,0 +1,79 @@
+"""
+Thông lượng parse nội dung bài báo: thread pool mặc định (cách cũ) so với process pool
+parse (services/parsing.py) với số process khác nhau, kèm RSS đỉnh của các process con.
+
+Dùng trang giả lập của benchmarks/bench_extractors.py nên chạy được offline; --fallback-ratio
+là tỉ lệ trang không khớp selector, phải parse bằng Newspaper3k (chậm hơn nhiều).
+Chạy từ thư mục backend_analysis:
+
+    python -m benchmarks.bench_parsing --articles 600 --workers 1 2 4
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_extractors import synthetic_article
+from services.extractors import ExtractorRegistry, extract_article
+from services.parsing import ParsePool
+from services.settings import load_config
+
+
+def make_pages(articles: int, fallback_ratio: float):
+    websites = [website for website in load_config().get("websites", []) if website.get("extractor")]
+    rng = random.Random(42)
+    pages = []
+    for i in range(articles):
+        url, content, _ = synthetic_article(rng, websites[i % len(websites)]["name"])
+        if rng.random() < fallback_ratio:
+            # Đổi class của body để selector trượt
+            content = content.replace(b"singular-content", b"x-content").replace(b"fck_detail", b"x_detail").replace(b"maincontent", b"x-main")
+        pages.append((url, content))
+    return ExtractorRegistry.from_websites(websites), pages
+
+
+async def run_threads(registry, pages, workers: int) -> float:
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            loop.run_in_executor(executor, extract_article, url, content, None, registry.spec_for(url)) for url, content in pages
+        ))
+        return time.perf_counter() - start
+
+
+async def run_processes(registry, pages, workers: int, max_tasks_per_child: int):
+    pool = ParsePool(workers=workers, max_tasks_per_child=max_tasks_per_child, max_memory_mb=0)
+    try:
+        # Khởi động process con trước khi đo
+        await asyncio.gather(*(pool.parse(url, content, None, registry.spec_for(url)) for url, content in pages[:workers]))
+        start = time.perf_counter()
+        await asyncio.gather(*(pool.parse(url, content, None, registry.spec_for(url)) for url, content in pages))
+        return time.perf_counter() - start, pool.peak_rss_mb
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=600)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--fallback-ratio", type=float, default=0.1)
+    parser.add_argument("--max-tasks-per-child", type=int, default=200)
+    args = parser.parse_args()
+
+    registry, pages = make_pages(args.articles, args.fallback_ratio)
+    print(f"{args.articles} trang, {args.fallback_ratio:.0%} dùng Newspaper3k, {os.cpu_count()} core")
+    print(f"{'cách chạy':<24}{'bài/giây':>10}{'RSS con MB':>12}")
+    for workers in args.workers:
+        seconds = asyncio.run(run_threads(registry, pages, workers))
+        print(f"{f'thread pool x{workers}':<24}{len(pages) / seconds:>10.1f}")
+    for workers in args.workers:
+        seconds, peak_rss_mb = asyncio.run(run_processes(registry, pages, workers, args.max_tasks_per_child))
+        print(f"{f'process pool x{workers}':<24}{len(pages) / seconds:>10.1f}{peak_rss_mb:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
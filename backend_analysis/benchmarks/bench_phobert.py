@@ -0,0 +1,100 @@
+"""
+Benchmark thông lượng của backend PhoBERT (services/classifiers.py) trên CPU.
+
+Dùng model RoBERTa nhỏ khởi tạo ngẫu nhiên và tokenizer tự sinh nên chạy được offline.
+Chạy từ thư mục backend_analysis:
+
+    python -m benchmarks.bench_phobert --articles 256
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+
+from services.classifiers import PhoBertBackend
+
+SPECIAL_TOKENS = ["<s>", "<pad>", "</s>", "<unk>", "<mask>"]
+SYLLABLES = [
+    "người", "dân", "chính", "phủ", "kinh", "tế", "thị", "trường", "giá", "vàng", "tăng", "giảm",
+    "học", "sinh", "bóng", "đá", "đội", "tuyển", "thời", "tiết", "mưa", "bão", "tai", "nạn",
+    "giao", "thông", "bệnh", "viện", "bác", "sĩ", "công", "an", "điều", "tra", "doanh", "nghiệp",
+]
+
+
+def build_model(model_dir: str, hidden_size: int, layers: int, max_length: int):
+    """Lưu một model RoBERTa nhỏ khởi tạo ngẫu nhiên cùng tokenizer vào model_dir."""
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast, RobertaConfig, RobertaForSequenceClassification
+
+    vocab = {token: i for i, token in enumerate(SPECIAL_TOKENS + SYLLABLES)}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="<s> $A </s>", special_tokens=[("<s>", 0), ("</s>", 2)]
+    )
+    PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, bos_token="<s>", eos_token="</s>",
+        pad_token="<pad>", unk_token="<unk>", mask_token="<mask>",
+    ).save_pretrained(model_dir)
+
+    config = RobertaConfig(
+        vocab_size=len(vocab),
+        hidden_size=hidden_size,
+        num_hidden_layers=layers,
+        num_attention_heads=max(1, hidden_size // 64),
+        intermediate_size=hidden_size * 4,
+        max_position_embeddings=max_length + 2,
+        pad_token_id=1, bos_token_id=0, eos_token_id=2,
+        num_labels=3,
+        id2label={0: "NEG", 1: "POS", 2: "NEU"},
+        label2id={"NEG": 0, "POS": 1, "NEU": 2},
+    )
+    RobertaForSequenceClassification(config).save_pretrained(model_dir)
+
+
+def make_articles(count: int, max_words: int):
+    rng = random.Random(42)
+    return [" ".join(rng.choices(SYLLABLES, k=rng.randint(10, max_words))) for _ in range(count)]
+
+
+async def measure(backend: PhoBertBackend, articles):
+    await backend.start()
+    try:
+        # Làm nóng model trước khi đo
+        await backend.classify("warmup", articles[0])
+        start = time.perf_counter()
+        await asyncio.gather(*(backend.classify(str(i), text) for i, text in enumerate(articles)))
+        return time.perf_counter() - start
+    finally:
+        await backend.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=256)
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--batch-sizes", default="1,8,32")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    articles = make_articles(args.articles, args.max_length - 2)
+    with tempfile.TemporaryDirectory() as model_dir:
+        build_model(model_dir, args.hidden_size, args.layers, args.max_length)
+        print(f"{'runtime':<12}{'batch':>6}{'bài/giây':>12}{'tổng (s)':>12}")
+        for quantize in (False, True):
+            for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+                backend = PhoBertBackend(
+                    model_dir, quantize=quantize, max_length=args.max_length,
+                    num_threads=args.threads, segment=False,
+                    max_batch_size=batch_size, max_wait_ms=0 if batch_size == 1 else 10,
+                )
+                elapsed = asyncio.run(measure(backend, articles))
+                runtime = "torch-int8" if quantize else "torch"
+                print(f"{runtime:<12}{batch_size:>6}{len(articles) / elapsed:>12.1f}{elapsed:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Số token gửi LLM trước và sau khi cắt theo ngân sách (services/prompts.py), kèm tốc độ của
+bộ ước lượng token. Với --tokenizer (file tokenizer.json của model, cần gói tokenizers) thì so
+sánh thêm số token ước lượng với số token thật để chỉnh heuristic.
+
+Nội dung bài lấy từ DB (--from-db, cần DATABASE_URL) hoặc từ trang giả lập của
+benchmarks/bench_extractors.py. Chạy từ thư mục backend_analysis:
+
+    python -m benchmarks.bench_prompts --from-db 2000 --budget 800 1200 2000
+    python -m benchmarks.bench_prompts --tokenizer deepseek/tokenizer.json
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import List
+
+from benchmarks.bench_extractors import synthetic_article
+from services.prompts import DEFAULT_PROMPT_CONFIG, PromptBuilder, estimate_tokens
+from services.settings import load_config
+
+
+def load_texts(args) -> List[str]:
+    if args.from_db:
+        from db.database import SessionLocal
+        from db.models import CrawledData
+        from services.content import stored_text
+        from services.extractors import ExtractorRegistry
+
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(CrawledData.url, CrawledData.contents).filter(CrawledData.contents.isnot(None))
+                .order_by(CrawledData.id.desc()).limit(args.from_db).all()
+            )
+        finally:
+            db.close()
+        extractors = ExtractorRegistry.from_websites(load_config().get("websites", []))
+        return [text for text in (stored_text(row.url, row.contents, extractors) for row in rows) if text]
+    websites = [website for website in load_config().get("websites", []) if website.get("extractor")]
+    rng = random.Random(42)
+    return [synthetic_article(rng, websites[i % len(websites)]["name"])[2] for i in range(args.articles)]
+
+
+def percentile(values: List[int], q: float) -> int:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from-db", type=int, default=0, help="lấy nội dung N bài mới nhất trong DB")
+    parser.add_argument("--articles", type=int, default=300, help="số bài giả lập khi không dùng --from-db")
+    parser.add_argument("--budget", type=int, nargs="+", default=[DEFAULT_PROMPT_CONFIG["token_budget"]])
+    parser.add_argument("--lead-paragraphs", type=int, default=DEFAULT_PROMPT_CONFIG["lead_paragraphs"])
+    parser.add_argument("--tokenizer", help="file tokenizer.json để đo sai số của bộ ước lượng")
+    args = parser.parse_args()
+
+    texts = load_texts(args)
+    if not texts:
+        print("Không có bài nào")
+        return
+    chars = sum(len(text) for text in texts)
+    start = time.perf_counter()
+    estimated = [estimate_tokens(text) for text in texts]
+    seconds = time.perf_counter() - start
+    print(f"{len(texts)} bài, ước lượng {chars / seconds / 1e6:.1f} triệu ký tự/giây ({seconds / len(texts) * 1000:.2f} ms/bài)")
+
+    if args.tokenizer:
+        from tokenizers import Tokenizer
+
+        tokenizer = Tokenizer.from_file(args.tokenizer)
+        actual = [len(tokenizer.encode(text).ids) for text in texts]
+        ratios = [e / a for e, a in zip(estimated, actual) if a]
+        print(
+            f"ước lượng/thật: trung vị {statistics.median(ratios):.2f}, p5 {sorted(ratios)[int(0.05 * len(ratios))]:.2f}, "
+            f"p95 {sorted(ratios)[int(0.95 * len(ratios))]:.2f} (> 1 là ước lượng dư)"
+        )
+
+    print(f"{'ngân sách':>10}{'gốc p50':>9}{'gốc p99':>9}{'gửi p50':>9}{'gửi p99':>9}{'bị cắt':>8}{'tiết kiệm':>11}{'ms/bài':>8}")
+    for budget in args.budget:
+        builder = PromptBuilder(token_budget=budget, lead_paragraphs=args.lead_paragraphs)
+        start = time.perf_counter()
+        prompts = [builder.build(text) for text in texts]
+        seconds = time.perf_counter() - start
+        original = [prompt.original_tokens for prompt in prompts]
+        sent = [prompt.sent_tokens for prompt in prompts]
+        trimmed = sum(prompt.trimmed for prompt in prompts) / len(prompts)
+        saved = 1 - sum(sent) / max(sum(original), 1)
+        print(
+            f"{budget:>10}{percentile(original, 0.5):>9}{percentile(original, 0.99):>9}{percentile(sent, 0.5):>9}"
+            f"{percentile(sent, 0.99):>9}{trimmed:>8.0%}{saved:>11.0%}{seconds / len(texts) * 1000:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 # db/database.py
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from .models import Base
 
@@ -10,8 +12,64 @@ print(f"[DB] Using DATABASE_URL: {DATABASE_URL}")
 if not DATABASE_URL:
     raise Exception("DATABASE_URL environment variable is required and must point to the shared PostgreSQL instance.")
 
-engine = create_engine(DATABASE_URL)
+# Driver async tương ứng với từng loại DB (URL trong .env dùng chung với backend_crawling nên giữ dạng sync)
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+def pool_options(prefix: str, pool_size: int, max_overflow: int) -> dict:
+    """
+    Cấu hình pool kết nối từ biến môi trường <prefix>_POOL_SIZE, <prefix>_MAX_OVERFLOW,
+    <prefix>_POOL_TIMEOUT_SECONDS và DB_POOL_RECYCLE_SECONDS. pre_ping loại kết nối đã bị
+    server hoặc proxy đóng trước khi dùng; recycle thay kết nối cũ trước khi chúng bị đóng.
+    """
+    options = {
+        "pool_pre_ping": True,
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")),
+    }
+    # SQLite (benchmark) không dùng pool có giới hạn kích thước
+    if make_url(DATABASE_URL).get_backend_name() != "sqlite":
+        options["pool_size"] = int(os.getenv(f"{prefix}_POOL_SIZE", str(pool_size)))
+        options["max_overflow"] = int(os.getenv(f"{prefix}_MAX_OVERFLOW", str(max_overflow)))
+        options["pool_timeout"] = float(os.getenv(f"{prefix}_POOL_TIMEOUT_SECONDS", "30"))
+    return options
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise Exception(f"Không có driver async cho {parsed.get_backend_name()}")
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+# Engine sync: chỉ dùng cho job theo lịch (báo cáo, dựng lại rollups, backfill) và nâng cấp schema
+engine = create_engine(DATABASE_URL, **pool_options("DB_SYNC", 5, 5))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine async: dùng trong các đường xử lý async (lượt phân tích, cache, hàng đợi công việc),
+# để truy vấn DB không chặn event loop dùng chung với API và client HTTP
+async_engine = create_async_engine(async_database_url(DATABASE_URL), **pool_options("DB", 10, 10))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def dispose_async_engine():
+    """Đóng các kết nối của engine async (khi tắt app hoặc trước khi event loop đóng)."""
+    await async_engine.dispose()
+
+def upgrade_schema():
+    """
+    create_all không thêm cột mới vào bảng đã tồn tại (bảng crawled_data do cả hai service tạo),
+    nên bổ sung các cột và index còn thiếu theo models.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        with engine.begin() as conn:
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
@@ -1,5 +1,5 @@
 # db/models.py
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, SmallInteger, String, Boolean, Date, DateTime, Index, LargeBinary, text
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 Base = declarative_base()
@@ -14,3 +14,46 @@ class CrawledData(Base):
     is_analyzed = Column(Boolean, default=False)
     analyzed_at = Column(DateTime, nullable=True)
     analyze_success = Column(Boolean, default=None)  # None=not analyzed, True=success, False=failure
+    emotion = Column(SmallInteger, nullable=True, index=True)  # index trong EMOTION_CATEGORIES, -1=không xác định
+    # Hàng đợi công việc: worker đang giữ bài và thời điểm hết hạn lease
+    claimed_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    # Số token (ước lượng) của nội dung bài và của phần thực sự gửi LLM sau khi cắt theo ngân sách
+    original_tokens = Column(Integer, nullable=True)
+    sent_tokens = Column(Integer, nullable=True)
+    # Nhóm bài gần trùng (id của bài đầu tiên trong nhóm) và chữ ký MinHash để nạp lại chỉ mục khi khởi động
+    cluster_id = Column(Integer, nullable=True, index=True)
+    minhash = Column(LargeBinary, nullable=True)
+
+    __table_args__ = (
+        # Partial index chỉ chứa các bài chưa phân tích, giữ nhỏ dù bảng tăng
+        Index(
+            "ix_crawled_data_unanalyzed", "crawled_at", "id",
+            postgresql_where=text("is_analyzed = false"),
+            sqlite_where=text("is_analyzed = 0"),
+        ),
+    )
+
+class AnalysisCacheEntry(Base):
+    """Kết quả phân tích dùng lại được, khóa theo hash nội dung + prompt + phiên bản model"""
+    __tablename__ = "analysis_cache"
+    key = Column(String(64), primary_key=True)
+    analysis = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class EmotionRollup(Base):
+    """Số bài phân tích thành công theo site, giờ (analyzed_at làm tròn xuống) và cảm xúc"""
+    __tablename__ = "emotion_rollups"
+    site = Column(String, primary_key=True)
+    hour = Column(DateTime, primary_key=True, index=True)
+    emotion = Column(SmallInteger, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class StatusCounter(Base):
+    """Số bài đã crawl / phân tích thành công / lỗi theo ngày (UTC), dùng chung với backend_crawling cho /api/status"""
+    __tablename__ = "status_counters"
+    day = Column(Date, primary_key=True)
+    crawled = Column(Integer, nullable=False, default=0)
+    analyzed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
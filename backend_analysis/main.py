@@ -6,12 +6,18 @@ load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
 import sys
 import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from apscheduler.schedulers.background import BackgroundScheduler
-from routers import analysis
-from db.database import init_db, SessionLocal
+from routers import analysis, metrics, trends
+from db.database import dispose_async_engine, init_db, SessionLocal
+from services.llm_client import close_llm_client
+from services.metrics import JOB_SECONDS
+from services.parsing import shutdown_parse_pool
 from services.reporting import send_report_email, load_report_config
-import json
+from services.settings import load_analysis_config
+from services.worker import AnalysisWorker
+from routers.analysis import analyze_articles
 
 # Set up logging
 logging.basicConfig(
@@ -23,71 +29,65 @@ logger = logging.getLogger("backend_analysis")
 if sys.platform.startswith("win"):
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
-# Load config from shared config file
-CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "websites.json"))
-def load_config():
-    try:
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"[Config] Error loading config: {e}")
-        return {"websites": [], "analyze_interval_minutes": 30}
-
-app = FastAPI(title="Backend Analysis API", debug=True)
+def run_report(period: str):
+    """Send a scheduled report, recording how long it took."""
+    with JOB_SECONDS.labels(f"report_{period}").time():
+        send_report_email(period)
 
-@app.on_event("startup")
-async def startup_event():
-    init_db()
-    # Send report email on startup for debugging/development
-    try:
-        send_report_email("day")
-        send_report_email("week")
-    except Exception as e:
-        logger.error(f"[Report] Lỗi khi gửi báo cáo khi khởi động: {e}")
-    # Set up scheduler for automatic analysis and reporting
-    config = load_config()
+def start_report_scheduler() -> BackgroundScheduler:
+    """Schedule the daily and weekly report emails."""
     report_config = load_report_config()
-    interval = config.get("analyze_interval_minutes", 30)
     scheduler = BackgroundScheduler()
-    scheduler.add_job(run_analysis_sync, 'interval', minutes=interval)
     # Schedule daily report
     daily_time = report_config.get("daily_report_time", "08:00")
     hour, minute = map(int, daily_time.split(":"))
-    scheduler.add_job(lambda: send_report_email("day"), 'cron', hour=hour, minute=minute)
+    scheduler.add_job(lambda: run_report("day"), 'cron', hour=hour, minute=minute)
     # Schedule weekly report
     weekly_time = report_config.get("weekly_report_time", "Monday 08:00")
     try:
         weekday, w_time = weekly_time.split()
         w_hour, w_minute = map(int, w_time.split(":"))
-        scheduler.add_job(lambda: send_report_email("week"), 'cron', day_of_week=weekday.lower(), hour=w_hour, minute=w_minute)
+        scheduler.add_job(lambda: run_report("week"), 'cron', day_of_week=weekday.lower(), hour=w_hour, minute=w_minute)
     except Exception as e:
         logger.error(f"[Report] Lỗi cấu hình thời gian báo cáo tuần: {e}")
     scheduler.start()
-    logger.info(f"Analysis scheduler started with interval of {interval} minutes")
-    # Run initial analysis
-    while True:
-        try:
-            await run_analysis_async()
-            break
-        except Exception as e:
-            logger.error(f"[DB] Error during initial analysis: {e}. Retrying in 10 seconds...")
-            await asyncio.sleep(10)
+    return scheduler
 
-# Include router for API endpoint (still available for manual trigger)
-app.include_router(analysis.router, prefix="/api", tags=["analysis"])
-
-# Refactor: import and expose the analysis logic for scheduler
-from routers.analysis import analyze_articles
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    # Send report email on startup for debugging/development
+    try:
+        send_report_email("day")
+        send_report_email("week")
+    except Exception as e:
+        logger.error(f"[Report] Lỗi khi gửi báo cáo khi khởi động: {e}")
+    scheduler = start_report_scheduler()
+    # Long-lived analysis worker: woken by the crawler through LISTEN/NOTIFY, polling as a fallback
+    worker_config = load_analysis_config().get("worker", {})
+    worker = AnalysisWorker(
+        analyze_articles,
+        poll_interval_seconds=worker_config.get("poll_interval_seconds", 300),
+        debounce_seconds=worker_config.get("debounce_seconds", 1.0),
+    )
+    await worker.start()
+    app.state.analysis_worker = worker
+    logger.info(f"Analysis worker started, polling every {worker.poll_interval} seconds as a fallback")
+    try:
+        yield
+    finally:
+        await worker.stop()
+        await close_llm_client()
+        await dispose_async_engine()
+        shutdown_parse_pool()
+        scheduler.shutdown(wait=False)
 
-def run_analysis_sync():
-    """Run the analysis in a synchronous context for the scheduler."""
-    logger.info("[Scheduler] Running automatic article analysis...")
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(analyze_articles())
+app = FastAPI(title="Backend Analysis API", debug=True, lifespan=lifespan)
 
-async def run_analysis_async():
-    """Run the analysis asynchronously."""
-    await analyze_articles()
+# Include router for API endpoint (still available for manual trigger)
+app.include_router(analysis.router, prefix="/api", tags=["analysis"])
+app.include_router(trends.router, prefix="/api", tags=["trends"])
+app.include_router(metrics.router, tags=["metrics"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,21 +1,44 @@
-import os
-import json
 import logging
 import asyncio
+import re
 from datetime import datetime, timezone
+from typing import List, Optional, Tuple
 
-import httpx
-from fastapi import APIRouter, Depends
+import requests
+from fastapi import APIRouter, Depends, Request
+from requests.adapters import HTTPAdapter
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
 from db.models import CrawledData
-from db.database import SessionLocal
-
-# Import Newspaper3k để lấy nội dung bài báo
-from newspaper import Article
+from db.database import AsyncSessionLocal, SessionLocal
+from services.analysis_cache import cache_key, get_cache
+from services.batching import MicroBatcher
+from services.classifiers import create_backend
+from services.content import PAGE_ENCODING, decompress_page, decompress_text
+from services.dedup import get_duplicate_index
+from services.emotions import emotion_code
+from services.extractors import ExtractorRegistry, ExtractorSpec, extract_article, record_extraction
+from services.llm_client import LLMUnavailable
+from services.metrics import ARTICLES, DUPLICATES, PROMPT_TOKENS, STAGE_SECONDS
+from services.parsing import ParsePool, get_parse_pool
+from services.pipeline import AnalysisPipeline, ArticleJob
+from services.prompts import PromptBuilder
+from services.rollups import record_results
+from services.settings import load_analysis_config, load_config
+from services.work_queue import claim_batch, keep_claims, new_worker_id, release_claims
 
 router = APIRouter()
 
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+DOWNLOAD_TIMEOUT = 10
+DOWNLOAD_POOL_SIZE = 10
+CHARSET = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+
+_session: Optional[requests.Session] = None
+
 # Cấu hình logging
 logging.basicConfig(
     level=logging.INFO,
@@ -30,159 +53,382 @@ def get_db():
     finally:
         db.close()
 
-# Lấy API key DeepSeek từ biến môi trường (đã load từ file .env trong main.py)
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API")
-if not DEEPSEEK_API_KEY:
-    raise Exception("Thiếu biến môi trường DEEPSEEK_API")
+def get_session() -> requests.Session:
+    """Session HTTP dùng chung (giữ kết nối keep-alive) để tải các bài báo chưa có nội dung."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=DOWNLOAD_POOL_SIZE, pool_maxsize=DOWNLOAD_POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(HEADERS)
+        _session = session
+    return _session
+
+def download_page(url: str) -> Tuple[bytes, Optional[str]]:
+    """Tải HTML thô của bài báo; trả về (bytes, charset trong header Content-Type nếu có)."""
+    response = get_session().get(url, timeout=DOWNLOAD_TIMEOUT)
+    response.raise_for_status()
+    # Chỉ tin charset trong header; không có thì để extractor đọc thẻ <meta> của trang
+    charset = CHARSET.search(response.headers.get("Content-Type", ""))
+    return response.content, charset.group(1) if charset else None
+
+def parse_page(url: str, content: bytes, encoding: Optional[str], spec: Optional[ExtractorSpec]) -> str:
+    """Trích nội dung ngay trong tiến trình này (khi tắt process pool parse)."""
+    text, used = extract_article(url, content, encoding, spec)
+    record_extraction(url, spec, text, used)
+    return text
 
-def download_and_parse(url: str) -> str:
+async def extract_content(url: str, page: bytes, encoding: Optional[str], extractors: Optional[ExtractorRegistry] = None, parse_pool: Optional[ParsePool] = None) -> str:
     """
-    Sử dụng Newspaper3k để tải và phân tích bài báo từ URL.
-    Chúng ta thiết lập ngôn ngữ là tiếng Việt để phù hợp với bài báo.
+    Trích nội dung từ HTML thô bằng selector của site trong process pool parse
+    (Newspaper3k khi site chưa khai báo hoặc selector không khớp).
+    Log preview (500 ký tự đầu tiên) của nội dung trích được.
     """
+    spec = extractors.spec_for(url) if extractors else None
+    try:
+        with STAGE_SECONDS.labels("parse").time():
+            if parse_pool is not None:
+                content = await parse_pool.parse(url, page, encoding, spec)
+            else:
+                content = await asyncio.get_running_loop().run_in_executor(None, parse_page, url, page, encoding, spec)
+    except Exception as e:
+        logger.error(f"[Extract] Lỗi khi xử lý {url}: {e!r}")
+        return ""
+    logger.info(f"[Extract] URL: {url}, content preview (500 ký tự): {content[:500]}")
+    return content
+
+async def fetch_content(url: str, extractors: Optional[ExtractorRegistry] = None, parse_pool: Optional[ParsePool] = None) -> str:
+    """Tải trang trong thread pool (I/O), rồi trích nội dung như trang đã lưu lúc crawl."""
     try:
-        article = Article(url, language='vi')
-        article.download()
-        article.parse()
-        return article.text
+        with STAGE_SECONDS.labels("download").time():
+            page, encoding = await asyncio.get_running_loop().run_in_executor(None, download_page, url)
     except Exception as e:
-        logger.error(f"[Newspaper3k] Lỗi khi xử lý {url}: {e}")
+        logger.error(f"[Extract] Lỗi khi tải {url}: {e!r}")
         return ""
+    return await extract_content(url, page, encoding, extractors, parse_pool)
 
-async def fetch_content(url: str) -> str:
+async def load_stored_content(article_id: int) -> Optional[str]:
+    """Giá trị cột `contents` mà backend_crawling đã lưu sẵn (nếu có)."""
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(CrawledData.contents).where(CrawledData.id == article_id))
+
+async def get_article_content(article_id: int, url: str, extractors: Optional[ExtractorRegistry] = None, parse_pool: Optional[ParsePool] = None) -> str:
     """
-    Chạy hàm download_and_parse trong executor để không block event loop.
-    Log preview (500 ký tự đầu tiên) của nội dung crawl được.
+    Ưu tiên trang đã lưu lúc crawl, trích bằng cùng extractor với trang tải về;
+    chỉ tải lại khi chưa có. Văn bản đã lưu (bài crawl trước khi lưu trang) được dùng nguyên.
     """
-    loop = asyncio.get_event_loop()
-    content = await loop.run_in_executor(None, download_and_parse, url)
-    logger.info(f"[Newspaper3k] URL: {url}, content preview (500 ký tự): {content[:500]}")
-    return content
+    with STAGE_SECONDS.labels("load_content").time():
+        stored = await load_stored_content(article_id)
+    page = decompress_page(stored)
+    if page is not None:
+        logger.info(f"[Analyze] Dùng trang đã lưu cho URL: {url}")
+        return await extract_content(url, page, PAGE_ENCODING, extractors, parse_pool)
+    content = decompress_text(stored)
+    if content:
+        logger.info(f"[Analyze] Dùng nội dung đã lưu cho URL: {url}")
+        return content
+    return await fetch_content(url, extractors, parse_pool)
 
 @router.post("/analyze")
-async def analyze_articles_api():
+async def analyze_articles_api(request: Request):
+    # Đi qua worker của app (nếu có) để không chạy song song với lượt phân tích tự động
+    worker = getattr(request.app.state, "analysis_worker", None)
+    if worker is not None:
+        return await worker.run_once()
     return await analyze_articles()
 
+async def save_results(jobs: List[ArticleJob], worker_id: str) -> List[bool]:
+    """
+    Cập nhật kết quả phân tích (thành công hoặc lỗi) của một lô bài báo vào DB trong một transaction,
+    cùng với việc cộng dồn bảng tổng hợp emotion_rollups và status_counters.
+    Chỉ ghi các bài worker vẫn giữ (khóa bằng SELECT ... FOR UPDATE); bài đã hết lease và bị
+    worker khác nhận lại thì bỏ qua. Trả về đã ghi hay chưa cho từng bài, theo thứ tự.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            held = set((await db.scalars(
+                select(CrawledData.id)
+                .where(CrawledData.id.in_([job.id for job in jobs]), CrawledData.claimed_by == worker_id)
+                .with_for_update()
+            )).all())
+            saved = [job for job in jobs if job.id in held]
+            if saved:
+                emotions = [emotion_code(job.analysis) if job.success else None for job in saved]
+                # UPDATE theo khóa chính cho cả lô (executemany), một lần gửi tới DB
+                await db.execute(update(CrawledData), [
+                    {
+                        "id": job.id,
+                        "analysis": job.analysis,
+                        "is_analyzed": True,
+                        "analyzed_at": job.analyzed_at,
+                        "analyze_success": job.success,
+                        "emotion": emotion,
+                        "original_tokens": job.original_tokens,
+                        "sent_tokens": job.sent_tokens,
+                        "cluster_id": job.cluster_id,
+                        "minhash": job.minhash,
+                        "claimed_by": None,
+                        "lease_expires_at": None,
+                    }
+                    for job, emotion in zip(saved, emotions)
+                ])
+                await record_results(db, [
+                    (job.url, job.analyzed_at, job.success, emotion) for job, emotion in zip(saved, emotions)
+                ])
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+    for job in jobs:
+        if job.id not in held:
+            logger.warning(f"[Analyze] Lease của bài {job.url} đã bị worker khác nhận lại, bỏ qua kết quả.")
+    return [job.id in held for job in jobs]
+
 async def analyze_articles():
     """
-    Đối với mỗi bài báo trong DB (chỉ lưu URL):
-      1. Lấy nội dung bài báo bằng Newspaper3k.
-      2. Gửi nội dung đến DeepSeek API để phân tích và trả lời bằng tiếng Việt.
-      3. Cập nhật báo cáo phân tích vào DB.
+    Đối với mỗi bài báo trong DB (chỉ lưu URL), chạy qua pipeline 3 giai đoạn song song:
+      1. Lấy nội dung đã lưu lúc crawl, hoặc tải và trích bằng selector của site (Newspaper3k khi không khớp).
+      2. Phân loại cảm xúc bằng backend đã cấu hình (DeepSeek API hoặc PhoBERT chạy local).
+      3. Cập nhật báo cáo phân tích vào DB theo lô (mỗi lô một transaction, qua engine async).
+    Số worker của từng giai đoạn được cấu hình trong mục "analysis" của config/websites.json.
+    Bài báo được nhận theo lô bằng FOR UPDATE SKIP LOCKED nên có thể chạy nhiều worker song song.
+    Khi LLM tạm thời không dùng được (circuit breaker mở), bài đang xử lý được để lại chờ
+    và lượt phân tích ngừng nhận thêm bài.
+    Bài gần trùng với một bài trong vài ngày gần đây (cùng tin đăng lại ở báo khác) dùng lại
+    kết quả phân tích của nhóm thay vì gọi LLM.
     """
-    db = SessionLocal()
-    updated_count = 0
-    updated_urls = []
+    config = load_analysis_config()
+    extractors = ExtractorRegistry.from_websites(load_config().get("websites", []))
+    parse_pool = get_parse_pool(config.get("parsing", {}))
+    prompt_config = config.get("prompt", {})
+    prompts = PromptBuilder.from_config(prompt_config) if prompt_config.get("enabled", True) else None
+    loop = asyncio.get_running_loop()
+    worker_id = new_worker_id()
+    batch_size = config.get("claim_batch_size", config.get("queue_size", 32))
+    lease_seconds = config.get("lease_seconds", 600)
+    try:
+        claimed = await claim_batch(worker_id, batch_size, lease_seconds)
+    except Exception as e:
+        logger.error(f"[Analyze] Lỗi khi phân tích bài báo: {e}")
+        return {"detail": f"Lỗi khi phân tích: {e}"}
+
+    if not claimed:
+        logger.info("Không có bài báo nào cần phân tích")
+        return {"detail": "Không có bài báo nào cần phân tích"}
+
+    async def claimed_jobs():
+        batch = claimed
+        while batch:
+            logger.info(f"[Analyze] Worker {worker_id} claimed {len(batch)} articles to analyze.")
+            for article_id, url in batch:
+                yield ArticleJob(id=article_id, url=url)
+            if not backend.available:
+                logger.warning("[Analyze] Backend phân tích tạm thời không dùng được, ngừng nhận thêm bài.")
+                return
+            batch = await claim_batch(worker_id, batch_size, lease_seconds)
+
+    cache = get_cache(config.get("cache", {}))
+    # Bộ đếm của cache tích lũy theo tiến trình; báo cáo phần tăng thêm trong lượt này
+    cache_before = cache.stats() if cache else {"hits": 0, "misses": 0}
+    inflight = {}
+    dedup = get_duplicate_index(config.get("dedup", {}))
+    if dedup is not None and not dedup.loaded:
+        try:
+            await dedup.load_recent()
+        except Exception as e:
+            logger.error(f"[Dedup] Lỗi khi nạp chỉ mục bài gần trùng: {e}")
+    # Nhóm mới tạo trong lượt này (cluster_id -> kết quả của bài đại diện) để bài gần trùng chờ thay vì gọi lại
+    clusters = {}
     try:
-        articles = db.query(CrawledData).filter(CrawledData.is_analyzed == False).all()
-        logger.info(f"[Analyze] Found {len(articles)} articles to analyze.")
-        if not articles:
-            logger.info("Không có bài báo nào cần phân tích")
-            return {"detail": "Không có bài báo nào cần phân tích"}
-
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            for article in articles:
-                logger.info(f"[Analyze] Đang xử lý bài báo có URL: {article.url}")
-                content = await fetch_content(article.url)
-                now = datetime.now(timezone.utc)
-                if not content:
-                    logger.error(f"[Analyze] Không lấy được nội dung cho URL: {article.url}, đánh dấu là đã phân tích với lỗi.")
-                    db.query(CrawledData).filter(CrawledData.id == article.id).update({
-                        CrawledData.analysis: "[ERROR] Không lấy được nội dung bài báo.",
-                        CrawledData.is_analyzed: True,
-                        CrawledData.analyzed_at: now,
-                        CrawledData.analyze_success: False
-                    })
-                    updated_count += 1
-                    updated_urls.append(article.url)
-                    db.commit()
-                    continue
-
-                # Xây dựng payload cho DeepSeek API
-                payload = {
-                    "model": "deepseek-chat",
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": "Bạn là một chuyên gia phân tích tin tức. Nhiệm vụ của bạn là **đọc kỹ bài báo sau và xác định cảm xúc chủ đạo** mà nó truyền tải. Hãy **phân loại cảm xúc này vào một trong các danh mục sau:** [Tích cực, Tiêu cực, Trung lập, Hài hước, Phẫn nộ, Bất ngờ, Buồn bã]. Sau khi phân loại, hãy **đưa ra một nhận xét tổng quan ngắn gọn (tối đa 2 câu)** về nội dung chính của bài báo, **dựa trên cảm xúc bạn đã xác định**."
-                        },
-                        {
-                            "role": "user",
-                            "content": content
-                        }
-                    ],
-                    "max_tokens": 2048,
-                    "temperature": 1,
-                    "top_p": 1,
-                    "frequency_penalty": 0,
-                    "presence_penalty": 0,
-                    "stream": False,
-                    "response_format": {"type": "text"}
-                }
-
-                logger.info(f"[DeepSeek] Payload cho URL {article.url}: {json.dumps(payload, ensure_ascii=False)}")
-                try:
-                    response = await client.post(
-                        "https://api.deepseek.com/chat/completions",
-                        headers={
-                            "Content-Type": "application/json",
-                            "Authorization": f"Bearer {DEEPSEEK_API_KEY}"
-                        },
-                        json=payload
-                    )
-                    if response.status_code != 200:
-                        logger.error(f"[DeepSeek] Error for URL {article.url} - Status Code: {response.status_code}")
-                        logger.error(f"[DeepSeek] Response: {response.text}")
-                        db.query(CrawledData).filter(CrawledData.id == article.id).update({
-                            CrawledData.analysis: f"[ERROR] DeepSeek API lỗi: {response.status_code}",
-                            CrawledData.is_analyzed: True,
-                            CrawledData.analyzed_at: now,
-                            CrawledData.analyze_success: False
-                        })
-                        updated_count += 1
-                        updated_urls.append(article.url)
-                        db.commit()
-                        continue
-
-                    data = response.json()
-                    try:
-                        analysis_report = data["choices"][0]["message"]["content"]
-                        logger.info(f"[DeepSeek] Nhận báo cáo thành công cho URL {article.url}")
-                        success = True
-                    except (KeyError, IndexError) as e:
-                        logger.error(f"[DeepSeek] Lỗi khi trích xuất báo cáo cho URL {article.url}: {e}")
-                        logger.error(f"[DeepSeek] Full response: {json.dumps(data, indent=2)}")
-                        analysis_report = "[ERROR] Không trích xuất được báo cáo từ DeepSeek API."
-                        success = False
-                except httpx.HTTPError as e:
-                    logger.exception(f"[DeepSeek] Lỗi khi gọi DeepSeek API cho URL {article.url}: {e}")
-                    db.query(CrawledData).filter(CrawledData.id == article.id).update({
-                        CrawledData.analysis: f"[ERROR] DeepSeek API exception: {e}",
-                        CrawledData.is_analyzed: True,
-                        CrawledData.analyzed_at: now,
-                        CrawledData.analyze_success: False
-                    })
-                    updated_count += 1
-                    updated_urls.append(article.url)
-                    db.commit()
-                    continue
-
-                # Cập nhật thông tin phân tích vào DB (thành công hoặc lỗi phân tích)
-                db.query(CrawledData).filter(CrawledData.id == article.id).update({
-                    CrawledData.analysis: analysis_report,
-                    CrawledData.is_analyzed: True,
-                    CrawledData.analyzed_at: now,
-                    CrawledData.analyze_success: success
-                })
-                updated_count += 1
-                updated_urls.append(article.url)
-                db.commit()
-        db.commit()
-        logger.info(f"Đã cập nhật {updated_count} bài báo. URLs: {updated_urls}")
-        return {"detail": f"Phân tích bài báo thành công. Đã cập nhật {updated_count} bài báo."}
+        backend = create_backend(config)
+        await backend.start()
+    except Exception as e:
+        logger.error(f"[Analyze] Không khởi tạo được backend phân tích: {e}")
+        await release_claims(worker_id)
+        return {"detail": f"Lỗi khi phân tích: {e}"}
+    try:
+
+        async def fetch(job: ArticleJob):
+            logger.info(f"[Analyze] Đang xử lý bài báo có URL: {job.url}")
+            job.content = await get_article_content(job.id, job.url, extractors, parse_pool)
+            job.analyzed_at = datetime.now(timezone.utc)
+            if not job.content:
+                logger.error(f"[Analyze] Không lấy được nội dung cho URL: {job.url}, đánh dấu là đã phân tích với lỗi.")
+                job.analysis = "[ERROR] Không lấy được nội dung bài báo."
+                job.success = False
+
+        async def classify(job: ArticleJob):
+            try:
+                with STAGE_SECONDS.labels("classify").time():
+                    job.analysis, job.success = await backend.classify(job.url, job.content)
+            except LLMUnavailable as e:
+                logger.warning(f"[Analyze] LLM tạm thời không dùng được, để lại bài {job.url} cho lượt sau: {e}")
+                job.deferred = True
+
+        async def deduplicate(job: ArticleJob) -> bool:
+            """Gán nhóm bài gần trùng cho bài; True nếu đã dùng lại kết quả phân tích của nhóm."""
+            with STAGE_SECONDS.labels("dedup").time():
+                job.minhash = dedup.signature(job.content)
+                match = dedup.lookup(job.minhash) if job.minhash else None
+            if job.minhash is None:
+                DUPLICATES.labels("skipped").inc()
+                return False
+            if match is None:
+                job.cluster_id = job.id
+                dedup.add(job.id, job.id, job.minhash)
+                clusters[job.id] = loop.create_future()
+                DUPLICATES.labels("unique").inc()
+                return False
+            job.cluster_id = match.cluster_id
+            dedup.add(job.id, match.cluster_id, job.minhash)
+            analysis = match.analysis
+            pending = clusters.get(match.cluster_id)
+            if analysis is None and pending is not None:
+                analysis = await asyncio.shield(pending)
+            if analysis is None:
+                DUPLICATES.labels("matched").inc()
+                return False
+            logger.info(f"[Dedup] Dùng kết quả của nhóm {match.cluster_id} (tương đồng {match.similarity:.2f}) cho URL: {job.url}")
+            DUPLICATES.labels("reused").inc()
+            job.analysis, job.success = analysis, True
+            return True
+
+        async def analyze(job: ArticleJob):
+            if dedup is None:
+                await analyze_content(job)
+                return
+            try:
+                if await deduplicate(job):
+                    job.content = ""
+                    return
+                await analyze_content(job)
+                if job.success and job.cluster_id is not None:
+                    dedup.set_analysis(job.cluster_id, job.analysis)
+            finally:
+                future = clusters.pop(job.id, None)
+                if future is not None:
+                    future.set_result(job.analysis if job.success else None)
+
+        async def analyze_content(job: ArticleJob):
+            if prompts is not None:
+                # Bỏ đoạn rác và cắt theo ngân sách token; cache khóa theo đúng phần được gửi đi
+                prompt = prompts.build(job.content)
+                job.content = prompt.text
+                job.original_tokens, job.sent_tokens = prompt.original_tokens, prompt.sent_tokens
+                PROMPT_TOKENS.labels("original").inc(prompt.original_tokens)
+                PROMPT_TOKENS.labels("sent").inc(prompt.sent_tokens)
+                if prompt.trimmed:
+                    logger.info(f"[Prompt] Cắt {job.url} từ {prompt.original_tokens} xuống {prompt.sent_tokens} token.")
+            if not cache:
+                await classify(job)
+                job.content = ""
+                return
+            key = cache_key(job.content, backend.cache_version)
+            # Bài trùng nội dung đang được phân tích trong cùng lượt: chờ kết quả thay vì gọi lại
+            pending = inflight.get(key)
+            if pending is not None:
+                analysis, success = await asyncio.shield(pending)
+                if success:
+                    logger.info(f"[Cache] Dùng kết quả của bài trùng nội dung cho URL: {job.url}")
+                    cache.record(True)
+                    job.analysis, job.success = analysis, success
+                    job.content = ""
+                    return
+            future = inflight[key] = loop.create_future()
+            try:
+                cached = await cache.get(key)
+                if cached is not None:
+                    logger.info(f"[Cache] Dùng kết quả phân tích đã lưu cho URL: {job.url}")
+                    job.analysis, job.success = cached, True
+                else:
+                    await classify(job)
+                    if job.success:
+                        await cache.put(key, job.analysis)
+            finally:
+                future.set_result((job.analysis, job.success))
+                if inflight.get(key) is future:
+                    del inflight[key]
+            # Nội dung không còn cần thiết sau khi phân tích, giải phóng sớm
+            job.content = ""
+
+        async def write(job: ArticleJob):
+            if job.deferred:
+                # Không ghi gì: bài được trả lại hàng đợi bởi release_claims khi kết thúc lượt
+                ARTICLES.labels("deferred").inc()
+                return
+            job.saved = await writer.submit(job)
+            if job.saved:
+                ARTICLES.labels("success" if job.success else "failed").inc()
+
+        async def write_batch(jobs: List[ArticleJob]) -> List[bool]:
+            with STAGE_SECONDS.labels("db_write").time():
+                return await save_results(jobs, worker_id)
+
+        # Kết quả được gom thành lô, mỗi lô một transaction; db_concurrency là số transaction ghi cùng lúc
+        write_config = config.get("write_batch", {})
+        writer = MicroBatcher(
+            write_batch,
+            max_items=write_config.get("max_items", 32),
+            max_wait_ms=write_config.get("max_wait_ms", 50),
+            max_inflight=config.get("db_concurrency", 1),
+        )
+        await writer.start()
+        # Gia hạn lease của các bài đang giữ trong suốt lượt, ba lần trong mỗi thời hạn lease
+        renewer = asyncio.create_task(keep_claims(worker_id, lease_seconds, lease_seconds / 3))
+        try:
+            pipeline = AnalysisPipeline(
+                fetch, analyze, write,
+                fetch_concurrency=config.get("fetch_concurrency", 8),
+                llm_concurrency=max(config.get("llm_concurrency", 4), backend.min_concurrency),
+                # Mỗi worker ghi chờ lô của mình, nên cần đủ worker để lấp đầy một lô
+                db_concurrency=writer.max_items,
+                queue_size=config.get("queue_size", 32),
+            )
+            written = await pipeline.run(claimed_jobs())
+        finally:
+            renewer.cancel()
+            await writer.close()
     except Exception as e:
-        db.rollback()
         logger.error(f"[Analyze] Lỗi khi phân tích bài báo: {e}")
         return {"detail": f"Lỗi khi phân tích: {e}"}
     finally:
-        db.close()
+        await backend.close()
+        # Trả lại các bài đã nhận nhưng chưa ghi kết quả để worker khác xử lý ngay
+        try:
+            released = await release_claims(worker_id)
+            if released:
+                logger.info(f"[Analyze] Đã trả lại {released} bài chưa xử lý xong.")
+        except Exception as e:
+            logger.error(f"[Analyze] Lỗi khi trả lại bài đã nhận: {e}")
+
+    if dedup is not None:
+        evicted = dedup.evict()
+        if evicted:
+            logger.info(f"[Dedup] Đã bỏ {evicted} bài cũ khỏi chỉ mục bài gần trùng.")
+
+    if cache:
+        try:
+            evicted = await cache.evict()
+            if evicted:
+                logger.info(f"[Cache] Đã xóa {evicted} kết quả cache hết hạn hoặc vượt giới hạn.")
+        except Exception as e:
+            logger.error(f"[Cache] Lỗi khi dọn cache: {e}")
+
+    cache_stats = {name: count - cache_before[name] for name, count in (cache.stats() if cache else cache_before).items()}
+    # Chỉ đếm các dòng thực sự được cập nhật: bài mất lease không được ghi
+    updated_urls = [job.url for job in written if job.saved]
+    deferred = sum(1 for job in written if job.deferred)
+    lost = len(written) - len(updated_urls) - deferred
+    logger.info(
+        f"Đã cập nhật {len(updated_urls)} bài báo, để lại {deferred} bài, bỏ qua {lost} bài mất lease. "
+        f"Cache: {cache_stats}. URLs: {updated_urls}"
+    )
+    return {
+        "detail": f"Phân tích bài báo thành công. Đã cập nhật {len(updated_urls)} bài báo."
+                  + (f" Để lại {deferred} bài do LLM tạm thời không dùng được." if deferred else "")
+                  + (f" Bỏ qua {lost} bài do worker khác đã nhận lại." if lost else ""),
+        "cache": cache_stats,
+        "deferred": deferred,
+        "lost_leases": lost,
+    }
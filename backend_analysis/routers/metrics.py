@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Xuất toàn bộ metric theo định dạng text của Prometheus."""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+
+from services.rollups import emotion_series
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+# Dashboard thường poll liên tục, kết quả được giữ lại trong thời gian ngắn
+TRENDS_TTL_SECONDS = 60
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _load_trends(interval: str, days: int, site: Optional[str]):
+    key = (interval, days, site)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1], cached[2]
+    end = datetime.now()
+    payload = {
+        "interval": interval,
+        "days": days,
+        "site": site,
+        "series": emotion_series(interval, end - timedelta(days=days), end, site)
+    }
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    with _cache_lock:
+        _cache[key] = (now + TRENDS_TTL_SECONDS, etag, body)
+    return etag, body
+
+@router.get("/trends")
+def get_trends(
+    request: Request,
+    interval: str = Query("day", description="Gộp theo 'day' hoặc 'week'"),
+    days: int = Query(30, ge=1, le=366),
+    site: Optional[str] = Query(None, description="Tên miền, ví dụ vnexpress.net")
+):
+    """
+    Chuỗi thời gian số bài đã phân tích theo cảm xúc, đọc từ bảng tổng hợp emotion_rollups.
+    Hỗ trợ ETag/If-None-Match và Cache-Control để dashboard poll với chi phí thấp.
+    """
+    if interval not in ("day", "week"):
+        raise HTTPException(status_code=400, detail="interval must be 'day' or 'week'")
+    etag, body = _load_trends(interval, days, site)
+    headers = {"ETag": etag, "Cache-Control": f"max-age={TRENDS_TTL_SECONDS}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
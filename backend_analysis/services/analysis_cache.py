@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import re
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import delete, select
+
+from db.database import AsyncSessionLocal
+from db.models import AnalysisCacheEntry
+from services.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger("analysis_cache")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Chuẩn hóa Unicode, chữ thường và khoảng trắng để các bản sao của cùng bài báo có cùng hash."""
+    text = unicodedata.normalize("NFC", text or "")
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def cache_key(text: str, version: str) -> str:
+    """Hash của nội dung đã chuẩn hóa cùng prompt + phiên bản model."""
+    digest = hashlib.sha256()
+    digest.update(version.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Cache kết quả phân tích hai tầng:
+      - LRU trong bộ nhớ tiến trình (memory_entries phần tử, cùng hạn ttl_days như trong DB),
+      - bảng analysis_cache trong DB, hết hạn sau ttl_days và giữ tối đa max_rows dòng.
+    Chỉ kết quả phân tích thành công mới được lưu.
+    """
+
+    def __init__(self, memory_entries: int = 10000, ttl_days: float = 30, max_rows: int = 100000):
+        self.memory_entries = memory_entries
+        self.ttl = timedelta(days=ttl_days)
+        self.max_rows = max_rows
+        # key -> (kết quả phân tích, created_at của dòng cache)
+        self._memory: "OrderedDict[str, Tuple[str, datetime]]" = OrderedDict()
+        # Bộ đếm tích lũy từ khi tiến trình khởi động
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def record(self, hit: bool):
+        """Đếm một lần tra cache (cả khi dùng kết quả của bài trùng nội dung đang phân tích)."""
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        CACHE_LOOKUPS.labels("hit" if hit else "miss").inc()
+
+    def _expired(self, created_at: Optional[datetime]) -> bool:
+        return created_at is not None and created_at < datetime.utcnow() - self.ttl
+
+    def _remember(self, key: str, analysis: str, created_at: datetime):
+        self._memory[key] = (analysis, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    async def _load(self, key: str) -> Optional[Tuple[str, datetime]]:
+        async with AsyncSessionLocal() as db:
+            entry = await db.get(AnalysisCacheEntry, key)
+            if entry is None or self._expired(entry.created_at):
+                return None
+            now = datetime.utcnow()
+            entry.last_used_at = now
+            await db.commit()
+            return entry.analysis, entry.created_at or now
+
+    async def _store(self, key: str, analysis: str, now: datetime):
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.merge(AnalysisCacheEntry(key=key, analysis=analysis, created_at=now, last_used_at=now))
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is not None and self._expired(entry[1]):
+            # Tiến trình chạy lâu: phần tử trong LRU cũng hết hạn như dòng trong DB
+            del self._memory[key]
+            entry = None
+        if entry is None:
+            entry = await self._load(key)
+            if entry is not None:
+                self._remember(key, *entry)
+        else:
+            self._memory.move_to_end(key)
+        self.record(entry is not None)
+        return entry[0] if entry is not None else None
+
+    async def put(self, key: str, analysis: str):
+        now = datetime.utcnow()
+        self._remember(key, analysis, now)
+        try:
+            await self._store(key, analysis, now)
+        except Exception as e:
+            # Cache chỉ để tiết kiệm chi phí, lỗi ghi cache không làm hỏng lần phân tích
+            logger.error(f"[Cache] Lỗi khi lưu cache: {e}")
+
+    async def evict(self) -> int:
+        """Xóa các dòng hết hạn và các dòng ít dùng nhất vượt quá max_rows."""
+        async with AsyncSessionLocal() as db:
+            try:
+                expired = (await db.execute(
+                    delete(AnalysisCacheEntry).where(AnalysisCacheEntry.created_at < datetime.utcnow() - self.ttl)
+                )).rowcount
+                overflow = (
+                    select(AnalysisCacheEntry.key)
+                    .order_by(AnalysisCacheEntry.last_used_at.desc())
+                    .offset(self.max_rows)
+                    .scalar_subquery()
+                )
+                evicted = (await db.execute(
+                    delete(AnalysisCacheEntry).where(AnalysisCacheEntry.key.in_(overflow))
+                )).rowcount
+                await db.commit()
+                return (expired or 0) + (evicted or 0)
+            except Exception:
+                await db.rollback()
+                raise
+
+
+_cache: Optional[AnalysisCache] = None
+
+
+def get_cache(config: Dict[str, Any]) -> Optional[AnalysisCache]:
+    """Cache dùng chung trong tiến trình theo mục "analysis.cache"; None nếu bị tắt."""
+    global _cache
+    if not config.get("enabled", True):
+        return None
+    if _cache is None:
+        _cache = AnalysisCache(
+            memory_entries=config.get("memory_entries", 10000),
+            ttl_days=config.get("ttl_days", 30),
+            max_rows=config.get("max_rows", 100000),
+        )
+    return _cache
@@ -0,0 +1,67 @@
+"""
+Backfill một lần cột crawled_data.emotion cho các bài đã phân tích trước khi có cột này.
+Chạy từ thư mục backend_analysis:
+
+    python -m services.backfill_emotions
+    python -m services.backfill_emotions --all   # tính lại cả các dòng đã có emotion
+"""
+from dotenv import load_dotenv
+import os
+# Load .env from the backend_analysis directory explicitly, before any other imports
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
+
+import argparse
+import logging
+from sqlalchemy import update
+
+from db.database import init_db, SessionLocal
+from db.models import CrawledData
+from services.emotions import emotion_code
+
+logger = logging.getLogger("backfill_emotions")
+
+BATCH_SIZE = 1000
+
+def backfill_emotions(batch_size=BATCH_SIZE, recompute=False):
+    """
+    Điền cột emotion theo từng lô id tăng dần; trả về số dòng đã cập nhật.
+    recompute=True tính lại cả các dòng đã có emotion (ví dụ sau khi đổi cách nhận diện nhãn).
+    """
+    db = SessionLocal()
+    updated = 0
+    last_id = 0
+    try:
+        while True:
+            query = db.query(CrawledData.id, CrawledData.analysis).filter(
+                CrawledData.id > last_id,
+                CrawledData.analyze_success == True
+            )
+            if not recompute:
+                query = query.filter(CrawledData.emotion.is_(None))
+            rows = query.order_by(CrawledData.id).limit(batch_size).all()
+            if not rows:
+                break
+            db.execute(update(CrawledData), [
+                {"id": row.id, "emotion": emotion_code(row.analysis)} for row in rows
+            ])
+            db.commit()
+            updated += len(rows)
+            last_id = rows[-1].id
+            logger.info(f"[Backfill] Đã cập nhật {updated} bài (id <= {last_id})")
+        return updated
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(description="Backfill cột crawled_data.emotion")
+    parser.add_argument("--all", action="store_true", help="tính lại cả các dòng đã có emotion")
+    args = parser.parse_args()
+    init_db()
+    logger.info(f"[Backfill] Hoàn tất, đã cập nhật {backfill_emotions(recompute=args.all)} bài.")
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger("batching")
+
+BatchHandler = Callable[[List[Any]], Awaitable[List[Any]]]
+
+
+class MicroBatcher:
+    """
+    Gom các yêu cầu gửi qua submit() thành batch: chờ tối đa max_wait_ms sau yêu cầu đầu tiên
+    hoặc đến khi đủ max_items phần tử, rồi gọi handler(items) -> kết quả theo đúng thứ tự.
+    Tối đa max_inflight batch được xử lý cùng lúc.
+    """
+
+    def __init__(self, handler: BatchHandler, max_items: int = 16, max_wait_ms: float = 10, max_inflight: int = 1):
+        self.handler = handler
+        self.max_items = max(1, max_items)
+        self.max_wait = max_wait_ms / 1000
+        self.max_inflight = max(1, max_inflight)
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self._batches: set = set()
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_inflight)
+        self.task = asyncio.create_task(self._run())
+
+    async def close(self):
+        tasks = [t for t in (self.task, *self._batches) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.task = None
+        self._batches.clear()
+
+    async def submit(self, item: Any) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        items = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(items) < self.max_items:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return items
+
+    async def _dispatch(self, items: List[Tuple[Any, asyncio.Future]]):
+        try:
+            results = await self.handler([item for item, _ in items])
+        except Exception as e:
+            logger.error(f"[Batch] Lỗi khi xử lý batch {len(items)} phần tử: {e}")
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            items = await self._collect()
+            task = asyncio.create_task(self._dispatch(items))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
@@ -0,0 +1,329 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.batching import MicroBatcher
+from services.deepseek import (
+    BATCH_SYSTEM_PROMPT, DEEPSEEK_API_KEY, DEEPSEEK_MODEL, SYSTEM_PROMPT,
+    DEFAULT_STREAMING_CONFIG, call_deepseek, call_deepseek_batch, estimate_tokens, pack_batches,
+)
+from services.llm_client import DEFAULT_LLM_CONFIG, LLMClient, get_llm_client
+
+logger = logging.getLogger("classifiers")
+
+# Nhãn của PhoBERT (NEG/POS/NEU) quy về danh mục cảm xúc dùng trong báo cáo
+PHOBERT_LABELS = {
+    "NEG": "Tiêu cực",
+    "POS": "Tích cực",
+    "NEU": "Trung lập",
+}
+
+
+class ClassifierBackend:
+    """
+    Giao diện chung cho các backend phân loại cảm xúc.
+    classify() trả về (nội dung ghi vào CrawledData.analysis, thành công hay không),
+    hoặc raise LLMUnavailable nếu tạm thời không phân loại được (bài báo được để lại chờ).
+    """
+    name = "base"
+    # Số worker tối thiểu ở giai đoạn phân loại để backend hoạt động hiệu quả
+    min_concurrency = 1
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @property
+    def available(self) -> bool:
+        """False khi backend tạm thời không nhận yêu cầu; lượt phân tích sẽ ngừng nhận thêm bài."""
+        return True
+
+    @property
+    def cache_version(self) -> str:
+        """Prompt + phiên bản model; đổi giá trị này sẽ vô hiệu hóa cache cũ."""
+        return self.name
+
+    async def classify(self, url: str, content: str) -> Tuple[str, bool]:
+        raise NotImplementedError
+
+
+class DeepSeekBackend(ClassifierBackend):
+    """
+    Gửi bài báo đến DeepSeek API (mặc định).
+    Khi bật batching, các bài ngắn được gom lại và gửi nhiều bài trong một yêu cầu
+    với kết quả JSON; bài không có kết quả hợp lệ được gửi lại riêng lẻ.
+    Dùng client LLM chung của tiến trình (services/llm_client.py): giới hạn đồng thời bắt đầu
+    từ `concurrency` và tự điều chỉnh trong khoảng của mục "analysis.llm".
+    Khi bật streaming, yêu cầu một bài được đọc dần và dừng ngay khi đủ nhãn và nhận xét.
+    """
+    name = "deepseek"
+
+    def __init__(self, concurrency: int = 4, batching: Optional[Dict[str, Any]] = None, llm: Optional[Dict[str, Any]] = None,
+                 streaming: Optional[Dict[str, Any]] = None):
+        if not DEEPSEEK_API_KEY:
+            raise Exception("Thiếu biến môi trường DEEPSEEK_API")
+        self.concurrency = concurrency
+        self.llm_config = {**DEFAULT_LLM_CONFIG, **(llm or {})}
+        # Đủ worker để limiter có thể tăng tới giới hạn tối đa
+        self.min_concurrency = self.llm_config["max_concurrency"]
+        self.client: Optional[LLMClient] = None
+        self.streaming = {**DEFAULT_STREAMING_CONFIG, **(streaming or {})}
+        batching = batching or {}
+        self.batching = batching.get("enabled", False)
+        self.max_articles = batching.get("max_articles", 8)
+        self.max_input_tokens = batching.get("max_input_tokens", 6000)
+        self.max_article_tokens = batching.get("max_article_tokens", 1500)
+        self.max_wait_ms = batching.get("max_wait_ms", 200)
+        self.batcher: Optional[MicroBatcher] = None
+        if self.batching:
+            # Cần đủ bài đang chờ để lấp đầy các yêu cầu gộp chạy song song
+            self.min_concurrency = self.max_articles * self.llm_config["max_concurrency"]
+
+    async def start(self):
+        self.client = await get_llm_client(self.llm_config, initial_concurrency=self.concurrency)
+        if self.batching:
+            # Số yêu cầu gộp thực sự chạy song song do limiter của client quyết định
+            self.batcher = MicroBatcher(
+                self._classify_batch,
+                max_items=self.max_articles,
+                max_wait_ms=self.max_wait_ms,
+                max_inflight=self.llm_config["max_concurrency"],
+            )
+            await self.batcher.start()
+
+    async def close(self):
+        if self.batcher is not None:
+            await self.batcher.close()
+            self.batcher = None
+        # Client LLM được giữ lại (cùng kết nối và giới hạn đã học) cho lượt phân tích sau
+        self.client = None
+
+    @property
+    def available(self) -> bool:
+        return self.client is None or self.client.available
+
+    @property
+    def cache_version(self) -> str:
+        # Streaming cắt báo cáo sau summary_sentences câu (tối đa max_tokens), còn bài đi qua yêu cầu
+        # gộp có prompt và định dạng báo cáo riêng: đổi các mục này thì kết quả cũ không còn dùng được
+        version = f"{self.name}:{DEEPSEEK_MODEL}:{SYSTEM_PROMPT}"
+        if self.streaming["enabled"]:
+            version += f":streaming={self.streaming['summary_sentences']},{self.streaming['max_tokens']}"
+        if self.batching:
+            version += f":batching={self.max_article_tokens}:{BATCH_SYSTEM_PROMPT}"
+        return version
+
+    async def _classify_batch(self, articles: List[Tuple[str, str]]) -> List[Optional[str]]:
+        # Nhóm chỉ có một bài thì không cần gộp, để classify() gửi riêng với prompt gốc
+        groups = [g for g in pack_batches(articles, self.max_articles, self.max_input_tokens) if len(g) > 1]
+        results: List[Optional[str]] = [None] * len(articles)
+        reports = await asyncio.gather(*(
+            call_deepseek_batch(self.client, [articles[i] for i in group]) for group in groups
+        ))
+        for group, group_reports in zip(groups, reports):
+            for i, report in zip(group, group_reports):
+                results[i] = report
+        return results
+
+    async def classify(self, url: str, content: str) -> Tuple[str, bool]:
+        if self.batcher is not None and estimate_tokens(content) <= self.max_article_tokens:
+            report = await self.batcher.submit((url, content))
+            if report is not None:
+                logger.info(f"[DeepSeek] Nhận báo cáo từ yêu cầu gộp cho URL {url}")
+                return report, True
+        return await call_deepseek(self.client, url, content, self.streaming)
+
+
+class PhoBertModel:
+    """
+    Model PhoBERT đã fine-tune, nạp một lần từ thư mục local và chạy trên CPU.
+    runtime="torch" chạy bằng PyTorch (tùy chọn lượng tử hóa int8 động),
+    runtime="onnx" xuất model sang ONNX và chạy bằng onnxruntime (tùy chọn int8).
+    """
+
+    def __init__(self, model_dir: str, runtime: str = "torch", quantize: bool = False,
+                 max_length: int = 256, num_threads: Optional[int] = None, segment: bool = True):
+        # Thư viện nặng chỉ cần khi dùng backend này
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.torch = torch
+        self.max_length = max_length
+        self.runtime = runtime
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+        model.eval()
+        self.id2label = {int(k): v for k, v in model.config.id2label.items()}
+        self.segmenter = self._load_segmenter() if segment else None
+
+        if runtime == "onnx":
+            self.session = self._export_onnx(model, model_dir, quantize)
+            self.model = None
+        else:
+            if quantize:
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.model = model
+            self.session = None
+
+    @staticmethod
+    def _load_segmenter():
+        # PhoBERT được huấn luyện trên văn bản đã tách từ (giống notebook dùng pyvi)
+        try:
+            from pyvi import ViTokenizer
+            return ViTokenizer.tokenize
+        except ImportError:
+            logger.warning("[PhoBERT] Không có pyvi, bỏ qua bước tách từ.")
+            return None
+
+    def _export_onnx(self, model, model_dir: str, quantize: bool):
+        import onnxruntime
+
+        onnx_path = os.path.join(model_dir, "model.onnx")
+        if not os.path.exists(onnx_path):
+            dummy = self.tokenizer(["xin chào"], return_tensors="pt")
+            self.torch.onnx.export(
+                model,
+                (dummy["input_ids"], dummy["attention_mask"]),
+                onnx_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "logits": {0: "batch"},
+                },
+                opset_version=14,
+            )
+        if quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantized_path = os.path.join(model_dir, "model.int8.onnx")
+            if not os.path.exists(quantized_path):
+                quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+            onnx_path = quantized_path
+        return onnxruntime.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+
+    def encode(self, texts: List[str]) -> List[List[int]]:
+        """Tách từ và token hóa (chưa padding) để nhóm theo độ dài."""
+        if self.segmenter is not None:
+            texts = [self.segmenter(text) for text in texts]
+        return self.tokenizer(texts, truncation=True, max_length=self.max_length, padding=False)["input_ids"]
+
+    def predict(self, batch_ids: List[List[int]]) -> List[str]:
+        """Chạy model trên một batch đã token hóa, trả về nhãn gốc của model."""
+        if self.session is not None:
+            encoded = self.tokenizer.pad({"input_ids": batch_ids}, return_tensors="np")
+            logits = self.session.run(["logits"], {
+                "input_ids": encoded["input_ids"].astype("int64"),
+                "attention_mask": encoded["attention_mask"].astype("int64"),
+            })[0]
+            predictions = logits.argmax(axis=-1).tolist()
+        else:
+            encoded = self.tokenizer.pad({"input_ids": batch_ids}, return_tensors="pt")
+            with self.torch.inference_mode():
+                logits = self.model(**encoded).logits
+            predictions = logits.argmax(dim=-1).tolist()
+        return [self.id2label[p] for p in predictions]
+
+    def predict_grouped(self, texts: List[str], batch_size: int) -> List[str]:
+        """Sắp xếp theo số token rồi cắt thành các batch batch_size để giảm padding."""
+        encoded = self.encode(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(encoded[i]))
+        labels: List[Optional[str]] = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            chunk = order[start:start + batch_size]
+            for i, label in zip(chunk, self.predict([encoded[i] for i in chunk])):
+                labels[i] = label
+        return labels
+
+
+# Model được nạp một lần cho mỗi tiến trình, dùng lại giữa các lần phân tích
+_models: Dict[Tuple, PhoBertModel] = {}
+_models_lock = threading.Lock()
+
+def load_phobert_model(model_dir: str, **options) -> PhoBertModel:
+    key = (os.path.abspath(model_dir), tuple(sorted(options.items())))
+    with _models_lock:
+        if key not in _models:
+            logger.info(f"[PhoBERT] Nạp model từ {model_dir} với {options}")
+            _models[key] = PhoBertModel(model_dir, **options)
+        return _models[key]
+
+
+class PhoBertBackend(ClassifierBackend):
+    """Phân loại cảm xúc bằng PhoBERT chạy local trên CPU, gom batch tự động."""
+    name = "phobert"
+
+    def __init__(self, model_dir: str, runtime: str = "torch", quantize: bool = False,
+                 max_length: int = 256, num_threads: Optional[int] = None, segment: bool = True,
+                 max_batch_size: int = 16, max_wait_ms: float = 10):
+        self.model_dir = model_dir
+        self.model_options = dict(runtime=runtime, quantize=quantize, max_length=max_length,
+                                  num_threads=num_threads, segment=segment)
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        # Cần đủ yêu cầu đồng thời để lấp đầy batch trong khi batch trước đang chạy
+        self.min_concurrency = max_batch_size * 2
+        self.batcher: Optional[MicroBatcher] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        model = await loop.run_in_executor(None, lambda: load_phobert_model(self.model_dir, **self.model_options))
+        # Suy luận chạy trên một thread riêng để không block event loop
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="phobert")
+
+        async def infer(texts: List[str]) -> List[str]:
+            return await loop.run_in_executor(self.executor, model.predict_grouped, texts, self.max_batch_size)
+
+        # Lấy tối đa vài batch trong cửa sổ chờ để có đủ mẫu cho việc nhóm theo độ dài
+        self.batcher = MicroBatcher(infer, max_items=self.max_batch_size * 4, max_wait_ms=self.max_wait_ms)
+        await self.batcher.start()
+
+    async def close(self):
+        if self.batcher is not None:
+            await self.batcher.close()
+            self.batcher = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    @property
+    def cache_version(self) -> str:
+        options = ",".join(f"{k}={v}" for k, v in sorted(self.model_options.items()) if k != "num_threads")
+        return f"{self.name}:{os.path.abspath(self.model_dir)}:{options}"
+
+    async def classify(self, url: str, content: str) -> Tuple[str, bool]:
+        try:
+            label = await self.batcher.submit(content)
+        except Exception as e:
+            logger.error(f"[PhoBERT] Lỗi khi phân loại URL {url}: {e}")
+            return f"[ERROR] PhoBERT lỗi: {e}", False
+        emotion = PHOBERT_LABELS.get(label.upper()[:3], label)
+        return f"Cảm xúc chủ đạo: {emotion}", True
+
+
+def create_backend(config: Dict[str, Any]) -> ClassifierBackend:
+    """Tạo backend theo mục "analysis" trong config/websites.json."""
+    backend = config.get("backend", "deepseek")
+    if backend == "deepseek":
+        return DeepSeekBackend(
+            concurrency=config.get("llm_concurrency", 4),
+            batching=config.get("batching"),
+            llm=config.get("llm"),
+            streaming=config.get("streaming"),
+        )
+    if backend == "phobert":
+        options = dict(config.get("phobert", {}))
+        model_dir = options.pop("model_dir", None)
+        if not model_dir:
+            raise Exception("Thiếu cấu hình analysis.phobert.model_dir")
+        return PhoBertBackend(model_dir, **options)
+    raise ValueError(f"Backend phân tích không hợp lệ: {backend}")
@@ -0,0 +1,49 @@
+import base64
+import logging
+import zlib
+from typing import Optional
+
+from services.extractors import ExtractorRegistry, extract_article
+
+logger = logging.getLogger("content")
+
+# Tiền tố đánh dấu giá trị đã nén trong cột `contents` (xem backend_crawling/utils/content.py):
+# trang HTML của bài báo, hoặc văn bản đã trích (các bài crawl trước khi lưu trang)
+PAGE_PREFIX = "zhtml:"
+COMPRESSED_PREFIX = "zlib:"
+
+# Trang được lưu dưới dạng UTF-8, bất kể charset khai báo trong trang
+PAGE_ENCODING = "utf-8"
+
+def _inflate(packed: str) -> Optional[bytes]:
+    try:
+        return zlib.decompress(base64.b64decode(packed))
+    except (ValueError, zlib.error) as e:
+        logger.error(f"[Content] Không giải nén được nội dung đã lưu: {e}")
+        return None
+
+def decompress_page(stored: Optional[str]) -> Optional[bytes]:
+    """HTML (PAGE_ENCODING) của trang bài báo đã lưu lúc crawl; None khi cột không chứa trang."""
+    if not stored or not stored.startswith(PAGE_PREFIX):
+        return None
+    return _inflate(stored[len(PAGE_PREFIX):])
+
+def decompress_text(stored: Optional[str]) -> str:
+    """
+    Giải nén văn bản bài báo được lưu trong cột `contents`.
+    Giá trị không có tiền tố được coi là văn bản thường; trang HTML (xem decompress_page)
+    và lỗi giải nén trả về chuỗi rỗng.
+    """
+    if not stored or stored.startswith(PAGE_PREFIX):
+        return ""
+    if not stored.startswith(COMPRESSED_PREFIX):
+        return stored
+    text = _inflate(stored[len(COMPRESSED_PREFIX):])
+    return text.decode("utf-8") if text is not None else ""
+
+def stored_text(url: str, stored: Optional[str], extractors: ExtractorRegistry) -> str:
+    """Nội dung bài báo từ cột `contents`: trang đã lưu được trích bằng extractor của site, như khi tải về."""
+    page = decompress_page(stored)
+    if page is not None:
+        return extract_article(url, page, PAGE_ENCODING, extractors.spec_for(url))[0]
+    return decompress_text(stored)
@@ -0,0 +1,256 @@
+"""
+Phát hiện bài gần trùng giữa các báo (cùng một tin thông tấn được Dân Trí, VnExpress, VietnamNet
+đăng lại với vài chỉnh sửa) để dùng lại kết quả phân tích thay vì gọi LLM cho từng bản.
+
+  - Chữ ký MinHash theo kiểu one permutation hashing: mỗi shingle (shingle_size âm tiết liên tiếp)
+    được băm một lần, giá trị băm chia vào NUM_BINS ngăn theo các bit cao và mỗi ngăn giữ giá trị
+    nhỏ nhất; ngăn rỗng được lấp từ ngăn kề (densification). Tỉ lệ ngăn bằng nhau giữa hai chữ ký
+    ước lượng độ tương đồng Jaccard của hai tập shingle. Chữ ký (256 byte) được lưu vào
+    crawled_data.minhash để nạp lại chỉ mục khi khởi động mà không phải đọc lại nội dung bài.
+  - LSH: đầu chữ ký chia thành BANDS band, mỗi band là khóa của một dict; chỉ các bài trùng ít nhất
+    một band mới được so sánh đầy đủ, nên tra cứu chỉ tốn vài chục phép tra dict.
+  - Chỉ mục giữ các bài của window_days ngày gần nhất và tối đa max_entries bài (bộ nhớ có giới hạn).
+
+Mỗi nhóm bài gần trùng (cluster) lấy id của bài đầu tiên làm cluster_id, lưu vào
+crawled_data.cluster_id để báo cáo đếm theo câu chuyện thay vì theo URL.
+Cấu hình trong mục "analysis.dedup" của config/websites.json.
+"""
+import logging
+import re
+import zlib
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import select
+
+from db.database import AsyncSessionLocal
+from db.models import CrawledData
+from services.analysis_cache import normalize_text
+from services.metrics import DEDUP_INDEX_ENTRIES
+
+logger = logging.getLogger("dedup")
+
+DEFAULT_DEDUP_CONFIG = {
+    "enabled": True,
+    "window_days": 3,
+    "max_entries": 20000,
+    "shingle_size": 3,
+    "similarity": 0.5,
+    "min_shingles": 50,
+}
+
+NUM_BINS = 64
+# LSH dùng 16 band x 2 ngăn đầu của chữ ký: cặp có Jaccard 0.5 trùng ít nhất một band với xác suất 99%;
+# độ tương đồng vẫn được ước lượng trên cả 64 ngăn
+BANDS = 16
+ROWS = 2
+# 6 bit cao của giá trị băm 32 bit chọn ngăn, 26 bit còn lại là giá trị so sánh
+_BIN_SHIFT = 26
+_VALUE_MASK = (1 << _BIN_SHIFT) - 1
+_EMPTY = 0xFFFFFFFF
+_MASK32 = 0xFFFFFFFF
+_BAND_BYTES = ROWS * 4
+
+_WORDS = re.compile(r"\w+")
+
+
+def minhash(text: str, shingle_size: int = 3, min_shingles: int = 50) -> Optional[bytes]:
+    """Chữ ký MinHash của văn bản; None nếu quá ngắn để so sánh tin cậy."""
+    words = _WORDS.findall(normalize_text(text))
+    crc = zlib.crc32
+    # crc32 (C) rồi nhân với hằng số lẻ để các bit cao (chọn ngăn) phụ thuộc mọi bit
+    hashes = {
+        (crc(" ".join(words[i:i + shingle_size]).encode("utf-8")) * 0x9E3779B1) & _MASK32
+        for i in range(len(words) - shingle_size + 1)
+    }
+    if len(hashes) < min_shingles:
+        return None
+    bins = [_EMPTY] * NUM_BINS
+    for value in hashes:
+        position = value >> _BIN_SHIFT
+        value &= _VALUE_MASK
+        if value < bins[position]:
+            bins[position] = value
+    # Densification: ngăn rỗng lấy giá trị của ngăn không rỗng kế tiếp (vòng tròn), kèm khoảng cách
+    filled = [i for i in range(NUM_BINS) if bins[i] != _EMPTY]
+    if len(filled) < NUM_BINS:
+        signature = list(bins)
+        for i in range(NUM_BINS):
+            if bins[i] == _EMPTY:
+                distance = 1
+                while bins[(i + distance) % NUM_BINS] == _EMPTY:
+                    distance += 1
+                signature[i] = (bins[(i + distance) % NUM_BINS] + (distance << _BIN_SHIFT)) & _MASK32
+        bins = signature
+    return array("I", bins).tobytes()
+
+
+def similarity(a: bytes, b: bytes) -> float:
+    """Ước lượng độ tương đồng Jaccard từ hai chữ ký."""
+    return sum(x == y for x, y in zip(array("I", a), array("I", b))) / NUM_BINS
+
+
+def _band_keys(signature: bytes) -> List[int]:
+    # hash() của bytes đổi theo tiến trình nhưng chỉ mục chỉ nằm trong bộ nhớ nên không sao
+    return [hash(signature[i:i + _BAND_BYTES]) for i in range(0, BANDS * _BAND_BYTES, _BAND_BYTES)]
+
+
+@dataclass
+class DuplicateMatch:
+    article_id: int
+    cluster_id: int
+    similarity: float
+    analysis: Optional[str]  # None nếu chưa bài nào trong nhóm được phân tích thành công
+
+
+class DuplicateIndex:
+    """Chỉ mục LSH trong bộ nhớ của các bài gần đây: article_id -> (cluster_id, chữ ký, thời điểm thêm)."""
+
+    def __init__(self, window_days: float = 3, max_entries: int = 20000, shingle_size: int = 3,
+                 similarity: float = 0.5, min_shingles: int = 50):
+        self.window = timedelta(days=window_days)
+        self.max_entries = max_entries
+        self.shingle_size = shingle_size
+        self.threshold = similarity
+        self.min_shingles = min_shingles
+        self._entries: "OrderedDict[int, Tuple[int, bytes, datetime]]" = OrderedDict()
+        # Mỗi band: khóa -> article_id, hoặc list article_id khi có nhiều bài (phần lớn khóa chỉ có một bài)
+        self._bands: List[Dict[int, Union[int, List[int]]]] = [{} for _ in range(BANDS)]
+        # Kết quả phân tích của mỗi nhóm, cùng số bài của nhóm còn trong chỉ mục
+        self._analyses: Dict[int, str] = {}
+        self._members: Dict[int, int] = {}
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def signature(self, text: str) -> Optional[bytes]:
+        return minhash(text, self.shingle_size, self.min_shingles)
+
+    def lookup(self, signature: bytes) -> Optional[DuplicateMatch]:
+        """Bài gần trùng nhất (độ tương đồng >= similarity) trong chỉ mục, None nếu không có."""
+        candidates = set()
+        for band, key in zip(self._bands, _band_keys(signature)):
+            bucket = band.get(key)
+            if bucket is None:
+                continue
+            if type(bucket) is int:
+                candidates.add(bucket)
+            else:
+                candidates.update(bucket)
+        best: Optional[DuplicateMatch] = None
+        for article_id in candidates:
+            cluster_id, other, _ = self._entries[article_id]
+            score = similarity(signature, other)
+            if score >= self.threshold and (best is None or score > best.similarity):
+                best = DuplicateMatch(article_id, cluster_id, score, None)
+        if best is not None:
+            best.analysis = self._analyses.get(best.cluster_id)
+        return best
+
+    def add(self, article_id: int, cluster_id: int, signature: bytes, added_at: Optional[datetime] = None):
+        if article_id in self._entries:
+            return
+        added_at = added_at or datetime.utcnow()
+        self._entries[article_id] = (cluster_id, signature, added_at)
+        for band, key in zip(self._bands, _band_keys(signature)):
+            bucket = band.get(key)
+            if bucket is None:
+                band[key] = article_id
+            elif type(bucket) is int:
+                band[key] = [bucket, article_id]
+            else:
+                bucket.append(article_id)
+        self._members[cluster_id] = self._members.get(cluster_id, 0) + 1
+        self.evict(added_at)
+
+    def set_analysis(self, cluster_id: int, analysis: str):
+        """Ghi kết quả phân tích đầu tiên của nhóm (các bài sau trong nhóm dùng lại kết quả này)."""
+        if cluster_id in self._members:
+            self._analyses.setdefault(cluster_id, analysis)
+
+    def _remove(self, article_id: int):
+        cluster_id, signature, _ = self._entries.pop(article_id)
+        for band, key in zip(self._bands, _band_keys(signature)):
+            bucket = band[key]
+            if type(bucket) is int:
+                del band[key]
+            else:
+                bucket.remove(article_id)
+                if len(bucket) == 1:
+                    band[key] = bucket[0]
+        self._members[cluster_id] -= 1
+        if not self._members[cluster_id]:
+            del self._members[cluster_id]
+            self._analyses.pop(cluster_id, None)
+
+    def evict(self, now: Optional[datetime] = None) -> int:
+        """Bỏ các bài cũ hơn cửa sổ thời gian hoặc vượt quá max_entries (bài cũ nhất trước)."""
+        cutoff = (now or datetime.utcnow()) - self.window
+        evicted = 0
+        while self._entries:
+            article_id, (_, _, added_at) = next(iter(self._entries.items()))
+            if added_at >= cutoff and len(self._entries) <= self.max_entries:
+                break
+            self._remove(article_id)
+            evicted += 1
+        return evicted
+
+    async def load_recent(self) -> int:
+        """Nạp chữ ký và kết quả phân tích các bài trong cửa sổ thời gian từ DB (chạy một lần khi khởi động)."""
+        since = datetime.utcnow() - self.window
+        # Chỉ thử một lần: nếu DB lỗi thì chạy tiếp với chỉ mục rỗng
+        self.loaded = True
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(CrawledData.id, CrawledData.cluster_id, CrawledData.minhash, CrawledData.analyzed_at)
+                .where(
+                    CrawledData.minhash.isnot(None),
+                    CrawledData.cluster_id.isnot(None),
+                    CrawledData.analyzed_at >= since,
+                )
+                .order_by(CrawledData.analyzed_at.desc())
+                .limit(self.max_entries)
+            )).all()
+            for row in reversed(rows):
+                analyzed_at = row.analyzed_at.replace(tzinfo=None) if row.analyzed_at.tzinfo else row.analyzed_at
+                self.add(row.id, row.cluster_id, row.minhash, analyzed_at)
+            # Kết quả phân tích đầu tiên của mỗi nhóm còn trong chỉ mục
+            analyses = await db.stream(
+                select(CrawledData.cluster_id, CrawledData.analysis)
+                .where(
+                    CrawledData.cluster_id.isnot(None),
+                    CrawledData.analyze_success == True,
+                    CrawledData.analyzed_at >= since,
+                )
+                .order_by(CrawledData.analyzed_at)
+                .execution_options(yield_per=1000)
+            )
+            async for row in analyses:
+                self.set_analysis(row.cluster_id, row.analysis)
+        logger.info(f"[Dedup] Đã nạp {len(self._entries)} bài, {len(self._analyses)} nhóm có kết quả phân tích.")
+        return len(self._entries)
+
+
+_index: Optional[DuplicateIndex] = None
+
+
+def get_duplicate_index(config: Dict[str, Any]) -> Optional[DuplicateIndex]:
+    """Chỉ mục dùng chung trong tiến trình theo mục "analysis.dedup"; None nếu bị tắt."""
+    global _index
+    config = {**DEFAULT_DEDUP_CONFIG, **(config or {})}
+    if not config["enabled"]:
+        return None
+    if _index is None:
+        _index = DuplicateIndex(
+            window_days=config["window_days"],
+            max_entries=config["max_entries"],
+            shingle_size=config["shingle_size"],
+            similarity=config["similarity"],
+            min_shingles=config["min_shingles"],
+        )
+        DEDUP_INDEX_ENTRIES.set_function(_index.__len__)
+    return _index
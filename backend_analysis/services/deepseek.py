@@ -0,0 +1,348 @@
+import os
+import re
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from services.emotions import EMOTION_CATEGORIES, find_emotion
+from services.llm_client import LLMClient, LLMUnavailable
+from services.metrics import LLM_RESULT_SECONDS, LLM_STREAMS, record_usage
+from services.prompts import estimate_tokens
+
+logger = logging.getLogger("deepseek")
+
+# Lấy API key DeepSeek từ biến môi trường (đã load từ file .env trong main.py)
+DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API")
+DEEPSEEK_MODEL = "deepseek-chat"
+DEEPSEEK_URL = "https://api.deepseek.com/chat/completions"
+
+SYSTEM_PROMPT = "Bạn là một chuyên gia phân tích tin tức. Nhiệm vụ của bạn là **đọc kỹ bài báo sau và xác định cảm xúc chủ đạo** mà nó truyền tải. Hãy **phân loại cảm xúc này vào một trong các danh mục sau:** [Tích cực, Tiêu cực, Trung lập, Hài hước, Phẫn nộ, Bất ngờ, Buồn bã]. Sau khi phân loại, hãy **đưa ra một nhận xét tổng quan ngắn gọn (tối đa 2 câu)** về nội dung chính của bài báo, **dựa trên cảm xúc bạn đã xác định**."
+
+BATCH_SYSTEM_PROMPT = "Bạn là một chuyên gia phân tích tin tức. Bạn sẽ nhận nhiều bài báo, mỗi bài bắt đầu bằng dòng \"### Bài <id>\". Với **từng bài**, hãy xác định cảm xúc chủ đạo và **phân loại vào một trong các danh mục sau:** [Tích cực, Tiêu cực, Trung lập, Hài hước, Phẫn nộ, Bất ngờ, Buồn bã], sau đó **đưa ra một nhận xét tổng quan ngắn gọn (tối đa 2 câu)** dựa trên cảm xúc đã xác định. Chỉ trả lời bằng JSON theo đúng dạng: {\"results\": [{\"id\": <id>, \"emotion\": \"<danh mục>\", \"summary\": \"<nhận xét>\"}]}, mỗi bài đúng một phần tử."
+
+# Số token đầu ra dự trù cho mỗi bài trong một yêu cầu gộp
+BATCH_OUTPUT_TOKENS_PER_ARTICLE = 200
+
+DEFAULT_STREAMING_CONFIG = {
+    "enabled": True,
+    "max_tokens": 300,
+    "summary_sentences": 2,
+}
+
+# Một câu kết thúc bằng dấu câu và đã có khoảng trắng phía sau (câu chắc chắn đã xong)
+_SENTENCE = re.compile(r"[^.!?…\n]*[.!?…]+(?=\s)")
+# Câu ít chữ hơn (ví dụ "**." sau nhãn cảm xúc) không tính là câu nhận xét
+_MIN_SENTENCE_WORDS = 4
+
+
+async def post_completion(client: LLMClient, payload: Dict[str, Any], label: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Gửi payload đến DeepSeek API (thử lại khi gặp lỗi tạm thời).
+    Trả về (dữ liệu JSON, None) nếu thành công hoặc (None, thông báo lỗi [ERROR]) nếu yêu cầu bị từ chối;
+    raise LLMUnavailable khi API tạm thời không dùng được.
+    """
+    response = await client.post(
+        DEEPSEEK_URL,
+        label,
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {DEEPSEEK_API_KEY}"
+        },
+        json=payload
+    )
+    if response.status_code != 200:
+        logger.error(f"[DeepSeek] Error for {label} - Status Code: {response.status_code}")
+        logger.error(f"[DeepSeek] Response: {response.text}")
+        return None, f"[ERROR] DeepSeek API lỗi: {response.status_code}"
+
+    try:
+        data = response.json()
+    except ValueError as e:
+        logger.error(f"[DeepSeek] Phản hồi không phải JSON cho {label}: {e}")
+        return None, "[ERROR] DeepSeek API trả về phản hồi không hợp lệ."
+    record_usage(data)
+    return data, None
+
+
+class StreamedReport:
+    """
+    Ghép nội dung của phản hồi stream theo từng đoạn. Đủ (complete) khi đã thấy nhãn cảm xúc và
+    sau nhãn đã có summary_sentences câu nhận xét, hoặc khi đã nhận max_tokens đoạn (mỗi đoạn ~1 token).
+    """
+
+    def __init__(self, summary_sentences: int = 2, max_tokens: int = 300):
+        self.summary_sentences = summary_sentences
+        self.max_tokens = max_tokens
+        self.text = ""
+        self.chunks = 0
+        self.emotion: Optional[str] = None
+        self.usage: Optional[Dict[str, Any]] = None
+        self._emotion_end = 0
+
+    def feed(self, delta: str) -> bool:
+        self.text += delta
+        self.chunks += 1
+        if self.emotion is None:
+            found = find_emotion(self.text)
+            if found:
+                self.emotion, _, self._emotion_end = found
+        return self.complete
+
+    def _summary_end(self) -> Optional[int]:
+        """Vị trí kết thúc câu nhận xét thứ summary_sentences sau nhãn cảm xúc, None nếu chưa đủ."""
+        if self.emotion is None:
+            return None
+        found = 0
+        for match in _SENTENCE.finditer(self.text, self._emotion_end):
+            if len(match.group().split()) >= _MIN_SENTENCE_WORDS:
+                found += 1
+                if found >= self.summary_sentences:
+                    return match.end()
+        return None
+
+    @property
+    def summary_done(self) -> bool:
+        return self._summary_end() is not None
+
+    @property
+    def complete(self) -> bool:
+        return self.chunks >= self.max_tokens or self.summary_done
+
+    @property
+    def result(self) -> str:
+        """Báo cáo lưu vào DB: bỏ phần của câu tiếp theo đã nhận sau khi đủ nhận xét."""
+        end = self._summary_end()
+        return (self.text[:end] if end is not None else self.text).strip()
+
+
+async def stream_completion(client: LLMClient, payload: Dict[str, Any], label: str, summary_sentences: int, started: float) -> Tuple[Optional[StreamedReport], Optional[str]]:
+    """
+    Gửi payload với "stream": true và đọc các sự kiện SSE khi chúng tới; đóng stream ngay khi
+    báo cáo đủ. Trả về (báo cáo, None) hoặc (None, thông báo lỗi [ERROR]) như post_completion.
+    started (time.perf_counter()) là mốc tính thời gian tới khi có nhãn cảm xúc.
+    """
+
+    async def consume(response: httpx.Response) -> StreamedReport:
+        report = StreamedReport(summary_sentences, payload["max_tokens"])
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            if chunk.get("usage"):
+                report.usage = chunk["usage"]
+            for choice in chunk.get("choices") or []:
+                delta = (choice.get("delta") or {}).get("content")
+                if not delta:
+                    continue
+                had_emotion = report.emotion is not None
+                complete = report.feed(delta)
+                if not had_emotion and report.emotion is not None:
+                    LLM_RESULT_SECONDS.labels("emotion").observe(time.perf_counter() - started)
+                if complete:
+                    # Đủ nhãn và nhận xét (hoặc chạm giới hạn token): bỏ phần còn lại của câu trả lời
+                    LLM_STREAMS.labels("summary" if report.summary_done else "token_cap").inc()
+                    return report
+        LLM_STREAMS.labels("complete").inc()
+        return report
+
+    response, report = await client.stream(
+        DEEPSEEK_URL,
+        label,
+        consume,
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {DEEPSEEK_API_KEY}"
+        },
+        json=payload
+    )
+    if response.status_code != 200:
+        logger.error(f"[DeepSeek] Error for {label} - Status Code: {response.status_code}")
+        logger.error(f"[DeepSeek] Response: {response.text}")
+        return None, f"[ERROR] DeepSeek API lỗi: {response.status_code}"
+
+    if report.usage:
+        record_usage({"usage": report.usage})
+    else:
+        # Stream bị đóng trước đoạn cuối (chứa usage): ước lượng, mỗi đoạn nội dung ~1 token
+        prompt = "".join(message["content"] for message in payload["messages"])
+        record_usage({"usage": {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": report.chunks}})
+    return report, None
+
+
+async def call_deepseek(client: LLMClient, url: str, content: str, streaming: Optional[Dict[str, Any]] = None) -> Tuple[str, bool]:
+    """
+    Gửi nội dung bài báo đến DeepSeek API.
+    Trả về (báo cáo phân tích, thành công hay không); lỗi được ghi vào báo cáo với tiền tố [ERROR].
+    LLMUnavailable được raise cho nơi gọi để bài báo được để lại chờ lượt sau.
+    Với streaming (mục "analysis.streaming"), câu trả lời được đọc dần và dừng ngay khi đã có
+    nhãn cảm xúc và đủ số câu nhận xét, hoặc khi chạm max_tokens.
+    """
+    streaming = streaming if streaming and streaming.get("enabled") else None
+    # Xây dựng payload cho DeepSeek API
+    payload = {
+        "model": DEEPSEEK_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": content
+            }
+        ],
+        "max_tokens": streaming["max_tokens"] if streaming else 2048,
+        "temperature": 1,
+        "top_p": 1,
+        "frequency_penalty": 0,
+        "presence_penalty": 0,
+        "stream": streaming is not None,
+        "response_format": {"type": "text"}
+    }
+    if streaming:
+        payload["stream_options"] = {"include_usage": True}
+
+    logger.info(f"[DeepSeek] Payload cho URL {url}: {json.dumps(payload, ensure_ascii=False)}")
+    started = time.perf_counter()
+    if streaming:
+        report, error = await stream_completion(client, payload, f"URL {url}", streaming["summary_sentences"], started)
+        if error:
+            return error, False
+        LLM_RESULT_SECONDS.labels("result").observe(time.perf_counter() - started)
+        analysis_report = report.result
+        if not analysis_report:
+            logger.error(f"[DeepSeek] Stream không có nội dung cho URL {url}")
+            return "[ERROR] Không trích xuất được báo cáo từ DeepSeek API.", False
+        logger.info(f"[DeepSeek] Nhận báo cáo thành công cho URL {url} ({report.chunks} đoạn, cảm xúc: {report.emotion})")
+        return analysis_report, True
+
+    data, error = await post_completion(client, payload, f"URL {url}")
+    if error:
+        return error, False
+
+    try:
+        analysis_report = data["choices"][0]["message"]["content"]
+        elapsed = time.perf_counter() - started
+        LLM_RESULT_SECONDS.labels("emotion").observe(elapsed)
+        LLM_RESULT_SECONDS.labels("result").observe(elapsed)
+        logger.info(f"[DeepSeek] Nhận báo cáo thành công cho URL {url}")
+        return analysis_report, True
+    except (KeyError, IndexError) as e:
+        logger.error(f"[DeepSeek] Lỗi khi trích xuất báo cáo cho URL {url}: {e}")
+        logger.error(f"[DeepSeek] Full response: {json.dumps(data, indent=2)}")
+        return "[ERROR] Không trích xuất được báo cáo từ DeepSeek API.", False
+
+
+def format_batch_analysis(emotion: str, summary: str) -> str:
+    """Định dạng kết quả của một bài trong yêu cầu gộp thành báo cáo lưu vào DB."""
+    return f"Cảm xúc chủ đạo: {emotion}. {summary.strip()}"
+
+
+def parse_batch_results(text: str, ids: List[int]) -> Dict[int, str]:
+    """
+    Kiểm tra kết quả JSON của yêu cầu gộp.
+    Chỉ trả về các bài có id hợp lệ, cảm xúc thuộc danh mục và nhận xét không rỗng.
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return {}
+    items = data.get("results") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return {}
+
+    expected = set(ids)
+    results: Dict[int, str] = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            item_id = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        emotion = item.get("emotion")
+        summary = item.get("summary")
+        if item_id not in expected or item_id in results:
+            continue
+        if emotion not in EMOTION_CATEGORIES or not isinstance(summary, str) or not summary.strip():
+            continue
+        results[item_id] = format_batch_analysis(emotion, summary)
+    return results
+
+
+async def call_deepseek_batch(client: LLMClient, articles: List[Tuple[str, str]]) -> List[Optional[str]]:
+    """
+    Gửi nhiều bài báo (url, nội dung) trong một yêu cầu và yêu cầu kết quả JSON.
+    Trả về báo cáo cho từng bài theo thứ tự; None với bài cần phân tích lại riêng lẻ
+    (kể cả khi API tạm thời không dùng được, lời gọi riêng lẻ sẽ quyết định để lại chờ).
+    """
+    ids = list(range(1, len(articles) + 1))
+    user_content = "\n\n".join(f"### Bài {i}\n{content}" for i, (_, content) in zip(ids, articles))
+    payload = {
+        "model": DEEPSEEK_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": BATCH_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": user_content
+            }
+        ],
+        "max_tokens": min(8192, BATCH_OUTPUT_TOKENS_PER_ARTICLE * len(articles) + 100),
+        "temperature": 1,
+        "top_p": 1,
+        "frequency_penalty": 0,
+        "presence_penalty": 0,
+        "stream": False,
+        "response_format": {"type": "json_object"}
+    }
+
+    urls = [url for url, _ in articles]
+    logger.info(f"[DeepSeek] Gửi yêu cầu gộp {len(articles)} bài: {urls}")
+    try:
+        data, error = await post_completion(client, payload, f"yêu cầu gộp {len(articles)} bài")
+    except LLMUnavailable as e:
+        logger.warning(f"[DeepSeek] Yêu cầu gộp không gửi được ({e}), các bài sẽ được gửi riêng.")
+        return [None] * len(articles)
+    if error:
+        return [None] * len(articles)
+
+    try:
+        text = data["choices"][0]["message"]["content"]
+    except (KeyError, IndexError) as e:
+        logger.error(f"[DeepSeek] Lỗi khi trích xuất kết quả gộp: {e}")
+        return [None] * len(articles)
+
+    results = parse_batch_results(text, ids)
+    if len(results) < len(articles):
+        logger.warning(f"[DeepSeek] Yêu cầu gộp chỉ có {len(results)}/{len(articles)} kết quả hợp lệ, các bài còn lại sẽ được gửi riêng.")
+    return [results.get(i) for i in ids]
+
+
+def pack_batches(articles: List[Tuple[str, str]], max_articles: int, max_input_tokens: int) -> List[List[int]]:
+    """Chia các bài (theo chỉ số) thành nhóm không vượt quá số bài và ngân sách token đầu vào."""
+    budget = max_input_tokens - estimate_tokens(BATCH_SYSTEM_PROMPT)
+    groups: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for index, (_, content) in enumerate(articles):
+        tokens = estimate_tokens(content)
+        if current and (len(current) >= max_articles or used + tokens > budget):
+            groups.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += tokens
+    if current:
+        groups.append(current)
+    return groups
@@ -0,0 +1,43 @@
+from typing import Optional, Tuple
+
+# Emotion categories (Vietnamese)
+EMOTION_CATEGORIES = [
+    "Tích cực", "Tiêu cực", "Trung lập", "Hài hước", "Phẫn nộ", "Bất ngờ", "Buồn bã"
+]
+
+UNKNOWN_EMOTION = "Không xác định"
+
+# Mã số lưu trong cột crawled_data.emotion
+EMOTION_CODES = {emotion: code for code, emotion in enumerate(EMOTION_CATEGORIES)}
+UNKNOWN_EMOTION_CODE = -1
+
+_EMOTIONS_LOWER = [emotion.lower() for emotion in EMOTION_CATEGORIES]
+
+def find_emotion(analysis_text) -> Optional[Tuple[str, int, int]]:
+    """
+    Nhãn cảm xúc xuất hiện sớm nhất trong văn bản, cùng vị trí bắt đầu và kết thúc; None nếu không có.
+    Dùng chung cho báo cáo đang stream, cột emotion và báo cáo để cùng một văn bản luôn cho cùng một nhãn.
+    """
+    text = (analysis_text or '').lower()
+    found = None
+    for index, key in enumerate(_EMOTIONS_LOWER):
+        position = text.find(key)
+        if position >= 0 and (found is None or position < found[0]):
+            found = (position, index)
+    if found is None:
+        return None
+    position, index = found
+    return EMOTION_CATEGORIES[index], position, position + len(_EMOTIONS_LOWER[index])
+
+def extract_emotion(analysis_text):
+    found = find_emotion(analysis_text)
+    return found[0] if found else UNKNOWN_EMOTION
+
+def emotion_code(analysis_text) -> int:
+    """Phân tích nhãn cảm xúc một lần để lưu vào cột emotion."""
+    return EMOTION_CODES.get(extract_emotion(analysis_text), UNKNOWN_EMOTION_CODE)
+
+def emotion_name(code: Optional[int]) -> str:
+    if code is None or not 0 <= code < len(EMOTION_CATEGORIES):
+        return UNKNOWN_EMOTION
+    return EMOTION_CATEGORIES[code]
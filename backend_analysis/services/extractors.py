@@ -0,0 +1,179 @@
+"""
+Trích nội dung bài báo theo từng site bằng CSS selector khai báo trong config/websites.json,
+chỉ dùng Newspaper3k cho site chưa khai báo hoặc khi selector không khớp.
+
+Cấu hình của một site (mục "extractor" trong website tương ứng):
+
+    "extractor": {
+        "lead": ["p.description"],            # đoạn mở đầu (sapo), không bắt buộc
+        "body": ["article.fck_detail"],       # thử lần lượt, lấy phần tử đầu tiên khớp
+        "paragraphs": "p.Normal",             # các đoạn văn trong body
+        "drop": ["figure", "table"],          # các phần tử bỏ đi trước khi lấy chữ
+        "min_chars": 200                      # ít hơn thì coi là trượt và chuyển sang Newspaper3k
+    }
+"""
+import logging
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+
+from lxml import etree, html as lxml_html
+from lxml.cssselect import CSSSelector
+
+from services.metrics import EXTRACTIONS
+
+logger = logging.getLogger("extractors")
+
+DEFAULT_MIN_CHARS = 200
+
+# Trang không có charset trong header Content-Type thường khai báo bằng thẻ <meta> ở đầu trang
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+_SNIFF_BYTES = 4096
+_SPACES = re.compile(r"\s+")
+
+
+def site_key(url: str) -> str:
+    """Host của URL, bỏ tiền tố www. để dantri.com.vn và www.dantri.com.vn dùng chung extractor."""
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def sniff_charset(content: bytes) -> Optional[str]:
+    match = _META_CHARSET.search(content, 0, _SNIFF_BYTES)
+    return match.group(1).decode("ascii") if match else None
+
+
+def decode_html(content: bytes, encoding: Optional[str] = None) -> str:
+    encoding = encoding or sniff_charset(content) or "utf-8"
+    try:
+        return content.decode(encoding, errors="replace")
+    except LookupError:
+        return content.decode("utf-8", errors="replace")
+
+
+def _clean(text: str) -> str:
+    return _SPACES.sub(" ", text).strip()
+
+
+@dataclass(frozen=True)
+class ExtractorSpec:
+    """Selector của một site, ở dạng chuỗi để gửi được sang process khác."""
+    name: str
+    body: Tuple[str, ...]
+    lead: Tuple[str, ...] = ()
+    paragraphs: str = "p"
+    drop: Tuple[str, ...] = ()
+    min_chars: int = DEFAULT_MIN_CHARS
+
+    @classmethod
+    def from_config(cls, name: str, config: dict) -> "ExtractorSpec":
+        return cls(
+            name=name,
+            body=tuple(config.get("body", [])),
+            lead=tuple(config.get("lead", [])),
+            paragraphs=config.get("paragraphs", "p"),
+            drop=tuple(config.get("drop", [])),
+            min_chars=config.get("min_chars", DEFAULT_MIN_CHARS),
+        )
+
+
+class SiteExtractor:
+    """Selector đã biên dịch của một site; trả về chuỗi rỗng khi selector trượt."""
+
+    def __init__(self, spec: ExtractorSpec):
+        self.spec = spec
+        self.body = [CSSSelector(selector) for selector in spec.body]
+        self.lead = [CSSSelector(selector) for selector in spec.lead]
+        self.paragraphs = CSSSelector(spec.paragraphs)
+        self.drop = [CSSSelector(selector) for selector in spec.drop]
+
+    def extract(self, content: bytes, encoding: Optional[str] = None) -> str:
+        encoding = encoding or sniff_charset(content) or "utf-8"
+        try:
+            parser = lxml_html.HTMLParser(encoding=encoding)
+        except LookupError:
+            parser = lxml_html.HTMLParser(encoding="utf-8")
+        try:
+            document = lxml_html.document_fromstring(content, parser=parser)
+        except (etree.ParserError, ValueError):
+            return ""
+        root = next((nodes[0] for nodes in (select(document) for select in self.body) if nodes), None)
+        if root is None:
+            return ""
+        for select in self.drop:
+            for node in select(root):
+                node.drop_tree()
+        parts = []
+        for select in self.lead:
+            nodes = select(document)
+            if nodes:
+                parts.append(_clean(nodes[0].text_content()))
+                break
+        parts.extend(_clean(node.text_content()) for node in self.paragraphs(root))
+        text = "\n\n".join(part for part in parts if part)
+        return text if len(text) >= self.spec.min_chars else ""
+
+
+_compiled: Dict[ExtractorSpec, SiteExtractor] = {}
+
+
+def compiled(spec: ExtractorSpec) -> SiteExtractor:
+    """Selector chỉ biên dịch một lần cho mỗi spec trong mỗi tiến trình."""
+    extractor = _compiled.get(spec)
+    if extractor is None:
+        extractor = _compiled[spec] = SiteExtractor(spec)
+    return extractor
+
+
+class ExtractorRegistry:
+    """Bảng extractor theo host, dựng từ danh sách "websites" của config."""
+
+    def __init__(self, specs: Optional[Dict[str, ExtractorSpec]] = None):
+        self.specs = specs or {}
+
+    @classmethod
+    def from_websites(cls, websites: Iterable[dict]) -> "ExtractorRegistry":
+        specs = {}
+        for website in websites:
+            config = website.get("extractor")
+            if config and config.get("body"):
+                specs[site_key(website["base_url"])] = ExtractorSpec.from_config(website.get("name", website["base_url"]), config)
+        return cls(specs)
+
+    def spec_for(self, url: str) -> Optional[ExtractorSpec]:
+        return self.specs.get(site_key(url))
+
+
+def newspaper_text(url: str, html: str) -> str:
+    """Phân tích bằng Newspaper3k trên HTML đã tải sẵn (không tải lại trang)."""
+    from newspaper import Article
+
+    # fetch_images=False: không tải ảnh để chấm điểm top image, chỉ cần phần chữ
+    article = Article(url, language="vi", fetch_images=False)
+    article.download(input_html=html)
+    article.parse()
+    return article.text
+
+
+def extract_article(url: str, content: bytes, encoding: Optional[str] = None, spec: Optional[ExtractorSpec] = None) -> Tuple[str, str]:
+    """
+    Trích nội dung từ HTML thô của bài báo. Trả về (nội dung, extractor đã dùng):
+    "site" khi selector của site khớp, "newspaper" khi phải dùng Newspaper3k.
+    Không ghi metric hay log để chạy được trong process con (xem services/parsing.py).
+    """
+    if spec is not None:
+        text = compiled(spec).extract(content, encoding)
+        if text:
+            return text, "site"
+    return newspaper_text(url, decode_html(content, encoding)), "newspaper"
+
+
+def record_extraction(url: str, spec: Optional[ExtractorSpec], text: str, used: str):
+    """Ghi metric (và log khi selector trượt) cho kết quả của extract_article ở tiến trình chính."""
+    if spec is not None:
+        EXTRACTIONS.labels("site", "ok" if used == "site" else "miss").inc()
+        if used != "site":
+            logger.info(f"[Extract] Selector của {spec.name} không khớp với {url}, chuyển sang Newspaper3k.")
+    if used == "newspaper":
+        EXTRACTIONS.labels("newspaper", "ok" if text else "miss").inc()
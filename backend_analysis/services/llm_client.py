@@ -0,0 +1,328 @@
+"""
+Client HTTP dùng chung cho các lời gọi LLM, sống suốt vòng đời tiến trình:
+  - giữ kết nối keep-alive giữa các lượt phân tích thay vì mở client mới mỗi lượt,
+  - số yêu cầu đồng thời tự điều chỉnh theo AIMD: tăng dần khi thành công, giảm một nửa
+    khi bị 429/503 hoặc quá thời gian, để thông lượng bám sát giới hạn thật của nhà cung cấp,
+  - lỗi tạm thời được thử lại với backoff lũy thừa có jitter, tôn trọng header Retry-After,
+  - circuit breaker: sau nhiều lỗi liên tiếp thì ngừng gọi trong một khoảng thời gian;
+    bài báo gặp LLMUnavailable được để lại chờ lượt sau thay vì bị đánh dấu lỗi vĩnh viễn.
+
+Cấu hình trong mục "analysis.llm" của config/websites.json.
+"""
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from services.metrics import LLM_CIRCUIT_OPEN, LLM_CONCURRENCY, LLM_REQUESTS, LLM_RETRIES, STAGE_SECONDS
+
+logger = logging.getLogger("llm_client")
+
+DEFAULT_LLM_CONFIG = {
+    "timeout_seconds": 30,
+    "min_concurrency": 1,
+    "max_concurrency": 16,
+    "max_retries": 4,
+    "backoff_base_seconds": 0.5,
+    "backoff_max_seconds": 30,
+    "breaker_failures": 5,
+    "breaker_cooldown_seconds": 30,
+}
+
+# Nhà cung cấp đang quá tải hoặc giới hạn tốc độ: giảm đồng thời và thử lại
+THROTTLE_STATUSES = {429, 503}
+# Lỗi tạm thời khác của server: thử lại
+RETRY_STATUSES = {408, 500, 502, 504}
+# Sai API key hoặc hết số dư: không thử lại, nhưng bài báo không có lỗi gì nên để lại chờ
+UNAVAILABLE_STATUSES = {401, 402, 403}
+
+
+# Đọc phản hồi 200 dạng stream, trả về kết quả đã xử lý; có thể dừng đọc giữa chừng
+StreamConsumer = Callable[[httpx.Response], Awaitable[Any]]
+
+
+class LLMUnavailable(Exception):
+    """LLM tạm thời không dùng được (circuit breaker mở, hết lượt thử lại...); bài báo nên được để lại chờ."""
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Giá trị header Retry-After (số giây hoặc thời điểm HTTP-date), None nếu không có hoặc sai định dạng."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    Giới hạn số yêu cầu đồng thời theo AIMD: mỗi yêu cầu thành công tăng giới hạn thêm 1/limit
+    (khoảng +1 sau mỗi lượt đầy giới hạn), mỗi tín hiệu quá tải giảm một nửa. Các tín hiệu quá tải
+    của những yêu cầu đã gửi trước lần giảm gần nhất bị bỏ qua, để một đợt 429 chỉ giảm một lần.
+    """
+
+    def __init__(self, initial: float, minimum: float = 1, maximum: float = 16):
+        self.minimum = max(1.0, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.inflight = 0
+        self._changed = asyncio.Condition()
+        self._last_decrease = 0.0
+        LLM_CONCURRENCY.set(self.limit)
+
+    async def acquire(self) -> float:
+        """Chờ tới lượt; trả về thời điểm bắt đầu để báo lại trong on_overload()."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.inflight < int(self.limit))
+            self.inflight += 1
+        return time.monotonic()
+
+    async def release(self):
+        async with self._changed:
+            self.inflight -= 1
+            self._changed.notify_all()
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        LLM_CONCURRENCY.set(self.limit)
+
+    def on_overload(self, started: float):
+        if started < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self.limit = max(self.minimum, self.limit / 2)
+        LLM_CONCURRENCY.set(self.limit)
+        logger.warning(f"[LLM] Nhà cung cấp quá tải, giảm số yêu cầu đồng thời xuống {int(self.limit)}.")
+
+
+class CircuitBreaker:
+    """
+    Mở sau `failures` lỗi liên tiếp (5xx, mất kết nối, quá thời gian) và từ chối mọi yêu cầu trong
+    `cooldown_seconds`; hết thời gian thì cho một yêu cầu thử, thành công thì đóng lại.
+    """
+
+    def __init__(self, failures: int = 5, cooldown_seconds: float = 30):
+        self.failures = max(1, failures)
+        self.cooldown = cooldown_seconds
+        self.consecutive = 0
+        self.opened_at: Optional[float] = None
+        # Thời gian mở của lần mở gần nhất: cooldown, hoặc thời gian nhà cung cấp yêu cầu (pause)
+        self.open_for = cooldown_seconds
+        self._probing = False
+
+    @property
+    def open(self) -> bool:
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.open_for
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.open or self._probing:
+            return False
+        # Hết thời gian chờ: chỉ một yêu cầu được thử
+        self._probing = True
+        return True
+
+    def on_success(self):
+        if self.opened_at is not None:
+            logger.info("[LLM] Đóng circuit breaker, nhà cung cấp đã hoạt động lại.")
+        self.consecutive, self.opened_at, self._probing = 0, None, False
+        LLM_CIRCUIT_OPEN.set(0)
+
+    def on_throttled(self):
+        # Nhà cung cấp vẫn trả lời (chỉ giới hạn tốc độ): yêu cầu thử coi như thành công
+        if self._probing:
+            self.on_success()
+
+    def release_probe(self):
+        """
+        Yêu cầu thử kết thúc mà không có kết quả (bị hủy giữa chừng): cho phép yêu cầu sau thử lại,
+        thay vì chặn mọi yêu cầu mãi mãi trong khi breaker trông như đã đóng.
+        """
+        self._probing = False
+
+    def on_failure(self):
+        self.consecutive += 1
+        if self._probing or self.consecutive >= self.failures:
+            if self.opened_at is None or self._probing:
+                logger.warning(f"[LLM] Mở circuit breaker sau {self.consecutive} lỗi liên tiếp, tạm dừng {self.cooldown}s.")
+            self.opened_at, self.open_for, self._probing = time.monotonic(), self.cooldown, False
+            LLM_CIRCUIT_OPEN.set(1)
+
+    def pause(self, seconds: float):
+        """Nhà cung cấp yêu cầu ngừng gửi lâu hơn mức backoff cho phép: mở breaker trong `seconds` giây."""
+        logger.warning(f"[LLM] Nhà cung cấp yêu cầu chờ {seconds:.0f}s, tạm dừng gọi LLM.")
+        self.opened_at, self.open_for, self._probing = time.monotonic(), max(seconds, self.cooldown), False
+        LLM_CIRCUIT_OPEN.set(1)
+
+
+class LLMClient:
+    """Gửi yêu cầu POST tới API LLM qua limiter AIMD, thử lại và circuit breaker."""
+
+    def __init__(self, initial_concurrency: int = 4, timeout_seconds: float = 30, min_concurrency: int = 1,
+                 max_concurrency: int = 16, max_retries: int = 4, backoff_base_seconds: float = 0.5,
+                 backoff_max_seconds: float = 30, breaker_failures: int = 5, breaker_cooldown_seconds: float = 30):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base_seconds
+        self.backoff_max = backoff_max_seconds
+        self.limiter = AdaptiveLimiter(initial_concurrency, min_concurrency, self.max_concurrency)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_cooldown_seconds)
+        self.client = httpx.AsyncClient(
+            timeout=timeout_seconds,
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+        )
+        self.loop = asyncio.get_running_loop()
+
+    @property
+    def available(self) -> bool:
+        return not self.breaker.open
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        # Full jitter: các worker bị 429 cùng lúc không thử lại cùng lúc
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return min(self.backoff_max, max(delay, retry_after or 0.0))
+
+    async def post(self, url: str, label: str, **kwargs) -> httpx.Response:
+        """
+        Gửi yêu cầu, thử lại khi gặp lỗi tạm thời. Trả về phản hồi cuối cùng (200 hoặc lỗi không
+        nên thử lại, ví dụ 400); raise LLMUnavailable nếu LLM tạm thời không dùng được.
+        """
+        response, _ = await self._send(url, label, None, kwargs)
+        return response
+
+    async def stream(self, url: str, label: str, consume: StreamConsumer, **kwargs) -> Tuple[httpx.Response, Any]:
+        """
+        Như post() nhưng phản hồi 200 được đọc dần bằng consume(response); trả về (phản hồi, kết quả
+        của consume), kết quả là None nếu phản hồi không phải 200. Nếu consume dừng trước khi đọc hết,
+        kết nối bị đóng thay vì trả lại pool. Lỗi mạng giữa chừng được thử lại từ đầu như với post().
+        """
+        return await self._send(url, label, consume, kwargs)
+
+    async def _request(self, url: str, consume: Optional[StreamConsumer], kwargs: Dict[str, Any]) -> Tuple[httpx.Response, Any]:
+        if consume is None:
+            return await self.client.post(url, **kwargs), None
+        async with self.client.stream("POST", url, **kwargs) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return response, None
+            return response, await consume(response)
+
+    async def _send(self, url: str, label: str, consume: Optional[StreamConsumer], kwargs: Dict[str, Any]) -> Tuple[httpx.Response, Any]:
+        reason = "unknown"
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise LLMUnavailable(f"circuit breaker đang mở ({label})")
+            # Breaker vẫn ghi nhận là đang mở mà allow() cho qua: đây là yêu cầu thử
+            probe = self.breaker.opened_at is not None
+            try:
+                started = await self.limiter.acquire()
+            except BaseException:
+                if probe:
+                    self.breaker.release_probe()
+                raise
+            retry_after = None
+            try:
+                with STAGE_SECONDS.labels("llm_request").time():
+                    response, result = await self._request(url, consume, kwargs)
+            except httpx.TimeoutException as e:
+                LLM_REQUESTS.labels("timeout").inc()
+                self.limiter.on_overload(started)
+                self.breaker.on_failure()
+                reason = f"timeout: {e!r}"
+            except httpx.HTTPError as e:
+                LLM_REQUESTS.labels("error").inc()
+                self.breaker.on_failure()
+                reason = f"lỗi kết nối: {e!r}"
+            except Exception:
+                # Lỗi khi đọc phản hồi (ví dụ trong consume): không thử lại, nhưng vẫn tính cho breaker
+                LLM_REQUESTS.labels("error").inc()
+                self.breaker.on_failure()
+                raise
+            else:
+                LLM_REQUESTS.labels(str(response.status_code)).inc()
+                status = response.status_code
+                if status in THROTTLE_STATUSES:
+                    retry_after = retry_after_seconds(response)
+                    self.limiter.on_overload(started)
+                    if status == 503:
+                        self.breaker.on_failure()
+                    else:
+                        self.breaker.on_throttled()
+                    reason = f"HTTP {status}"
+                elif status in RETRY_STATUSES:
+                    self.breaker.on_failure()
+                    reason = f"HTTP {status}"
+                elif status in UNAVAILABLE_STATUSES:
+                    self.breaker.on_failure()
+                    logger.error(f"[LLM] {label}: HTTP {status} {response.text[:500]}")
+                    raise LLMUnavailable(f"HTTP {status} ({label})")
+                else:
+                    # 200 hoặc lỗi do chính yêu cầu (400, 422...): nhà cung cấp vẫn hoạt động bình thường
+                    self.limiter.on_success()
+                    self.breaker.on_success()
+                    return response, result
+            finally:
+                # Yêu cầu thử bị hủy (CancelledError) không đi qua nhánh nào ở trên
+                if probe:
+                    self.breaker.release_probe()
+                await self.limiter.release()
+            if retry_after is not None and retry_after > self.backoff_max:
+                # Ngủ lâu như vậy sẽ giữ chỗ trong limiter và bài báo quá hạn lease: dừng mọi yêu cầu, để bài lại
+                self.breaker.pause(retry_after)
+                raise LLMUnavailable(f"{reason}, Retry-After {retry_after:.0f}s ({label})")
+            if attempt == self.max_retries:
+                break
+            delay = self._backoff(attempt, retry_after)
+            LLM_RETRIES.labels(reason.split(":")[0]).inc()
+            logger.warning(f"[LLM] {label}: {reason}, thử lại lần {attempt + 1} sau {delay:.1f}s.")
+            await asyncio.sleep(delay)
+        raise LLMUnavailable(f"{reason} sau {self.max_retries + 1} lần thử ({label})")
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_client: Optional[LLMClient] = None
+
+
+async def get_llm_client(config: Dict[str, Any], initial_concurrency: int = 4) -> LLMClient:
+    """
+    Client dùng chung trong tiến trình theo mục "analysis.llm"; giới hạn đồng thời đã học được
+    và trạng thái circuit breaker được giữ giữa các lượt phân tích. Tạo lại nếu event loop đổi.
+    """
+    global _client
+    if _client is not None and _client.loop is not asyncio.get_running_loop():
+        # Kết nối và khóa của client cũ gắn với event loop đã đóng
+        _client = None
+    if _client is None:
+        config = {**DEFAULT_LLM_CONFIG, **(config or {})}
+        _client = LLMClient(
+            initial_concurrency=initial_concurrency,
+            timeout_seconds=config["timeout_seconds"],
+            min_concurrency=config["min_concurrency"],
+            max_concurrency=config["max_concurrency"],
+            max_retries=config["max_retries"],
+            backoff_base_seconds=config["backoff_base_seconds"],
+            backoff_max_seconds=config["backoff_max_seconds"],
+            breaker_failures=config["breaker_failures"],
+            breaker_cooldown_seconds=config["breaker_cooldown_seconds"],
+        )
+    return _client
+
+
+async def close_llm_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
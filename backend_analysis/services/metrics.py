@@ -0,0 +1,106 @@
+"""
+Metric Prometheus của service phân tích, xuất tại GET /metrics.
+Các metric được khai báo một lần ở cấp module, trên đường nóng chỉ tốn
+một lần tra label và một phép cộng.
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+# Thời gian tải, parse và gọi LLM thường trong khoảng 10 ms - 60 s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "analysis_stage_seconds",
+    "Thời gian của từng giai đoạn phân tích",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+ARTICLES = Counter(
+    "analysis_articles_total",
+    "Số bài đã ghi kết quả phân tích, theo kết quả",
+    ["result"],
+)
+LLM_REQUESTS = Counter(
+    "analysis_llm_requests_total",
+    "Số yêu cầu gửi tới DeepSeek API, theo mã trạng thái",
+    ["status"],
+)
+LLM_TOKENS = Counter(
+    "analysis_llm_tokens_total",
+    "Số token DeepSeek báo trong trường usage (ước lượng khi stream bị đóng sớm)",
+    ["kind"],
+)
+LLM_RESULT_SECONDS = Histogram(
+    "analysis_llm_result_seconds",
+    "Thời gian từ lúc gọi LLM cho một bài tới khi có nhãn cảm xúc (emotion) và có báo cáo đầy đủ (result)",
+    ["event"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_STREAMS = Counter(
+    "analysis_llm_streams_total",
+    "Số phản hồi stream theo cách kết thúc: đủ nhận xét (summary), chạm giới hạn token (token_cap), đọc hết (complete)",
+    ["end"],
+)
+LLM_RETRIES = Counter(
+    "analysis_llm_retries_total",
+    "Số lần thử lại yêu cầu LLM, theo lý do (HTTP 429, timeout, lỗi kết nối...)",
+    ["reason"],
+)
+LLM_CONCURRENCY = Gauge(
+    "analysis_llm_concurrency_limit",
+    "Giới hạn số yêu cầu LLM đồng thời hiện tại (điều chỉnh theo AIMD)",
+)
+LLM_CIRCUIT_OPEN = Gauge(
+    "analysis_llm_circuit_open",
+    "1 khi circuit breaker của client LLM đang mở (tạm ngừng gọi LLM)",
+)
+PROMPT_TOKENS = Counter(
+    "analysis_prompt_tokens_total",
+    "Số token (ước lượng) của nội dung bài trước (original) và sau khi cắt theo ngân sách (sent)",
+    ["kind"],
+)
+CACHE_LOOKUPS = Counter(
+    "analysis_cache_lookups_total",
+    "Số lần tra cache kết quả phân tích",
+    ["result"],
+)
+DUPLICATES = Counter(
+    "analysis_duplicates_total",
+    "Kết quả tra chỉ mục bài gần trùng: dùng lại phân tích của nhóm (reused), trùng nhưng nhóm chưa có kết quả (matched), bài mới (unique), quá ngắn (skipped)",
+    ["result"],
+)
+DEDUP_INDEX_ENTRIES = Gauge(
+    "analysis_dedup_index_entries",
+    "Số bài đang có trong chỉ mục bài gần trùng",
+)
+EXTRACTIONS = Counter(
+    "analysis_extractions_total",
+    "Số lần trích nội dung bài báo, theo extractor (site, newspaper) và kết quả",
+    ["extractor", "result"],
+)
+PARSE_POOL_RECYCLES = Counter(
+    "analysis_parse_pool_recycles_total",
+    "Số lần thay process pool parse, theo lý do (timeout, memory, broken, max_tasks)",
+    ["reason"],
+)
+QUEUE_DEPTH = Gauge(
+    "analysis_queue_depth",
+    "Số bài đang chờ trong hàng đợi của từng giai đoạn pipeline",
+    ["queue"],
+)
+JOB_SECONDS = Histogram(
+    "analysis_job_seconds",
+    "Thời gian chạy các job theo lịch hoặc gọi thủ công",
+    ["job"],
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+
+
+def record_usage(data: dict):
+    """Cộng số token từ trường usage của phản hồi chat/completions (nếu có)."""
+    usage = data.get("usage") if isinstance(data, dict) else None
+    if not isinstance(usage, dict):
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = usage.get(kind)
+        if isinstance(value, int) and value > 0:
+            LLM_TOKENS.labels(kind.split("_")[0]).inc(value)
@@ -0,0 +1,214 @@
+"""
+Tầng parse nội dung bài báo chạy trong process pool riêng, tách khỏi phần tải trang (I/O).
+
+Parse HTML và trích nội dung chủ yếu giữ GIL, nên chạy trong thread pool mặc định thì không
+tận dụng được nhiều core và một trang bất thường có thể chiếm worker rất lâu. Ở đây:
+  - process con nhận HTML thô (bytes) và trả về văn bản, không đụng tới DB hay mạng,
+  - mỗi task có thời hạn: process con tự ngắt bằng SIGALRM (nếu hệ điều hành hỗ trợ),
+    tiến trình chính bỏ chờ sau thêm HARD_TIMEOUT_GRACE_SECONDS, dừng hẳn các process của pool
+    (terminate, rồi kill nếu sau STOP_TIMEOUT_SECONDS vẫn chưa thoát) và thay pool mới,
+  - pool được thay sau trung bình max_tasks_per_child task mỗi process, hoặc khi bộ nhớ đỉnh
+    (RSS) của một process vượt max_memory_mb; các task đang chạy trên pool cũ vẫn chạy nốt.
+    (Không dùng tham số max_tasks_per_child của ProcessPoolExecutor vì bị treo trên Python 3.11.)
+  - số task gửi vào pool không vượt quá số process, nên thời hạn chỉ tính thời gian parse
+    chứ không tính thời gian xếp hàng.
+
+Cấu hình trong mục "analysis.parsing" của config/websites.json.
+"""
+import asyncio
+import logging
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from services.extractors import ExtractorSpec, extract_article, record_extraction
+from services.metrics import PARSE_POOL_RECYCLES
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("parsing")
+
+DEFAULT_PARSING_CONFIG = {
+    "enabled": True,
+    "workers": 0,  # 0: bằng số core
+    "task_timeout_seconds": 20,
+    "max_tasks_per_child": 200,
+    "max_memory_mb": 512,
+}
+
+# Thời gian chờ thêm trước khi tiến trình chính bỏ một task mà process con không tự ngắt được
+HARD_TIMEOUT_GRACE_SECONDS = 5
+# Thời gian chờ mỗi process con thoát sau terminate (rồi sau kill) khi dừng pool bị treo
+STOP_TIMEOUT_SECONDS = 2
+
+
+class ParseTimeout(TimeoutError):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise ParseTimeout("quá thời gian parse")
+
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về byte
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _init_worker():
+    # Import sẵn Newspaper3k (dùng khi selector trượt) để thời gian import không tính vào thời hạn của task
+    try:
+        import newspaper  # noqa: F401
+    except ImportError:
+        pass
+
+
+def _ready() -> bool:
+    return True
+
+
+def _stop_processes(processes):
+    """Dừng các process con (SIGTERM, rồi SIGKILL nếu vẫn chưa thoát) và chờ chúng thoát hẳn."""
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join(STOP_TIMEOUT_SECONDS)
+        if process.is_alive():
+            process.kill()
+            process.join(STOP_TIMEOUT_SECONDS)
+
+
+def parse_task(url: str, content: bytes, encoding: Optional[str], spec: Optional[ExtractorSpec], timeout: float) -> Tuple[str, str, float]:
+    """Chạy trong process con: trả về (nội dung, extractor đã dùng, RSS đỉnh của process tính bằng MB)."""
+    alarm = hasattr(signal, "setitimer") and timeout > 0
+    if alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        text, used = extract_article(url, content, encoding, spec)
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return text, used, _peak_rss_mb()
+
+
+class ParsePool:
+    """Process pool dùng chung cho việc parse, tạo lúc cần và thay mới khi hỏng, treo hoặc tốn bộ nhớ."""
+
+    def __init__(self, workers: int = 0, task_timeout_seconds: float = 20, max_tasks_per_child: int = 200, max_memory_mb: float = 512):
+        self.workers = workers or os.cpu_count() or 1
+        self.task_timeout = task_timeout_seconds
+        self.max_tasks_per_child = max_tasks_per_child
+        self.max_memory_mb = max_memory_mb
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_tasks = 0
+        self._started: Optional[asyncio.Future] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.peak_rss_mb = 0.0  # RSS đỉnh lớn nhất mà các process con báo về
+
+    async def _get_executor(self) -> ProcessPoolExecutor:
+        """Pool hiện tại; pool mới được khởi động xong (spawn, import) trước khi nhận task có thời hạn."""
+        if self._executor is None:
+            executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            self._executor, self._executor_tasks = executor, 0
+            loop = asyncio.get_running_loop()
+            self._started = asyncio.gather(*(loop.run_in_executor(executor, _ready) for _ in range(self.workers)))
+        executor = self._executor
+        await self._started
+        return executor
+
+    async def _recycle(self, executor: ProcessPoolExecutor, reason: str, stop: bool = False):
+        """
+        Cho task mới sang pool mới. Mặc định pool cũ đóng lại sau khi các task đang chạy xong;
+        với stop=True (process con treo hoặc hỏng) các process của pool cũ bị dừng ngay, các task
+        khác còn chạy trên đó nhận BrokenProcessPool và được parse() chạy lại một lần trên pool mới.
+        """
+        if executor is not self._executor:
+            return  # Đã được task khác thay rồi
+        self._executor = None
+        PARSE_POOL_RECYCLES.labels(reason).inc()
+        log = logger.info if reason == "max_tasks" else logger.warning
+        log(f"[Parse] Thay process pool parse ({reason}).")
+        if not stop:
+            executor.shutdown(wait=False)
+            return
+        # shutdown(wait=False) không dừng được process đang treo, nên dừng trực tiếp các process
+        processes = list((executor._processes or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        await asyncio.to_thread(_stop_processes, processes)
+
+    async def parse(self, url: str, content: bytes, encoding: Optional[str] = None, spec: Optional[ExtractorSpec] = None) -> str:
+        """Trích nội dung từ HTML thô trong process con; lỗi và quá thời hạn được raise cho nơi gọi."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        async with self._slots:
+            # Lần chạy lại duy nhất: khi pool bị thay vì task khác treo hoặc hỏng trong lúc task này đang chạy
+            for attempt in range(2):
+                executor = await self._get_executor()
+                self._executor_tasks += 1
+                loop = asyncio.get_running_loop()
+                future = loop.run_in_executor(executor, parse_task, url, content, encoding, spec, self.task_timeout)
+                try:
+                    text, used, rss_mb = await asyncio.wait_for(future, self.task_timeout + HARD_TIMEOUT_GRACE_SECONDS)
+                    break
+                except ParseTimeout:
+                    # Process con tự ngắt được, pool vẫn dùng tiếp
+                    raise
+                except asyncio.TimeoutError:
+                    await self._recycle(executor, "timeout", stop=True)
+                    raise ParseTimeout(f"process con không trả kết quả sau {self.task_timeout + HARD_TIMEOUT_GRACE_SECONDS}s")
+                except BrokenProcessPool:
+                    if attempt == 0 and executor is not self._executor:
+                        logger.info(f"[Parse] Pool đã được thay trong lúc parse {url}, chạy lại trên pool mới.")
+                        continue
+                    # Process con bị kill (OOM killer, segfault trong thư viện C...)
+                    await self._recycle(executor, "broken", stop=True)
+                    raise
+            self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+            if self.max_memory_mb and rss_mb > self.max_memory_mb:
+                await self._recycle(executor, "memory")
+            elif self.max_tasks_per_child and self._executor_tasks >= self.max_tasks_per_child * self.workers:
+                await self._recycle(executor, "max_tasks")
+        record_extraction(url, spec, text, used)
+        return text
+
+    def shutdown(self):
+        """Hủy các task chưa chạy và chờ các process con thoát."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+_pool: Optional[ParsePool] = None
+
+
+def get_parse_pool(config: Dict[str, Any]) -> Optional[ParsePool]:
+    """Pool dùng chung trong tiến trình theo mục "analysis.parsing"; None nếu bị tắt."""
+    global _pool
+    config = {**DEFAULT_PARSING_CONFIG, **(config or {})}
+    if not config["enabled"]:
+        return None
+    if _pool is None:
+        _pool = ParsePool(
+            workers=config["workers"],
+            task_timeout_seconds=config["task_timeout_seconds"],
+            max_tasks_per_child=config["max_tasks_per_child"],
+            max_memory_mb=config["max_memory_mb"],
+        )
+    return _pool
+
+
+def shutdown_parse_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterable, Awaitable, Callable, Iterable, List, Optional, Union
+
+from services.metrics import QUEUE_DEPTH
+
+logger = logging.getLogger("pipeline")
+
+# Đánh dấu kết thúc hàng đợi cho từng worker
+_DONE = object()
+
+
+@dataclass
+class ArticleJob:
+    """Một bài báo đi qua các giai đoạn của pipeline phân tích."""
+    id: int
+    url: str
+    content: str = ""
+    analysis: Optional[str] = None
+    success: Optional[bool] = None
+    analyzed_at: Optional[datetime] = None
+    original_tokens: Optional[int] = None
+    sent_tokens: Optional[int] = None
+    # Nhóm bài gần trùng và chữ ký MinHash của nội dung đầy đủ (None khi tắt dedup hoặc bài quá ngắn)
+    cluster_id: Optional[int] = None
+    minhash: Optional[bytes] = None
+    # LLM tạm thời không dùng được: không ghi kết quả, bài được trả lại hàng đợi
+    deferred: bool = False
+    # Kết quả đã được ghi vào DB; False khi lease đã bị worker khác nhận lại (xem save_results)
+    saved: bool = False
+
+    @property
+    def done(self) -> bool:
+        # Bài báo đã có kết quả (thành công hoặc lỗi) thì chuyển thẳng sang bước ghi DB
+        return self.analysis is not None
+
+
+Stage = Callable[[ArticleJob], Awaitable[None]]
+
+
+class AnalysisPipeline:
+    """
+    Pipeline 3 giai đoạn: tải/parse nội dung -> gọi LLM -> ghi DB.
+    Mỗi giai đoạn có số worker riêng, nối với nhau bằng hàng đợi có giới hạn
+    để bộ nhớ không tăng theo số bài báo cần xử lý.
+    """
+
+    def __init__(
+        self,
+        fetch: Stage,
+        analyze: Stage,
+        write: Stage,
+        fetch_concurrency: int = 8,
+        llm_concurrency: int = 4,
+        db_concurrency: int = 1,
+        queue_size: int = 32,
+    ):
+        self.fetch = fetch
+        self.analyze = analyze
+        self.write = write
+        self.fetch_concurrency = max(1, fetch_concurrency)
+        self.llm_concurrency = max(1, llm_concurrency)
+        self.db_concurrency = max(1, db_concurrency)
+        self.queue_size = max(1, queue_size)
+
+    async def run(self, jobs: Union[Iterable[ArticleJob], AsyncIterable[ArticleJob]]) -> List[ArticleJob]:
+        """Chạy toàn bộ pipeline, trả về các job đã được ghi vào DB."""
+        fetch_q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        llm_q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        write_q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        written: List[ArticleJob] = []
+        # Gauge đọc kích thước hàng đợi khi Prometheus scrape, không tốn gì trên đường nóng
+        for name, queue in (("fetch", fetch_q), ("llm", llm_q), ("write", write_q)):
+            QUEUE_DEPTH.labels(name).set_function(queue.qsize)
+
+        async def produce():
+            if hasattr(jobs, "__aiter__"):
+                async for job in jobs:
+                    await fetch_q.put(job)
+            else:
+                for job in jobs:
+                    await fetch_q.put(job)
+            for _ in range(self.fetch_concurrency):
+                await fetch_q.put(_DONE)
+
+        async def fetch_worker():
+            while True:
+                job = await fetch_q.get()
+                if job is _DONE:
+                    return
+                await self.fetch(job)
+                await (write_q if job.done else llm_q).put(job)
+
+        async def llm_worker():
+            while True:
+                job = await llm_q.get()
+                if job is _DONE:
+                    return
+                await self.analyze(job)
+                await write_q.put(job)
+
+        async def write_worker():
+            while True:
+                job = await write_q.get()
+                if job is _DONE:
+                    return
+                await self.write(job)
+                written.append(job)
+
+        async def close_after(workers, queue, count):
+            # Khi các worker phía trước đã xong thì báo kết thúc cho giai đoạn sau
+            await asyncio.gather(*workers)
+            for _ in range(count):
+                await queue.put(_DONE)
+
+        fetchers = [asyncio.create_task(fetch_worker()) for _ in range(self.fetch_concurrency)]
+        analyzers = [asyncio.create_task(llm_worker()) for _ in range(self.llm_concurrency)]
+        writers = [asyncio.create_task(write_worker()) for _ in range(self.db_concurrency)]
+        tasks = [
+            asyncio.create_task(produce()),
+            asyncio.create_task(close_after(fetchers, llm_q, self.llm_concurrency)),
+            asyncio.create_task(close_after(fetchers + analyzers, write_q, self.db_concurrency)),
+            *fetchers, *analyzers, *writers,
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Một giai đoạn lỗi bất ngờ: dừng toàn bộ pipeline để không bị treo ở hàng đợi
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            for name in ("fetch", "llm", "write"):
+                QUEUE_DEPTH.labels(name).set_function(lambda: 0)
+        return written
@@ -0,0 +1,136 @@
+"""
+Chuẩn bị nội dung bài báo trước khi gửi LLM: bỏ các đoạn không phải nội dung (tác giả, chú thích
+ảnh, "Xem thêm"...) và cắt theo ngân sách token, giữ các đoạn mở đầu (gần tiêu đề) vì đó là phần
+mang nội dung chính của tin. Số token được ước lượng tại chỗ, không cần gọi tokenizer qua mạng.
+
+Cấu hình trong mục "analysis.prompt" của config/websites.json.
+"""
+import re
+from dataclasses import dataclass
+from typing import List
+
+DEFAULT_PROMPT_CONFIG = {
+    "enabled": True,
+    "token_budget": 1200,
+    "lead_paragraphs": 2,
+}
+
+# Từ (âm tiết) hoặc một ký tự dấu câu
+_PIECES = re.compile(r"\w+|[^\w\s]")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n|\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+# Các đoạn không mang nội dung bài: chú thích ảnh/video, tác giả, nguồn, liên kết đọc thêm
+_BOILERPLATE = re.compile(
+    r"^\s*(?:"
+    r"\(?(?:ảnh|video|clip|đồ họa|infographic)\s*(?:minh họa)?\s*[:\-–)]"
+    r"|ảnh minh họa"
+    r"|(?:xem|đọc) thêm\b"
+    r"|tin liên quan\b"
+    r"|bài liên quan\b"
+    r"|>>"
+    r"|\(?(?:theo|nguồn)\s*:?\s*[^\s.,!?;:]+(?:\s+[^\s.,!?;:]+){0,4}\s*\)?\s*$"
+    r")",
+    re.IGNORECASE,
+)
+# Dòng tên tác giả cuối bài: vài chữ, không có dấu kết thúc câu
+_BYLINE = re.compile(r"^[\w\s\-–]{2,40}$")
+_BYLINE_MAX_WORDS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Ước lượng số token của văn bản tiếng Việt theo tokenizer BPE của LLM, không cần mạng.
+    Âm tiết chỉ có chữ ASCII thường là 1 token, âm tiết có dấu tiếng Việt thường bị tách
+    thành 2 token, âm tiết dài thêm 1 token mỗi 6 ký tự; mỗi dấu câu là 1 token.
+    """
+    tokens = 0
+    for piece in _PIECES.findall(text):
+        tokens += 1 + len(piece) // 6
+        if not piece.isascii():
+            tokens += 1
+    return tokens
+
+
+def is_boilerplate(paragraph: str, is_last: bool = False) -> bool:
+    if _BOILERPLATE.match(paragraph):
+        return True
+    # Tên tác giả thường là đoạn cuối chỉ gồm vài chữ
+    return is_last and _BYLINE.match(paragraph) is not None and len(paragraph.split()) <= _BYLINE_MAX_WORDS
+
+
+def split_paragraphs(text: str) -> List[str]:
+    return [paragraph.strip() for paragraph in _PARAGRAPH_BREAK.split(text) if paragraph.strip()]
+
+
+def _truncate(paragraph: str, budget: int) -> str:
+    """Giữ các câu đầu của đoạn vừa trong ngân sách; không vừa câu nào thì cắt theo từ."""
+    kept, used = [], 0
+    for sentence in _SENTENCE_END.split(paragraph):
+        tokens = estimate_tokens(sentence)
+        if used + tokens > budget:
+            break
+        kept.append(sentence)
+        used += tokens
+    if kept:
+        return " ".join(kept)
+    words, used = [], 0
+    for word in paragraph.split():
+        used += estimate_tokens(word)
+        if used > budget:
+            break
+        words.append(word)
+    return " ".join(words) + " …" if words else ""
+
+
+@dataclass
+class ArticlePrompt:
+    text: str
+    original_tokens: int
+    sent_tokens: int
+
+    @property
+    def trimmed(self) -> bool:
+        return self.sent_tokens < self.original_tokens
+
+
+class PromptBuilder:
+    """
+    Cắt nội dung bài về tối đa token_budget token (ước lượng): bỏ đoạn rác, giữ nguyên thứ tự,
+    ưu tiên lead_paragraphs đoạn đầu (cắt theo câu nếu một mình chúng đã vượt ngân sách),
+    rồi thêm các đoạn tiếp theo đến khi hết ngân sách.
+    """
+
+    def __init__(self, token_budget: int = 1200, lead_paragraphs: int = 2):
+        self.token_budget = token_budget
+        self.lead_paragraphs = max(1, lead_paragraphs)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "PromptBuilder":
+        config = {**DEFAULT_PROMPT_CONFIG, **(config or {})}
+        return cls(token_budget=config["token_budget"], lead_paragraphs=config["lead_paragraphs"])
+
+    def build(self, text: str) -> ArticlePrompt:
+        paragraphs = split_paragraphs(text)
+        # Đoạn văn chỉ được tách ở khoảng trắng nên tổng token các đoạn bằng token của cả bài
+        counted = [(paragraph, estimate_tokens(paragraph)) for paragraph in paragraphs]
+        original_tokens = sum(tokens for _, tokens in counted)
+        last = len(counted) - 1
+        counted = [(p, tokens) for i, (p, tokens) in enumerate(counted) if not is_boilerplate(p, i == last)]
+        kept: List[str] = []
+        used = 0
+        for i, (paragraph, tokens) in enumerate(counted):
+            if used + tokens > self.token_budget:
+                # Đoạn mở đầu luôn được giữ (cắt bớt câu); các đoạn sau thì dừng tại đây
+                if i < self.lead_paragraphs:
+                    paragraph = _truncate(paragraph, self.token_budget - used)
+                    if paragraph:
+                        kept.append(paragraph)
+                        used += estimate_tokens(paragraph)
+                break
+            kept.append(paragraph)
+            used += tokens
+        if not kept:
+            sent = _truncate(text, self.token_budget)
+            return ArticlePrompt(sent, original_tokens, estimate_tokens(sent))
+        return ArticlePrompt("\n\n".join(kept), original_tokens, used)
@@ -1,17 +1,15 @@
+import io
 import os
 import json
 import logging
-from datetime import datetime, timedelta, date
-import pandas as pd
+from datetime import datetime, timedelta
 import smtplib
 from email.message import EmailMessage
+from openpyxl import Workbook
 from db.models import CrawledData
 from db.database import SessionLocal
-
-# Emotion categories (Vietnamese)
-EMOTION_CATEGORIES = [
-    "Tích cực", "Tiêu cực", "Trung lập", "Hài hước", "Phẫn nộ", "Bất ngờ", "Buồn bã"
-]
+from services.emotions import EMOTION_CATEGORIES, UNKNOWN_EMOTION, emotion_name, extract_emotion
+from services.rollups import emotion_totals
 
 logger = logging.getLogger("reporting")
 
@@ -25,58 +23,68 @@ def load_report_config():
         logger.error(f"[Config] Error loading report config: {e}")
         return {}
 
-def extract_emotion(analysis_text):
-    # Scan for known emotions in the analysis text
-    for emotion in EMOTION_CATEGORIES:
-        if emotion.lower() in (analysis_text or '').lower():
-            return emotion
-    return "Không xác định"
+def report_period(period="day"):
+    now = datetime.now()
+    if period == "day":
+        start = datetime(now.year, now.month, now.day)
+    elif period == "week":
+        start = now - timedelta(days=now.weekday())
+        start = datetime(start.year, start.month, start.day)
+    else:
+        raise ValueError("period must be 'day' or 'week'")
+    return start, now
+
+def _analyzed_between(start, end):
+    return (
+        CrawledData.is_analyzed == True,
+        CrawledData.analyze_success == True,
+        CrawledData.analyzed_at >= start,
+        CrawledData.analyzed_at <= end
+    )
 
-def get_report_data(period="day"):
+# cluster_id: nhóm bài gần trùng (cùng một tin đăng ở nhiều báo), trống với bài phân tích trước khi có dedup
+REPORT_COLUMNS = ["id", "cluster_id", "url", "crawled_at", "analyzed_at", "emotion", "analysis"]
+
+# Số dòng lấy mỗi lần từ server-side cursor
+REPORT_FETCH_SIZE = 1000
+
+def iter_report_data(period="day"):
+    """
+    Duyệt các bài đã phân tích trong kỳ báo cáo bằng server-side cursor,
+    trả về từng dòng theo thứ tự REPORT_COLUMNS mà không nạp cả kỳ vào bộ nhớ.
+    """
     db = SessionLocal()
     try:
-        now = datetime.now()
-        if period == "day":
-            start = datetime(now.year, now.month, now.day)
-        elif period == "week":
-            start = now - timedelta(days=now.weekday())
-            start = datetime(start.year, start.month, start.day)
-        else:
-            raise ValueError("period must be 'day' or 'week'")
-        records = db.query(CrawledData).filter(
-            CrawledData.is_analyzed == True,
-            CrawledData.analyze_success == True,
-            CrawledData.analyzed_at >= start,
-            CrawledData.analyzed_at <= now
-        ).all()
-        data = []
-        for rec in records:
-            emotion = extract_emotion(rec.analysis or "")
-            data.append({
-                "id": rec.id,
-                "url": rec.url,
-                "crawled_at": rec.crawled_at,
-                "analyzed_at": rec.analyzed_at,
-                "emotion": emotion,
-                "analysis": rec.analysis
-            })
-        return data
+        start, now = report_period(period)
+        query = db.query(
+            CrawledData.id,
+            CrawledData.cluster_id,
+            CrawledData.url,
+            CrawledData.crawled_at,
+            CrawledData.analyzed_at,
+            CrawledData.emotion,
+            CrawledData.analysis
+        ).filter(*_analyzed_between(start, now)).order_by(CrawledData.id).yield_per(REPORT_FETCH_SIZE)
+        for rec in query:
+            # Dòng cũ chưa được backfill thì vẫn suy ra từ nội dung phân tích
+            emotion = emotion_name(rec.emotion) if rec.emotion is not None else extract_emotion(rec.analysis or "")
+            yield (rec.id, rec.cluster_id, rec.url, rec.crawled_at, rec.analyzed_at, emotion, rec.analysis)
     finally:
         db.close()
 
-def emotion_statistics(data):
-    stats = {cat: 0 for cat in EMOTION_CATEGORIES}
-    for row in data:
-        emo = row["emotion"]
-        if emo in stats:
-            stats[emo] += 1
-        else:
-            stats["Không xác định"] = stats.get("Không xác định", 0) + 1
-    return stats
+def emotion_statistics(period="day"):
+    """Đếm số bài theo cảm xúc từ bảng tổng hợp emotion_rollups, không quét crawled_data."""
+    start, now = report_period(period)
+    return emotion_totals(start, now)
 
-def make_excel(data, filename):
-    df = pd.DataFrame(data)
-    df.to_excel(filename, index=False)
+def make_excel(rows, output):
+    """Ghi workbook ở chế độ write-only, từng dòng một, vào file hoặc buffer `output`."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(REPORT_COLUMNS)
+    for row in rows:
+        ws.append(row)
+    wb.save(output)
 
 def send_report_email(period="day"):
     config = load_report_config()
@@ -85,8 +93,7 @@ def send_report_email(period="day"):
     if not emails or not smtp_cfg:
         logger.error("[Report] Missing email or SMTP config.")
         return
-    data = get_report_data(period)
-    stats = emotion_statistics(data)
+    stats = emotion_statistics(period)
     now = datetime.now()
     if period == "day":
         subject = f"[Báo cáo phân tích tin tức] Tổng kết ngày {now.strftime('%d/%m/%Y')}."
@@ -94,7 +101,16 @@ def send_report_email(period="day"):
     else:
         subject = f"[Báo cáo phân tích tin tức] Tổng kết tuần {now.strftime('%d/%m/%Y')}."
         filename = f"bao_cao_phan_tich_tuan_{now.strftime('%Y%m%d')}.xlsx"
-    make_excel(data, filename)
+    # Đếm số câu chuyện (nhóm bài gần trùng) ngay khi ghi file đính kèm, không cần truy vấn thêm
+    stories = set()
+
+    def report_rows():
+        for row in iter_report_data(period):
+            stories.add(row[1] if row[1] is not None else row[0])
+            yield row
+
+    attachment = io.BytesIO()
+    make_excel(report_rows(), attachment)
     # Compose email in Vietnamese
     body = f"""
 Kính gửi Quản trị viên,
@@ -103,9 +119,10 @@ Dưới đây là thống kê cảm xúc các bài báo đã phân tích {'trong
 """
     for emo in EMOTION_CATEGORIES:
         body += f"- {emo}: {stats.get(emo, 0)}\n"
-    if "Không xác định" in stats:
-        body += f"- Không xác định: {stats['Không xác định']}\n"
-    body += f"\nTổng số bài báo đã phân tích thành công: {len(data)}\n"
+    if UNKNOWN_EMOTION in stats:
+        body += f"- {UNKNOWN_EMOTION}: {stats[UNKNOWN_EMOTION]}\n"
+    body += f"\nTổng số bài báo đã phân tích thành công: {sum(stats.values())}\n"
+    body += f"Số câu chuyện khác nhau (gộp các bài gần trùng giữa các báo): {len(stories)}\n"
     body += "\nFile đính kèm chứa chi tiết từng bài báo.\n\nTrân trọng."
     # Send email
     msg = EmailMessage()
@@ -113,8 +130,8 @@ Dưới đây là thống kê cảm xúc các bài báo đã phân tích {'trong
     msg["From"] = smtp_cfg.get("user")
     msg["To"] = ", ".join(emails)
     msg.set_content(body)
-    with open(filename, "rb") as f:
-        msg.add_attachment(f.read(), maintype="application", subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet", filename=filename)
+    msg.add_attachment(attachment.getvalue(), maintype="application", subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet", filename=filename)
+    attachment.close()
     try:
         with smtplib.SMTP(smtp_cfg["host"], smtp_cfg["port"]) as server:
             if smtp_cfg.get("use_tls", True):
@@ -124,6 +141,3 @@ Dưới đây là thống kê cảm xúc các bài báo đã phân tích {'trong
         logger.info(f"[Report] Đã gửi email báo cáo {period} thành công.")
     except Exception as e:
         logger.error(f"[Report] Lỗi khi gửi email: {e}")
-    finally:
-        if os.path.exists(filename):
-            os.remove(filename)
@@ -0,0 +1,187 @@
+"""
+Bảng tổng hợp emotion_rollups: số bài theo site, giờ và cảm xúc,
+và bảng status_counters: số bài phân tích thành công / lỗi theo ngày.
+Được cập nhật trong cùng transaction với mỗi lô kết quả phân tích được lưu.
+Dựng lại toàn bộ từ crawled_data (ví dụ lần đầu triển khai) bằng:
+
+    python -m services.rollups
+"""
+from dotenv import load_dotenv
+import os
+# Load .env from the backend_analysis directory explicitly, before any other imports
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from sqlalchemy import delete, func, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.database import SessionLocal, init_db
+from db.models import CrawledData, EmotionRollup, StatusCounter
+from services.emotions import EMOTION_CATEGORIES, emotion_name
+
+logger = logging.getLogger("rollups")
+
+# Số dòng lấy mỗi lần khi dựng lại từ crawled_data
+REBUILD_FETCH_SIZE = 5000
+
+def site_of(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+def hour_bucket(moment: datetime) -> datetime:
+    """Làm tròn xuống đầu giờ, cùng dạng naive như cột analyzed_at."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def _insert(dialect: str, model=EmotionRollup):
+    """Chọn câu lệnh INSERT hỗ trợ ON CONFLICT theo loại DB đang dùng."""
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+def result_counts(results: Iterable[Tuple[str, datetime, bool, Optional[int]]]):
+    """
+    Gộp kết quả (url, analyzed_at, success, emotion) của một lô bài thành số đếm
+    theo (site, giờ, cảm xúc) cho emotion_rollups và theo ngày cho status_counters.
+    """
+    rollups: Dict[Tuple[str, datetime, int], int] = defaultdict(int)
+    status: Dict[date, Dict[str, int]] = defaultdict(lambda: {"analyzed": 0, "failed": 0})
+    for url, analyzed_at, success, emotion in results:
+        hour = hour_bucket(analyzed_at)
+        status[hour.date()]["analyzed" if success else "failed"] += 1
+        if success:
+            rollups[(site_of(url), hour, emotion)] += 1
+    return rollups, status
+
+def rollup_upsert(dialect: str, counts: Dict[Tuple[str, datetime, int], int]):
+    """
+    Một câu INSERT ... ON CONFLICT cộng dồn mọi số đếm vào emotion_rollups. Các dòng được sắp theo
+    khóa để các worker ghi song song luôn khóa dòng theo cùng thứ tự (tránh deadlock).
+    """
+    stmt = _insert(dialect).values([
+        {"site": site, "hour": hour, "emotion": emotion, "count": count}
+        for (site, hour, emotion), count in sorted(counts.items())
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=["site", "hour", "emotion"],
+        set_={"count": EmotionRollup.count + stmt.excluded.count}
+    )
+
+def status_upsert(dialect: str, counts: Dict[date, Dict[str, int]]):
+    """Cộng dồn số bài phân tích thành công / lỗi theo ngày vào status_counters (backend_crawling đọc cho /api/status)."""
+    stmt = _insert(dialect, StatusCounter).values([
+        {"day": day, "crawled": 0, "analyzed": values["analyzed"], "failed": values["failed"]}
+        for day, values in sorted(counts.items())
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=["day"],
+        set_={
+            "analyzed": StatusCounter.analyzed + stmt.excluded.analyzed,
+            "failed": StatusCounter.failed + stmt.excluded.failed,
+        }
+    )
+
+async def record_results(db: AsyncSession, results: Iterable[Tuple[str, datetime, bool, Optional[int]]]):
+    """Cộng dồn kết quả của một lô bài vào emotion_rollups và status_counters (chưa commit, để dùng chung transaction)."""
+    rollups, status = result_counts(results)
+    dialect = db.bind.dialect.name
+    if rollups:
+        await db.execute(rollup_upsert(dialect, rollups))
+    if status:
+        await db.execute(status_upsert(dialect, status))
+
+def rebuild_rollups() -> int:
+    """
+    Xóa và dựng lại emotion_rollups từ crawled_data trong một transaction; trả về số dòng tổng hợp.
+    Với PostgreSQL, bảng được khóa trước khi đếm (như rebuild_status của backend_crawling): save_results
+    (cập nhật crawled_data và cộng dồn emotion_rollups trong cùng transaction) chờ đến khi dựng lại xong,
+    nên không có kết quả nào bị mất hay bị đếm hai lần. SQLite vốn chỉ cho một transaction ghi.
+    """
+    db = SessionLocal()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("LOCK TABLE crawled_data, emotion_rollups IN SHARE ROW EXCLUSIVE MODE"))
+        counts: Dict[Tuple[str, datetime, int], int] = defaultdict(int)
+        query = db.query(CrawledData.url, CrawledData.analyzed_at, CrawledData.emotion).filter(
+            CrawledData.is_analyzed == True,
+            CrawledData.analyze_success == True,
+            CrawledData.analyzed_at.isnot(None),
+            CrawledData.emotion.isnot(None)
+        ).yield_per(REBUILD_FETCH_SIZE)
+        for url, analyzed_at, emotion in query:
+            counts[(site_of(url), hour_bucket(analyzed_at), emotion)] += 1
+        db.execute(delete(EmotionRollup))
+        db.add_all(EmotionRollup(site=site, hour=hour, emotion=emotion, count=count)
+                   for (site, hour, emotion), count in counts.items())
+        db.commit()
+        return len(counts)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def emotion_totals(start: datetime, end: datetime) -> Dict[str, int]:
+    """Tổng số bài theo cảm xúc trong khoảng [start, end], đọc từ bảng tổng hợp."""
+    db = SessionLocal()
+    try:
+        rows = db.query(EmotionRollup.emotion, func.sum(EmotionRollup.count)).filter(
+            EmotionRollup.hour >= hour_bucket(start),
+            EmotionRollup.hour <= end
+        ).group_by(EmotionRollup.emotion).all()
+    finally:
+        db.close()
+    stats = {cat: 0 for cat in EMOTION_CATEGORIES}
+    for code, count in rows:
+        emo = emotion_name(code)
+        stats[emo] = stats.get(emo, 0) + int(count or 0)
+    return stats
+
+def bucket_start(hour: datetime, interval: str) -> datetime:
+    day = hour.replace(hour=0)
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+def emotion_series(interval: str, start: datetime, end: datetime, site: Optional[str] = None) -> List[dict]:
+    """
+    Chuỗi thời gian số bài theo cảm xúc, gộp theo ngày hoặc tuần (bắt đầu từ thứ Hai).
+    Truy vấn chỉ đọc bảng tổng hợp theo giờ, không quét crawled_data.
+    """
+    if interval not in ("day", "week"):
+        raise ValueError("interval must be 'day' or 'week'")
+    db = SessionLocal()
+    try:
+        query = db.query(EmotionRollup.hour, EmotionRollup.emotion, func.sum(EmotionRollup.count)).filter(
+            EmotionRollup.hour >= hour_bucket(start),
+            EmotionRollup.hour <= end
+        )
+        if site:
+            query = query.filter(EmotionRollup.site == site.lower())
+        rows = query.group_by(EmotionRollup.hour, EmotionRollup.emotion).all()
+    finally:
+        db.close()
+
+    buckets: Dict[datetime, Dict[str, int]] = {}
+    for hour, code, count in rows:
+        counts = buckets.setdefault(bucket_start(hour, interval), {cat: 0 for cat in EMOTION_CATEGORIES})
+        emo = emotion_name(code)
+        counts[emo] = counts.get(emo, 0) + int(count or 0)
+    return [
+        {"start": bucket.isoformat(), "total": sum(counts.values()), "emotions": counts}
+        for bucket, counts in sorted(buckets.items())
+    ]
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+    )
+    init_db()
+    logger.info(f"[Rollups] Đã dựng lại {rebuild_rollups()} dòng tổng hợp.")
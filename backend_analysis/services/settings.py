@@ -0,0 +1,20 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger("settings")
+
+# Load config from shared config file
+CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "config", "websites.json"))
+
+def load_config():
+    try:
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"[Config] Error loading config: {e}")
+        return {"websites": []}
+
+def load_analysis_config():
+    """Phần cấu hình "analysis" trong websites.json (có thể không tồn tại)."""
+    return load_config().get("analysis", {})
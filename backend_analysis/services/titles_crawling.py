@@ -1,88 +1,391 @@
-import newspaper
+"""
+Xây dựng bộ dữ liệu tiêu đề bài báo (corpus huấn luyện PhoBERT) từ các trang trong config/websites.json.
+
+- Tải song song có giới hạn (tổng số kết nối và số kết nối mỗi site),
+- parse bằng Newspaper3k trong process pool,
+- ghi từng dòng ngay khi xong ra CSV hoặc Parquet (cần pyarrow),
+- lưu checkpoint các URL đã xử lý để chạy lại thì tiếp tục từ chỗ dừng,
+- mở rộng từ các link bài báo trong trang đã tải khi newspaper.build không đủ số bài.
+
+Chạy từ thư mục backend_analysis:
+
+    python -m services.titles_crawling --output all_titles.csv --max-per-site 20000
+"""
+import argparse
+import asyncio
 import csv
-import time
-from urllib.parse import urldefrag, urlparse
+import glob
+import logging
 import os
-import json
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import httpx
+import newspaper
 
-# Load news sites from shared config file
-CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "backend_crawling", "config", "websites.json")
+from services.settings import load_config
 
-def load_sites_from_config():
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-        config = json.load(f)
-    return [site["base_url"] for site in config.get("websites", []) if site.get("active", True)]
+logger = logging.getLogger("titles_crawling")
 
-MAX_ARTICLES_PER_SITE = 288
+MAX_ARTICLES_PER_SITE = 20000
 OUTPUT_CSV = "all_titles.csv"
 MIN_WORD_COUNT = 50  # ngưỡng từ tối thiểu để coi là bài báo
+COLUMNS = ["Website", "STT", "Tiêu đề", "URL"]
+
+# Ghi dữ liệu và checkpoint xuống đĩa sau mỗi chừng này bài
+FLUSH_EVERY = 200
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# Các trang không phải bài báo khi mở rộng theo link
+IGNORED_PATHS = ("/tag/", "/tags/", "/search", "/tim-kiem", "/video", "/login", "/rss")
+
+# Trạng thái lưu trong checkpoint. Bài đã xếp hàng (QUEUED) nhưng chưa xong, kể cả bài lỗi tải,
+# được xếp hàng lại khi chạy tiếp
+KEPT, SKIPPED, QUEUED = "kept", "skipped", "queued"
+
+
+def load_sites_from_config():
+    config = load_config()
+    return [site["base_url"] for site in config.get("websites", []) if site.get("active", True)]
+
+
+def normalize_url(url: str) -> str:
+    # Loại bỏ fragment (#...) để không tải trùng một bài
+    return urldefrag(url.strip())[0]
 
 
 def is_article(article, min_word_count=MIN_WORD_COUNT):
     og = article.meta_data.get('og', {})
     if og.get('type') == 'article':
         return True
-    parsed = urlparse(article.url)
-    # if parsed.path.endswith('.html'):
-    #     return True
     text = article.text or ""
     if len(text.split()) >= min_word_count:
         return True
     return False
 
 
-def crawl_titles(url, language='vi', max_articles=288):
-    news_site = newspaper.build(url, language=language, memoize_articles=False)
-    # Dùng set để track URLs đã xử lý (không tính fragment)
-    seen = set()
+def looks_like_article(url: str) -> bool:
+    """URL bài báo của các báo tiếng Việt: kết thúc bằng .html/.htm hoặc có slug nhiều từ."""
+    path = urlparse(url).path
+    if any(part in path for part in IGNORED_PATHS):
+        return False
+    slug = path.rstrip("/").rsplit("/", 1)[-1]
+    return path.endswith((".html", ".htm")) or slug.count("-") >= 3
 
-    # Chỉ lấy 288 link đầu
-    candidates = news_site.articles[:max_articles]
-    titles = []
-    print(f"[{url}] Tổng liên kết tìm được: {len(news_site.articles)} – sẽ thử crawl {len(candidates)} bài")
 
-    for idx, article in enumerate(candidates, start=1):
-        # 1. Loại bỏ fragment (#...) để normalize URL
-        norm_url, _ = urldefrag(article.url)
-        if norm_url in seen:
-            # đã crawl url này rồi
-            print(f"  ↳ Bỏ qua (duplicate): {article.url}")
+def article_links(doc, page_url: str) -> List[str]:
+    """Các link bài báo cùng site trong một trang đã parse (lxml)."""
+    host = urlparse(page_url).netloc
+    links = []
+    for element in doc.iter("a"):
+        href = element.get("href")
+        if not href:
             continue
-        seen.add(norm_url)
-        # gán lại article.url để các bước tiếp theo dùng URL chuẩn
-        article.url = norm_url
+        link = normalize_url(urljoin(page_url, href))
+        if urlparse(link).netloc == host and looks_like_article(link):
+            links.append(link)
+    return links
+
+
+def discover_urls(site: str, limit: int) -> List[str]:
+    """Các link bài báo newspaper.build tìm được (chuyên mục, RSS) cùng các link bài trên trang chủ."""
+    news_site = newspaper.build(site, language='vi', memoize_articles=False)
+    urls = [normalize_url(article.url) for article in news_site.articles]
+    if news_site.doc is not None:
+        urls.extend(article_links(news_site.doc, site))
+    urls = list(dict.fromkeys(urls))
+    logger.info(f"[Titles] [{site}] Tổng liên kết tìm được: {len(urls)}")
+    return urls[:limit]
+
+
+def parse_title(url: str, html: str, follow_links: bool) -> Tuple[Optional[str], List[str]]:
+    """
+    Chạy trong process pool: parse trang bằng Newspaper3k.
+    Trả về (tiêu đề nếu đúng là bài báo, các link bài báo cùng site trong trang).
+    """
+    article = newspaper.Article(url, language='vi')
+    article.download(input_html=html)
+    article.parse()
+    title = article.title.strip() if article.title and is_article(article) else None
+
+    links = []
+    # clean_doc là bản sao của trang trước khi DocumentCleaner bỏ menu, danh sách bài liên quan...
+    if follow_links and article.clean_doc is not None:
+        links = article_links(article.clean_doc, url)
+    return title, links
+
+
+class CheckpointStore:
+    """
+    File checkpoint dạng "trạng thái<TAB>site<TAB>url" mỗi dòng, ghi nối tiếp.
+    Cho biết URL nào đã xử lý, URL nào còn trong hàng đợi
+    và mỗi site đã thử / giữ lại bao nhiêu bài.
+    """
+
+    def __init__(self, path: str, fresh: bool):
+        self.path = path
+        self.done: Set[str] = set()
+        self.queued: Dict[str, str] = {}
+        self.tried: Dict[str, int] = defaultdict(int)
+        self.kept: Dict[str, int] = defaultdict(int)
+        if fresh and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) == 3:
+                        self._count(*parts)
+        self.file = open(path, "a", encoding="utf-8")
+        self.lines: List[str] = []
 
-        # 2. Download & parse
+    def _count(self, status: str, site: str, url: str):
+        if status == QUEUED:
+            if url not in self.done:
+                self.queued[url] = site
+            return
+        self.queued.pop(url, None)
+        if url in self.done:
+            return
+        self.done.add(url)
+        self.tried[site] += 1
+        if status == KEPT:
+            self.kept[site] += 1
+
+    def pending(self) -> List[Tuple[str, str]]:
+        """Các (site, url) đã xếp hàng ở lượt trước nhưng chưa xử lý xong."""
+        return [(site, url) for url, site in self.queued.items()]
+
+    def add(self, status: str, site: str, url: str):
+        self._count(status, site, url)
+        # Chỉ ghi khi flush(), sau khi dữ liệu tương ứng đã xuống đĩa
+        self.lines.append(f"{status}\t{site}\t{url}\n")
+
+    def flush(self):
+        self.file.write("".join(self.lines))
+        self.lines = []
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class CsvSink:
+    def __init__(self, path: str, fresh: bool):
+        new_file = fresh or not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "w" if new_file else "a", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file)
+        if new_file:
+            self.writer.writerow(COLUMNS)
+
+    def write(self, row: list):
+        self.writer.writerow(row)
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class ParquetSink:
+    """Ghi Parquet theo từng row group; mỗi lần chạy tiếp ghi ra một file part mới."""
+
+    def __init__(self, path: str, fresh: bool):
         try:
-            article.download()
-            article.parse()
-            # 3. Chỉ lưu nếu đúng là bài báo
-            if article.title and is_article(article):
-                titles.append(article.title.strip())
-            else:
-                print(f"  ↳ Bỏ qua (không phải bài báo): {article.url}")
-        except Exception as e:
-            print(f"Lỗi tại bài {idx} ({url}): {e}")
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Cần cài pyarrow để ghi Parquet (pip install pyarrow).")
+        self.pa = pa
+        stem = path[:-len(".parquet")]
+        existing = [path] + sorted(glob.glob(f"{glob.escape(stem)}.part*.parquet"))
+        if fresh:
+            for old in existing:
+                if os.path.exists(old):
+                    os.remove(old)
+        target = path
+        if os.path.exists(path):
+            target = f"{stem}.part{len([p for p in existing if os.path.exists(p)])}.parquet"
+        self.schema = pa.schema([("Website", pa.string()), ("STT", pa.int64()), ("Tiêu đề", pa.string()), ("URL", pa.string())])
+        self.writer = pq.ParquetWriter(target, self.schema)
+        self.rows: List[list] = []
 
-        time.sleep(0.1)
+    def write(self, row: list):
+        self.rows.append(row)
 
-    return titles
+    def flush(self):
+        if not self.rows:
+            return
+        columns = list(zip(*self.rows))
+        self.writer.write_table(self.pa.table(
+            {name: list(values) for name, values in zip(COLUMNS, columns)}, schema=self.schema
+        ))
+        self.rows = []
 
+    def close(self):
+        self.flush()
+        self.writer.close()
 
-def save_all_titles(sites, output_csv, max_per_site):
-    with open(output_csv, mode='w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(["Website", "STT", "Tiêu đề"])
 
-        for site in sites:
-            titles = crawl_titles(site, max_articles=max_per_site)
-            for idx, title in enumerate(titles, start=1):
-                writer.writerow([site, idx, title])
-            print(f"Đã crawl xong {len(titles)} tiêu đề từ {site}\n")
+async def build_dataset(
+    sites: List[str],
+    output: str,
+    max_per_site: int = MAX_ARTICLES_PER_SITE,
+    concurrency: int = 24,
+    per_host: int = 8,
+    parse_workers: Optional[int] = None,
+    timeout: float = 15,
+    follow_links: bool = True,
+    fresh: bool = False,
+) -> Dict[str, int]:
+    """Tải và parse song song, trả về số tiêu đề đã lưu của mỗi site (kể cả các lần chạy trước)."""
+    checkpoint = CheckpointStore(output + ".checkpoint", fresh)
+    sink = ParquetSink(output, fresh) if output.endswith(".parquet") else CsvSink(output, fresh)
+    loop = asyncio.get_running_loop()
 
-    print(f"Hoàn tất! Đã lưu tiêu đề từ {len(sites)} trang vào {output_csv}")
+    # Số bài đã lên lịch trong lượt chạy này cho mỗi site; cộng với số bài đã thử ở các lượt
+    # trước thì không vượt quá max_per_site
+    previously_tried = dict(checkpoint.tried)
+    scheduled: Dict[str, int] = defaultdict(int)
+    seen: Set[str] = set(checkpoint.done)
+    queue: asyncio.Queue = asyncio.Queue()
 
+    def enqueue(site: str, urls: List[str], record_queued: bool = True):
+        for url in urls:
+            if url in seen or previously_tried.get(site, 0) + scheduled[site] >= max_per_site:
+                continue
+            seen.add(url)
+            scheduled[site] += 1
+            queue.put_nowait((site, url))
+            if record_queued:
+                checkpoint.add(QUEUED, site, url)
 
-if __name__ == "__main__":
+    # Tiếp tục hàng đợi của lượt chạy trước (gồm các link mở rộng không tìm lại được từ trang chủ)
+    for site, url in checkpoint.pending():
+        enqueue(site, [url], record_queued=False)
+
+    with ThreadPoolExecutor(max_workers=max(1, len(sites))) as discovery_pool:
+        discovered = await asyncio.gather(*(
+            loop.run_in_executor(discovery_pool, discover_urls, site, max_per_site) for site in sites
+        ), return_exceptions=True)
+    # Xen kẽ các site để giới hạn mỗi site không làm nghẽn cả hàng đợi
+    per_site = []
+    for site, urls in zip(sites, discovered):
+        if isinstance(urls, Exception):
+            logger.error(f"[Titles] [{site}] Lỗi khi tìm liên kết: {urls}")
+            urls = []
+        per_site.append((site, urls))
+    for index in range(max((len(urls) for _, urls in per_site), default=0)):
+        for site, urls in per_site:
+            if index < len(urls):
+                enqueue(site, [urls[index]])
+    logger.info(f"[Titles] Bắt đầu tải {queue.qsize()} bài ({len(checkpoint.done)} bài đã xử lý trước đó).")
+
+    host_limits: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(max(1, per_host)))
+    stats = {"kept": 0, "skipped": 0, "errors": 0}
+    pending_flush = 0
+    started = time.perf_counter()
+
+    def record(status: str, site: str, url: str, title: Optional[str] = None):
+        nonlocal pending_flush
+        if title is not None:
+            sink.write([site, checkpoint.kept[site] + 1, title, url])
+        checkpoint.add(status, site, url)
+        pending_flush += 1
+        if pending_flush >= FLUSH_EVERY:
+            # Dữ liệu phải xuống đĩa trước checkpoint để chạy tiếp không làm mất dòng nào
+            sink.flush()
+            checkpoint.flush()
+            pending_flush = 0
+            processed = stats["kept"] + stats["skipped"] + stats["errors"]
+            rate = processed / (time.perf_counter() - started)
+            logger.info(f"[Titles] Đã xử lý {processed} bài ({rate:.1f} bài/giây), còn {queue.qsize()} trong hàng đợi: {stats}")
+
+    async def worker(client: httpx.AsyncClient, parse_pool: ProcessPoolExecutor):
+        while True:
+            site, url = await queue.get()
+            try:
+                async with host_limits[urlparse(url).netloc]:
+                    response = await client.get(url)
+                response.raise_for_status()
+                title, links = await loop.run_in_executor(parse_pool, parse_title, url, response.text, follow_links)
+            except Exception as e:
+                logger.error(f"[Titles] Lỗi khi xử lý {url}: {e}")
+                stats["errors"] += 1
+            else:
+                if title:
+                    stats["kept"] += 1
+                    record(KEPT, site, url, title)
+                else:
+                    stats["skipped"] += 1
+                    record(SKIPPED, site, url)
+                enqueue(site, links)
+            finally:
+                queue.task_done()
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        with ProcessPoolExecutor(max_workers=parse_workers) as parse_pool:
+            async with httpx.AsyncClient(headers=HEADERS, timeout=timeout, follow_redirects=True, limits=limits) as client:
+                workers = [asyncio.create_task(worker(client, parse_pool)) for _ in range(max(1, concurrency))]
+                try:
+                    await queue.join()
+                finally:
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+    finally:
+        sink.close()
+        checkpoint.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"[Titles] Hoàn tất lượt chạy trong {elapsed:.1f}s: {stats}")
+    return {site: checkpoint.kept[site] for site in sites}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=OUTPUT_CSV, help="file .csv hoặc .parquet")
+    parser.add_argument("--max-per-site", type=int, default=MAX_ARTICLES_PER_SITE)
+    parser.add_argument("--concurrency", type=int, default=24, help="số kết nối tải đồng thời tổng cộng")
+    parser.add_argument("--per-host", type=int, default=8, help="số kết nối đồng thời tối đa mỗi site")
+    parser.add_argument("--parse-workers", type=int, default=None, help="số tiến trình parse (mặc định: số CPU)")
+    parser.add_argument("--timeout", type=float, default=15)
+    parser.add_argument("--no-follow-links", dest="follow_links", action="store_false",
+                        help="chỉ dùng các link newspaper.build tìm được")
+    parser.add_argument("--fresh", action="store_true", help="bỏ checkpoint và ghi đè file kết quả")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+    )
     sites = load_sites_from_config()
-    save_all_titles(sites, OUTPUT_CSV, MAX_ARTICLES_PER_SITE)
+    kept = asyncio.run(build_dataset(
+        sites, args.output,
+        max_per_site=args.max_per_site,
+        concurrency=args.concurrency,
+        per_host=args.per_host,
+        parse_workers=args.parse_workers,
+        timeout=args.timeout,
+        follow_links=args.follow_links,
+        fresh=args.fresh,
+    ))
+    for site, count in kept.items():
+        logger.info(f"[Titles] {site}: {count} tiêu đề")
+    logger.info(f"[Titles] Hoàn tất! Đã lưu tiêu đề từ {len(sites)} trang vào {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import or_, select, update
+
+from db.database import AsyncSessionLocal
+from db.models import CrawledData
+
+logger = logging.getLogger("work_queue")
+
+
+def new_worker_id() -> str:
+    """Định danh duy nhất cho một lượt phân tích (máy, tiến trình, lượt chạy)."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def claim_batch(worker_id: str, batch_size: int, lease_seconds: float) -> List[Tuple[int, str]]:
+    """
+    Nhận một lô bài chưa phân tích bằng SELECT ... FOR UPDATE SKIP LOCKED:
+    các worker chạy song song (nhiều tiến trình hoặc nhiều máy) không bao giờ nhận trùng bài.
+    Bài đã được nhận nhưng hết hạn lease (worker bị dừng giữa chừng) được nhận lại.
+    Trả về danh sách (id, url).
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            now = datetime.utcnow()
+            claimable = (
+                select(CrawledData.id)
+                .where(
+                    CrawledData.is_analyzed == False,
+                    or_(CrawledData.lease_expires_at.is_(None), CrawledData.lease_expires_at < now)
+                )
+                .order_by(CrawledData.crawled_at, CrawledData.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = (await db.execute(
+                update(CrawledData)
+                .where(CrawledData.id.in_(claimable.scalar_subquery()))
+                .values(claimed_by=worker_id, lease_expires_at=now + timedelta(seconds=lease_seconds))
+                .returning(CrawledData.id, CrawledData.url)
+                .execution_options(synchronize_session=False)
+            )).all()
+            await db.commit()
+            return [(row.id, row.url) for row in rows]
+        except Exception:
+            await db.rollback()
+            raise
+
+
+async def release_claims(worker_id: str) -> int:
+    """Trả lại các bài đã nhận nhưng chưa xử lý xong để worker khác nhận ngay, không chờ hết lease."""
+    async with AsyncSessionLocal() as db:
+        try:
+            released = (await db.execute(
+                update(CrawledData)
+                .where(CrawledData.claimed_by == worker_id, CrawledData.is_analyzed == False)
+                .values(claimed_by=None, lease_expires_at=None)
+                .execution_options(synchronize_session=False)
+            )).rowcount
+            await db.commit()
+            return released
+        except Exception:
+            await db.rollback()
+            raise
+
+
+async def renew_claims(worker_id: str, lease_seconds: float) -> int:
+    """Gia hạn lease của các bài worker vẫn giữ; bài đã bị worker khác nhận lại thì không đụng tới."""
+    async with AsyncSessionLocal() as db:
+        try:
+            renewed = (await db.execute(
+                update(CrawledData)
+                .where(CrawledData.claimed_by == worker_id, CrawledData.is_analyzed == False)
+                .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds))
+                .execution_options(synchronize_session=False)
+            )).rowcount
+            await db.commit()
+            return renewed
+        except Exception:
+            await db.rollback()
+            raise
+
+
+async def keep_claims(worker_id: str, lease_seconds: float, interval_seconds: float):
+    """
+    Gia hạn lease mỗi interval_seconds cho đến khi bị hủy (hết lượt phân tích), để bài nằm lâu ở
+    các giai đoạn (tải, parse, LLM cùng các lần thử lại) không bị worker khác nhận và phân tích lần nữa.
+    Worker chết thì ngừng gia hạn và bài được nhận lại sau khi lease hết hạn như trước.
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await renew_claims(worker_id, lease_seconds)
+        except Exception as e:
+            # Lần sau thử lại; lease còn hiệu lực thêm vài chu kỳ nữa
+            logger.error(f"[Analyze] Lỗi khi gia hạn lease: {e}")
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from db.database import engine
+from services.metrics import JOB_SECONDS
+
+logger = logging.getLogger("worker")
+
+# Kênh NOTIFY mà backend_crawling gửi sau mỗi lô bài mới (xem utils/ingest.py bên crawling)
+NOTIFY_CHANNEL = "crawled_data_new"
+
+# Thời gian chờ trước khi kết nối LISTEN lại sau khi mất kết nối
+RECONNECT_DELAY_SECONDS = 10
+
+
+class AnalysisWorker:
+    """
+    Worker phân tích chạy liên tục trong vòng đời của app:
+      - được đánh thức bởi Postgres LISTEN/NOTIFY khi crawler ghi bài mới,
+      - tự chạy lại sau mỗi poll_interval_seconds nếu không có thông báo (SQLite, mất kết nối...),
+      - mỗi tiến trình chỉ có một lượt phân tích tại một thời điểm; thông báo đến trong lúc đang chạy
+        được gộp thành đúng một lượt chạy tiếp theo.
+    """
+
+    def __init__(self, run: Callable[[], Awaitable[Dict[str, Any]]], poll_interval_seconds: float = 300, debounce_seconds: float = 1.0):
+        self.run = run
+        self.poll_interval = poll_interval_seconds
+        self.debounce = debounce_seconds
+        self._lock = asyncio.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks = []
+        self._listener = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._wake.set()  # Xử lý ngay các bài tồn đọng khi khởi động
+        self._tasks = [asyncio.create_task(self._drain_forever())]
+        if engine.dialect.name == "postgresql":
+            self._tasks.append(asyncio.create_task(self._listen_forever()))
+        else:
+            logger.info(f"[Worker] DB {engine.dialect.name} không hỗ trợ LISTEN/NOTIFY, chỉ poll mỗi {self.poll_interval}s.")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._close_listener()
+
+    def wake(self):
+        """Đánh thức worker; an toàn khi gọi từ thread khác."""
+        if self._wake is None or self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Chạy một lượt phân tích; nếu đang có lượt khác thì chờ lượt đó xong rồi mới chạy."""
+        async with self._lock:
+            start = time.perf_counter()
+            try:
+                return await self.run()
+            finally:
+                JOB_SECONDS.labels("analyze").observe(time.perf_counter() - start)
+
+    async def _drain_forever(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                # Gộp các thông báo của cùng một lượt crawl (mỗi site một lô) thành một lượt chạy
+                await asyncio.sleep(self.debounce)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                result = await self.run_once()
+                logger.info(f"[Worker] {result.get('detail')}")
+            except Exception as e:
+                logger.error(f"[Worker] Lỗi khi phân tích: {e}. Thử lại sau {RECONNECT_DELAY_SECONDS}s.")
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    def _open_listener(self):
+        # Kết nối riêng, không trả về pool, ở chế độ autocommit để nhận thông báo ngay
+        connection = engine.raw_connection()
+        connection.detach()
+        raw = connection.dbapi_connection
+        raw.autocommit = True
+        with raw.cursor() as cursor:
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        return raw
+
+    def _close_listener(self):
+        if self._listener is None:
+            return
+        try:
+            self._loop.remove_reader(self._listener.fileno())
+        except Exception:
+            pass
+        try:
+            self._listener.close()
+        except Exception:
+            pass
+        self._listener = None
+
+    def _on_notify(self, closed: asyncio.Future):
+        try:
+            self._listener.poll()
+        except Exception as e:
+            if not closed.done():
+                closed.set_exception(e)
+            return
+        if self._listener.notifies:
+            logger.info(f"[Worker] Nhận {len(self._listener.notifies)} thông báo bài mới.")
+            self._listener.notifies.clear()
+            self._wake.set()
+
+    async def _listen_forever(self):
+        while True:
+            closed = self._loop.create_future()
+            try:
+                self._listener = await self._loop.run_in_executor(None, self._open_listener)
+                self._loop.add_reader(self._listener.fileno(), self._on_notify, closed)
+                logger.info(f"[Worker] Đang LISTEN kênh {NOTIFY_CHANNEL}.")
+                # Bài mới có thể được ghi trong lúc chưa LISTEN
+                self._wake.set()
+                await closed
+            except asyncio.CancelledError:
+                raise
+            except NotImplementedError:
+                # Event loop không hỗ trợ add_reader (ProactorEventLoop trên Windows)
+                logger.warning("[Worker] Event loop không hỗ trợ LISTEN/NOTIFY, chỉ dùng poll.")
+                self._close_listener()
+                return
+            except Exception as e:
+                logger.error(f"[Worker] Mất kết nối LISTEN: {e}. Kết nối lại sau {RECONNECT_DELAY_SECONDS}s, trong lúc đó vẫn poll.")
+            finally:
+                self._close_listener()
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
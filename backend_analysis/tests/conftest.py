@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# Các module trong db/ và services/ cần DATABASE_URL khi import; test dùng file SQLite tạm
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+os.environ.setdefault("DEEPSEEK_API", "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,32 @@
+import asyncio
+from datetime import timedelta
+
+from db.database import dispose_async_engine, init_db
+from services.analysis_cache import AnalysisCache, cache_key
+
+
+def test_memory_entries_expire_with_ttl():
+    init_db()
+    cache = AnalysisCache(ttl_days=1)
+    key = cache_key("Nội dung bài báo", "v1")
+
+    async def run():
+        try:
+            await cache.put(key, "Cảm xúc: Tích cực")
+            assert await cache.get(key) == "Cảm xúc: Tích cực"
+
+            # Tiến trình chạy lâu hơn TTL: phần tử trong LRU không còn được dùng
+            analysis, created_at = cache._memory[key]
+            cache._memory[key] = (analysis, created_at - timedelta(days=2))
+            assert await cache.get(key) == "Cảm xúc: Tích cực"
+            assert cache._memory[key][1] == created_at
+
+            cache._memory[key] = (analysis, created_at - timedelta(days=2))
+            cache.ttl = timedelta(seconds=0)
+            assert await cache.get(key) is None
+            assert key not in cache._memory
+            assert cache.stats() == {"hits": 2, "misses": 1}
+        finally:
+            await dispose_async_engine()
+
+    asyncio.run(run())
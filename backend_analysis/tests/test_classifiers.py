@@ -0,0 +1,19 @@
+from services.classifiers import DeepSeekBackend
+
+
+def test_cache_version_changes_with_streaming_and_batching():
+    plain = DeepSeekBackend(streaming={"enabled": False}).cache_version
+    streaming = DeepSeekBackend(streaming={"enabled": True, "summary_sentences": 2}).cache_version
+    versions = {
+        plain,
+        streaming,
+        DeepSeekBackend(streaming={"enabled": True, "summary_sentences": 3}).cache_version,
+        DeepSeekBackend(streaming={"enabled": True, "max_tokens": 500}).cache_version,
+        DeepSeekBackend(streaming={"enabled": False}, batching={"enabled": True}).cache_version,
+        DeepSeekBackend(streaming={"enabled": False}, batching={"enabled": True, "max_article_tokens": 800}).cache_version,
+    }
+
+    assert len(versions) == 6
+    # Cài đặt không đổi nội dung báo cáo thì giữ nguyên cache
+    assert DeepSeekBackend(streaming={"enabled": False}, batching={"max_wait_ms": 50}).cache_version == plain
+    assert DeepSeekBackend(concurrency=8, streaming={"enabled": True, "summary_sentences": 2}).cache_version == streaming
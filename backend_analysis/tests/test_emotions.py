@@ -0,0 +1,22 @@
+from services.deepseek import StreamedReport
+from services.emotions import EMOTION_CODES, emotion_code, extract_emotion, find_emotion
+
+# "Tích cực" đứng trước trong EMOTION_CATEGORIES nhưng xuất hiện sau "Trung lập" trong văn bản
+ANALYSIS = "Cảm xúc: **Trung lập**. Bài viết không mang sắc thái tích cực rõ rệt. Nội dung chỉ đưa tin."
+
+
+def test_stored_and_streamed_emotion_agree():
+    report = StreamedReport()
+    for word in ANALYSIS.split(" "):
+        report.feed(word + " ")
+
+    assert report.emotion == "Trung lập"
+    assert extract_emotion(ANALYSIS) == report.emotion
+    assert emotion_code(ANALYSIS) == EMOTION_CODES[report.emotion]
+
+
+def test_find_emotion_positions():
+    emotion, start, end = find_emotion(ANALYSIS)
+
+    assert ANALYSIS[start:end] == emotion
+    assert find_emotion("Không có nhãn") is None
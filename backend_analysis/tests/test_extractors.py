@@ -0,0 +1,74 @@
+import base64
+import json
+import os
+import zlib
+
+import pytest
+
+from benchmarks.bench_extractors import f1
+from services.content import PAGE_PREFIX, stored_text
+from services.extractors import ExtractorRegistry, compiled, decode_html, extract_article, newspaper_text
+from services.settings import load_config
+
+ARTICLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "articles")
+
+# Ngưỡng F1 theo từ so với nội dung chuẩn (<tên trang>.txt)
+MIN_SITE_F1 = 0.95
+MIN_NEWSPAPER_F1 = 0.85
+
+REGISTRY = ExtractorRegistry.from_websites(load_config().get("websites", []))
+
+with open(os.path.join(ARTICLES, "manifest.json"), "r", encoding="utf-8") as f:
+    MANIFEST = json.load(f)
+
+
+def load_page(name: str):
+    with open(os.path.join(ARTICLES, name), "rb") as f:
+        content = f.read()
+    with open(os.path.join(ARTICLES, os.path.splitext(name)[0] + ".txt"), "r", encoding="utf-8") as f:
+        reference = f.read()
+    return MANIFEST[name], content, reference
+
+
+def test_every_configured_site_has_a_page():
+    specs = {REGISTRY.spec_for(url) for url in MANIFEST.values()} - {None}
+    assert specs == set(REGISTRY.specs.values())
+
+
+@pytest.mark.parametrize("name", [name for name, url in MANIFEST.items() if REGISTRY.spec_for(url)])
+def test_site_extractor_f1(name):
+    url, content, reference = load_page(name)
+
+    text = compiled(REGISTRY.spec_for(url)).extract(content)
+
+    assert f1(text, reference) >= MIN_SITE_F1
+
+
+@pytest.mark.parametrize("name", list(MANIFEST))
+def test_newspaper_fallback_f1(name):
+    url, content, reference = load_page(name)
+
+    text = newspaper_text(url, decode_html(content))
+
+    assert f1(text, reference) >= MIN_NEWSPAPER_F1
+
+
+def test_unconfigured_site_falls_back_to_newspaper():
+    url, content, reference = load_page("tuoitre.vn.html")
+    assert REGISTRY.spec_for(url) is None
+
+    text, used = extract_article(url, content)
+
+    assert used == "newspaper"
+    assert f1(text, reference) >= MIN_NEWSPAPER_F1
+
+
+def test_captured_page_uses_site_extractor():
+    # Trang được backend_crawling lưu dưới dạng UTF-8 nén (utils/content.py: compress_page)
+    url, content, reference = load_page("dantri.com.vn.html")
+    stored = PAGE_PREFIX + base64.b64encode(zlib.compress(content, 9)).decode("ascii")
+
+    text = stored_text(url, stored, REGISTRY)
+
+    assert text == compiled(REGISTRY.spec_for(url)).extract(content)
+    assert f1(text, reference) >= MIN_SITE_F1
@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from services.llm_client import LLMClient, LLMUnavailable
+
+URL = "https://llm.test/chat/completions"
+
+
+def make_client(handler, **kwargs) -> LLMClient:
+    client = LLMClient(max_retries=0, breaker_failures=1, breaker_cooldown_seconds=10, **kwargs)
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def expire_cooldown(client: LLMClient):
+    client.breaker.opened_at = time.monotonic() - client.breaker.open_for - 1
+
+
+async def fail(request):
+    return httpx.Response(500)
+
+
+def test_cancelled_probe_lets_next_request_probe():
+    async def run():
+        release = asyncio.Event()
+
+        async def slow(request):
+            await release.wait()
+            return httpx.Response(200, json={})
+
+        client = make_client(fail)
+        with pytest.raises(LLMUnavailable):
+            await client.post(URL, "a")
+        assert client.breaker.open and not client.available
+
+        expire_cooldown(client)
+        client.client = httpx.AsyncClient(transport=httpx.MockTransport(slow))
+        probe = asyncio.create_task(client.post(URL, "probe"))
+        await asyncio.sleep(0.01)
+        # Đang có yêu cầu thử: các yêu cầu khác bị từ chối
+        with pytest.raises(LLMUnavailable):
+            await client.post(URL, "b")
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        release.set()
+        response = await client.post(URL, "c")
+        assert response.status_code == 200
+        assert client.available and client.breaker.opened_at is None
+        await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_consumer_error_during_probe_reopens_breaker():
+    async def run():
+        async def ok(request):
+            return httpx.Response(200, content=b"data: {}\n\n")
+
+        async def broken(response):
+            raise ValueError("phản hồi sai định dạng")
+
+        client = make_client(fail)
+        with pytest.raises(LLMUnavailable):
+            await client.post(URL, "a")
+        expire_cooldown(client)
+        client.client = httpx.AsyncClient(transport=httpx.MockTransport(ok))
+        with pytest.raises(ValueError):
+            await client.stream(URL, "probe", broken)
+        # Yêu cầu thử thất bại: breaker mở lại cho một chu kỳ chờ mới, không bị kẹt ở trạng thái thử
+        assert client.breaker.open and not client.breaker._probing
+
+        expire_cooldown(client)
+        response = await client.post(URL, "b")
+        assert response.status_code == 200 and client.available
+        await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_consumer_error_when_closed_keeps_serving():
+    async def run():
+        async def ok(request):
+            return httpx.Response(200, content=b"data: {}\n\n")
+
+        async def broken(response):
+            raise ValueError("phản hồi sai định dạng")
+
+        client = LLMClient(max_retries=0, breaker_failures=3)
+        client.client = httpx.AsyncClient(transport=httpx.MockTransport(ok))
+        with pytest.raises(ValueError):
+            await client.stream(URL, "a", broken)
+        assert client.breaker.allow()
+        assert (await client.post(URL, "b")).status_code == 200
+        await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_long_retry_after_pauses_instead_of_sleeping():
+    async def run():
+        calls = []
+
+        async def throttled(request):
+            calls.append(request)
+            return httpx.Response(429, headers={"Retry-After": "3600"})
+
+        client = LLMClient(max_retries=3, backoff_max_seconds=5, breaker_cooldown_seconds=10)
+        client.client = httpx.AsyncClient(transport=httpx.MockTransport(throttled))
+        started = time.monotonic()
+        with pytest.raises(LLMUnavailable):
+            await client.post(URL, "a")
+        # Không ngủ và không thử lại: bài được để lại, mọi yêu cầu dừng trong thời gian được yêu cầu
+        assert time.monotonic() - started < 1 and len(calls) == 1
+        assert not client.available and client.breaker.open_for == 3600
+        assert client.limiter.inflight == 0
+        with pytest.raises(LLMUnavailable):
+            await client.post(URL, "b")
+        assert len(calls) == 1
+        assert client._backoff(0, 3600) <= client.backoff_max
+        await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_short_retry_after_is_waited():
+    async def run():
+        responses = [httpx.Response(429, headers={"Retry-After": "0.05"}), httpx.Response(200, json={})]
+
+        async def handler(request):
+            return responses.pop(0)
+
+        client = LLMClient(max_retries=1, backoff_max_seconds=5)
+        client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        assert (await client.post(URL, "a")).status_code == 200
+        assert client.available
+        await client.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,72 @@
+import asyncio
+import signal
+import time
+
+import pytest
+
+from services import parsing
+from services.parsing import ParsePool, ParseTimeout
+
+
+def hung_task(url, content, encoding, spec, timeout):
+    # Giả lập parse kẹt trong code C: SIGALRM không ngắt được
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+    time.sleep(60)
+
+
+def quick_task(url, content, encoding, spec, timeout):
+    return "nội dung", "test", 0.0
+
+
+def slow_or_hung_task(url, content, encoding, spec, timeout):
+    if url.endswith("/hung"):
+        hung_task(url, content, encoding, spec, timeout)
+    time.sleep(0.8)
+    return "nội dung " + url, "test", 0.0
+
+
+def test_hung_parse_leaves_no_live_process(monkeypatch):
+    monkeypatch.setattr(parsing, "HARD_TIMEOUT_GRACE_SECONDS", 0.5)
+    monkeypatch.setattr(parsing, "parse_task", hung_task)
+
+    async def run():
+        pool = ParsePool(workers=2, task_timeout_seconds=0.5)
+        executor = await pool._get_executor()
+        processes = list(executor._processes.values())
+        assert len(processes) == 2 and all(process.is_alive() for process in processes)
+
+        with pytest.raises(ParseTimeout):
+            await pool.parse("https://example.com/a", b"<html></html>")
+        assert not any(process.is_alive() for process in processes)
+
+        # Task sau chạy trên pool mới
+        monkeypatch.setattr(parsing, "parse_task", quick_task)
+        assert await pool.parse("https://example.com/b", b"<html></html>") == "nội dung"
+        assert pool._executor is not executor
+        pool.shutdown()
+
+    asyncio.run(run())
+
+
+def test_healthy_task_survives_recycle_for_hung_task(monkeypatch):
+    monkeypatch.setattr(parsing, "HARD_TIMEOUT_GRACE_SECONDS", 1)
+    monkeypatch.setattr(parsing, "parse_task", slow_or_hung_task)
+
+    async def run():
+        pool = ParsePool(workers=2, task_timeout_seconds=1)
+        executor = await pool._get_executor()
+
+        async def healthy():
+            # Đang chạy đúng lúc pool bị dừng vì task treo (sau 2 giây)
+            await asyncio.sleep(1.5)
+            return await pool.parse("https://example.com/ok", b"<html></html>")
+
+        hung, text = await asyncio.gather(
+            pool.parse("https://example.com/hung", b"<html></html>"), healthy(), return_exceptions=True
+        )
+        assert isinstance(hung, ParseTimeout)
+        assert text == "nội dung https://example.com/ok"
+        assert pool._executor is not executor
+        pool.shutdown()
+
+    asyncio.run(run())
@@ -0,0 +1,33 @@
+import asyncio
+
+from db.database import SessionLocal, dispose_async_engine, init_db
+from db.models import CrawledData
+from services.work_queue import claim_batch, keep_claims
+
+URL = "https://vnexpress.net/lease-{}.html"
+
+
+def test_kept_claims_are_not_claimed_by_another_worker():
+    init_db()
+    db = SessionLocal()
+    db.add_all(CrawledData(url=URL.format(i), is_analyzed=False) for i in range(3))
+    db.commit()
+    db.close()
+
+    async def run():
+        try:
+            claimed = await claim_batch("worker-a", 3, lease_seconds=0.3)
+            assert len(claimed) == 3
+            renewer = asyncio.create_task(keep_claims("worker-a", 0.3, 0.1))
+            # Bài nằm trong pipeline lâu hơn lease: vẫn thuộc worker-a nhờ được gia hạn
+            await asyncio.sleep(0.6)
+            assert await claim_batch("worker-b", 3, lease_seconds=0.3) == []
+
+            # Worker-a ngừng (chết hoặc treo): lease hết hạn và bài được nhận lại
+            renewer.cancel()
+            await asyncio.sleep(0.4)
+            assert len(await claim_batch("worker-b", 3, lease_seconds=0.3)) == 3
+        finally:
+            await dispose_async_engine()
+
+    asyncio.run(run())
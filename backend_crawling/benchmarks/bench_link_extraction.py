@@ -0,0 +1,187 @@
+"""
+Benchmark of homepage link extraction: the previous extractor (decode the
+response, build a full BeautifulSoup tree, urljoin and urlparse every link)
+against utils/links.py (lxml parser target over the raw bytes, anchors only).
+Every page is also checked for identical URL sets; any difference is printed
+and makes the run exit with status 1.
+
+Pages are saved homepages (*.html) in a directory. --save downloads the active
+websites of config/websites.json into that directory first. Without --pages,
+synthetic homepages shaped like Dan Tri, VnExpress and VietnamNet are used,
+including the awkward markup of real pages (entities, relative and
+protocol-relative links, dot segments, whitespace, scripts, comments).
+Run from backend_crawling:
+
+    python -m benchmarks.bench_link_extraction --save fixtures/homepages
+    python -m benchmarks.bench_link_extraction --pages fixtures/homepages
+    python -m benchmarks.bench_link_extraction --repeat 20
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import requests
+from bs4 import BeautifulSoup
+
+from utils.crawler import HEADERS, load_config
+from utils.links import LinkExtractor, sniff_charset
+from utils.url_rules import UrlRules, site_rules
+
+SECTIONS = ["xa-hoi", "the-gioi", "kinh-doanh", "the-thao", "giai-tri", "suc-khoe", "phap-luat", "giao-duc", "du-lich", "thoi-su"]
+WORDS = ["gia", "vang", "tăng", "mạnh", "bão", "số", "đồ", "bộ", "học", "sinh", "đội", "tuyển", "việt", "nam", "hà", "nội"]
+
+Page = Tuple[str, dict, bytes]  # (name, website entry, raw bytes)
+
+def legacy_extract_article_urls(content: bytes, base_url: str, rules: UrlRules) -> List[str]:
+    """The extractor used before utils/links.py, kept for comparison"""
+    html = content.decode(sniff_charset(content) or "utf-8", errors="replace")
+    article_urls = set()
+    soup = BeautifulSoup(html, "html.parser")
+    for link in soup.find_all("a", href=True):
+        full_url = urljoin(base_url, link["href"])
+        if urlparse(full_url).netloc != urlparse(base_url).netloc:
+            continue
+        canonical = rules.article_url(full_url)
+        if canonical:
+            article_urls.add(canonical)
+    return list(article_urls)
+
+def synthetic_href(rng: random.Random, host: str) -> str:
+    slug = "-".join(rng.choices(WORDS, k=rng.randint(4, 10)))
+    section = rng.choice(SECTIONS)
+    if "dantri" in host:
+        path = f"/{section}/{slug}-2024{rng.randint(1, 10 ** 9):010d}.htm"
+    else:
+        path = f"/{slug}-{rng.randint(4000000, 4900000)}.html"
+    kind = rng.random()
+    if kind < 0.35:
+        return path
+    if kind < 0.5:
+        return f"https://{host}{path}"
+    if kind < 0.55:
+        return f"//{host}{path}"
+    if kind < 0.6:
+        return f"{path}?utm_source=home&amp;utm_medium=box"
+    if kind < 0.65:
+        return f"{path}#box_comment"
+    if kind < 0.67:
+        return f"/{section}/../{section}/./{path.lstrip('/')}"
+    if kind < 0.69:
+        return f"  {path}\n"
+    if kind < 0.71:
+        return f"/amp{path}"
+    if kind < 0.75:
+        return f"{section}/{slug}.htm"
+    if kind < 0.82:
+        return f"/{section}/"
+    if kind < 0.86:
+        return f"/tag/{slug}.html"
+    if kind < 0.9:
+        return f"https://www.facebook.com/sharer.php?u=https://{host}{path}"
+    if kind < 0.93:
+        return "javascript:void(0)"
+    if kind < 0.95:
+        return f"mailto:toasoan@{host}"
+    return f"https://static.{host}/images/{slug}.jpg"
+
+def synthetic_homepage(rng: random.Random, base_url: str, links: int = 800) -> bytes:
+    host = urlparse(base_url).netloc
+    parts = [
+        '<!DOCTYPE html><html lang="vi"><head><meta charset="utf-8">',
+        f"<title>{host}</title>",
+        "<style>" + ".box{margin:0}" * 400 + "</style>",
+        '<script>var a = "<a href=\\"/not-a-link-4801234.html\\">"; window.dataLayer = [];</script>',
+        '</head><body><div class="container">',
+    ]
+    for i in range(links):
+        title = " ".join(rng.choices(WORDS, k=rng.randint(6, 14))).capitalize()
+        href = synthetic_href(rng, host)
+        quote = '"' if rng.random() < 0.95 else "'"
+        parts.append(
+            f'<article class="item-news"><h3 class="title-news"><a data-medium="Item-{i}" '
+            f'href={quote}{href}{quote} title="{title}">{title}</a></h3>'
+            f'<p class="description"><a href="{href}">{title} &amp; {title}</a></p>'
+            f'<div class="thumb"><img src="https://i.{host}/{i}.jpg" alt="{title}"></div></article>'
+        )
+        if i % 50 == 0:
+            parts.append(f'<!-- <a href="/commented-out-{i}-4801234.html">x</a> --><a name="anchor-{i}">x</a>')
+    parts.append("</div></body></html>")
+    return "\n".join(parts).encode("utf-8")
+
+def load_pages(args, websites: List[dict]) -> List[Page]:
+    if args.pages:
+        pages = []
+        for website in websites:
+            path = os.path.join(args.pages, _file_name(website["base_url"]))
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    pages.append((os.path.basename(path), website, f.read()))
+        return pages
+    rng = random.Random(42)
+    return [(f"synthetic {website['name']}", website, synthetic_homepage(rng, website["base_url"])) for website in websites]
+
+def save_pages(directory: str, websites: List[dict]):
+    os.makedirs(directory, exist_ok=True)
+    for website in websites:
+        response = requests.get(website["base_url"], headers=HEADERS, timeout=20)
+        response.raise_for_status()
+        path = os.path.join(directory, _file_name(website["base_url"]))
+        with open(path, "wb") as f:
+            f.write(response.content)
+        print(f"saved {website['base_url']} -> {path} ({len(response.content)} bytes)")
+
+def _file_name(base_url: str) -> str:
+    return urlparse(base_url).netloc.replace(":", "_") + ".html"
+
+def best_of(repeat: int, func, *args) -> Tuple[float, Optional[List[str]]]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", help="directory of saved homepages")
+    parser.add_argument("--save", help="download the configured homepages into this directory first")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    config = load_config()
+    websites = [website for website in config.get("websites", []) if website.get("active", True)]
+    if args.save:
+        save_pages(args.save, websites)
+        args.pages = args.pages or args.save
+    pages = load_pages(args, websites)
+    if not pages:
+        print("no pages found")
+        sys.exit(1)
+
+    mismatches = 0
+    print(f"{'page':<28}{'KiB':>8}{'legacy ms':>12}{'lxml ms':>10}{'speedup':>9}{'urls':>7}")
+    for name, website, content in pages:
+        base_url = website["base_url"]
+        rules = site_rules(website, config.get("crawler"))
+        legacy_seconds, legacy = best_of(args.repeat, legacy_extract_article_urls, content, base_url, rules)
+        fast_seconds, fast = best_of(args.repeat, LinkExtractor(base_url, rules).extract, content)
+        print(f"{name:<28}{len(content) / 1024:>8.0f}{legacy_seconds * 1000:>12.2f}{fast_seconds * 1000:>10.2f}"
+              f"{legacy_seconds / fast_seconds:>8.1f}x{len(fast):>7}")
+        only_legacy, only_fast = set(legacy) - set(fast), set(fast) - set(legacy)
+        if only_legacy or only_fast:
+            mismatches += 1
+            for url in sorted(only_legacy):
+                print(f"  only legacy: {url}")
+            for url in sorted(only_fast):
+                print(f"  only lxml:   {url}")
+    if mismatches:
+        print(f"\n{mismatches} page(s) with different URL sets")
+        sys.exit(1)
+    print("\nURL sets identical on all pages")
+
+if __name__ == "__main__":
+    main()
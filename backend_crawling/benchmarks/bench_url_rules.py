@@ -0,0 +1,136 @@
+"""
+Benchmark of homepage link classification: the previous is_article_url
+(up to 19 uncompiled re.search calls per link) against the compiled per-site
+URL rules with canonicalization (utils/url_rules.py).
+
+The corpus is one absolute URL per line, e.g. links collected from saved
+homepages, or the URLs already stored in crawled_data (--from-db). Without
+either, a synthetic corpus shaped like Dan Tri, VnExpress and VietnamNet
+homepage links is generated (articles with tracking parameters, fragments
+and AMP copies, section pages, tags, images). Run from backend_crawling:
+
+    python -m benchmarks.bench_url_rules --links 200000
+    python -m benchmarks.bench_url_rules --corpus homepage_links.txt
+"""
+import argparse
+import random
+import re
+import time
+from collections import defaultdict
+from typing import Dict, List
+from urllib.parse import urlparse
+
+from utils.crawler import load_config
+from utils.url_rules import site_rules
+
+SECTIONS = ["xa-hoi", "the-gioi", "kinh-doanh", "the-thao", "giai-tri", "suc-khoe", "phap-luat", "giao-duc", "du-lich", "thoi-su"]
+WORDS = ["gia", "vang", "tang", "manh", "bao", "so", "do", "bo", "hoc", "sinh", "doi", "tuyen", "viet", "nam", "ha", "noi"]
+TRACKING = ["utm_source=facebook&utm_medium=social", "fbclid=IwAR0abc", "zarsrc=30&gidzl=x1y2", "utm_campaign=home"]
+
+def legacy_is_article_url(url: str) -> bool:
+    """The classifier used before the URL rule engine, kept for comparison"""
+    article_patterns = [
+        r"/\d{4}/\d{2}/", r"/tin-tuc/", r"/bai-viet/", r"/suc-khoe/", r"/the-gioi/", r"/kinh-doanh/",
+        r"/giai-tri/", r"/the-thao/", r"/phap-luat/", r"/giao-duc/", r"/du-lich/"
+    ]
+    for pattern in article_patterns:
+        if re.search(pattern, url):
+            return True
+    ignore_patterns = [
+        r"/tag/", r"/tags/", r"/search/", r"/login/", r"/register/", r"/rss/", r"/feed/",
+        r"\.(jpg|jpeg|png|gif|pdf|mp3|mp4)$"
+    ]
+    for pattern in ignore_patterns:
+        if re.search(pattern, url):
+            return False
+    return True
+
+def synthetic_link(rng: random.Random, base_url: str) -> str:
+    host = base_url.rstrip("/")
+    slug = "-".join(rng.choices(WORDS, k=rng.randint(4, 10)))
+    section = rng.choice(SECTIONS)
+    kind = rng.random()
+    if kind < 0.55:
+        article_id = rng.randint(1, 3000)
+        if "dantri" in host:
+            path = f"/{section}/{slug}-2024{article_id:010d}.htm"
+        else:
+            path = f"/{slug}-{4800000 + article_id}.html"
+        variant = rng.random()
+        if variant < 0.15:
+            path += "?" + rng.choice(TRACKING)
+        elif variant < 0.25:
+            path += "#box_comment"
+        elif variant < 0.3:
+            path = "/amp" + path
+        return host + path
+    if kind < 0.75:
+        return f"{host}/{section}/"
+    if kind < 0.85:
+        return f"{host}/tag/{slug}.html"
+    if kind < 0.95:
+        return f"{host}/{section}/{slug}.jpg"
+    return f"{host}/{section}/trang-{rng.randint(2, 20)}.htm"
+
+def load_corpus(args, websites: List[dict]) -> List[str]:
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    if args.from_db:
+        from db.database import CrawledData, SessionLocal
+        db = SessionLocal()
+        try:
+            return [url for (url,) in db.query(CrawledData.url).limit(args.links)]
+        finally:
+            db.close()
+    rng = random.Random(42)
+    return [synthetic_link(rng, rng.choice(websites)["base_url"]) for _ in range(args.links)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="file with one URL per line")
+    parser.add_argument("--from-db", action="store_true", help="use the URLs stored in crawled_data")
+    parser.add_argument("--links", type=int, default=200000)
+    args = parser.parse_args()
+
+    config = load_config()
+    websites = [website for website in config.get("websites", []) if website.get("active", True)]
+    corpus = load_corpus(args, websites)
+    rules_by_host = {urlparse(website["base_url"]).netloc: site_rules(website, config.get("crawler")) for website in websites}
+    default_rules = site_rules(None, config.get("crawler"))
+    # Group by host as the crawler does: one rule set per homepage
+    by_host: Dict[str, List[str]] = defaultdict(list)
+    for url in corpus:
+        by_host[urlparse(url).netloc].append(url)
+
+    start = time.perf_counter()
+    legacy = {url for url in corpus if legacy_is_article_url(url)}
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for host, urls in by_host.items():
+        rules = rules_by_host.get(host, default_rules)
+        for url in urls:
+            rules.is_article(url)
+    classify_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    accepted = set()
+    for host, urls in by_host.items():
+        rules = rules_by_host.get(host, default_rules)
+        for url in urls:
+            canonical = rules.article_url(url)
+            if canonical:
+                accepted.add(canonical)
+    engine_seconds = time.perf_counter() - start
+
+    count = len(corpus)
+    print(f"{'classifier':<28}{'us/link':>10}{'accepted':>12}")
+    print(f"{'legacy is_article_url':<28}{legacy_seconds / count * 1e6:>10.2f}{len(legacy):>12}")
+    print(f"{'url rules (classify only)':<28}{classify_seconds / count * 1e6:>10.2f}{'':>12}")
+    print(f"{'url rules + canonicalize':<28}{engine_seconds / count * 1e6:>10.2f}{len(accepted):>12}")
+    print(f"\n{count} links, {len(set(corpus))} distinct strings; "
+          f"{len(legacy)} rows before vs {len(accepted)} rows after canonicalization")
+
+if __name__ == "__main__":
+    main()
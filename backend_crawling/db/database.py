@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean
+from sqlalchemy import create_engine, Column, Integer, String, Date, DateTime, Boolean
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -26,6 +26,22 @@ class CrawledData(Base):
     analyzed_at = Column(DateTime, nullable=True)
     analyze_success = Column(Boolean, default=None)  # None=not analyzed, True=success, False=failure
 
+# Running totals per UTC day, updated when URLs are ingested and articles analyzed
+class StatusCounter(Base):
+    __tablename__ = "status_counters"
+
+    day = Column(Date, primary_key=True)
+    crawled = Column(Integer, nullable=False, default=0)
+    analyzed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+
+# One-time data migrations that have been applied, so they run once per database rather than per start
+class AppliedMigration(Base):
+    __tablename__ = "applied_migrations"
+
+    name = Column(String, primary_key=True)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
 # Create tables
 def init_db():
     Base.metadata.create_all(bind=engine)
\ No newline at end of file
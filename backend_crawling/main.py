@@ -4,12 +4,14 @@ import time
 from datetime import datetime, timezone
 from fastapi import FastAPI, Depends
 from sqlalchemy.orm import Session
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from db.database import init_db, SessionLocal
-from routers import crawler
-from utils.crawler import load_config, crawl_website
-from db.database import CrawledData
+from routers import crawler, metrics
+from utils.crawler import Crawler, load_config
+from utils.ingest import ingest_websites
+from utils.metrics import JOB_SECONDS
+from utils.status import ensure_status
 
 # Set up logging
 logging.basicConfig(
@@ -23,6 +25,7 @@ app = FastAPI(title="Newspaper URL Crawler")
 
 # Include routers
 app.include_router(crawler.router, prefix="/api", tags=["crawler"])
+app.include_router(metrics.router, tags=["metrics"])
 
 # Database dependency
 def get_db():
@@ -33,7 +36,7 @@ def get_db():
         db.close()
 
 # Scheduled task to crawl websites
-def scheduled_crawling():
+async def scheduled_crawling(crawler: Crawler):
     """
     Function to crawl websites on a schedule.
     Creates a new database session for each scheduled run.
@@ -43,32 +46,9 @@ def scheduled_crawling():
     try:
         config = load_config()
         
-        for website in config["websites"]:
-            if website.get("active", True):
-                base_url = website["base_url"]
-                logger.info(f"Scheduled crawl for {website['name']} ({base_url})")
-                
-                article_urls = crawl_website(base_url)
-                
-                saved_count = 0
-                for url in article_urls:
-                    # Check if URL already exists in the database
-                    existing = db.query(CrawledData).filter(CrawledData.url == url).first()
-                    if not existing:
-                        # Create new entry
-                        new_entry = CrawledData(
-                            url=url,
-                            crawled_at=datetime.now(timezone.utc),
-                            is_analyzed=False
-                        )
-                        db.add(new_entry)
-                        saved_count += 1
-                
-                # Commit after each website to avoid losing all data if one fails
-                db.commit()
-                logger.info(f"Saved {saved_count} new articles from {website['name']}")
-                
-        logger.info(f"Completed scheduled crawling at {datetime.now(timezone.utc)}")
+        with JOB_SECONDS.labels("scheduled_crawl").time():
+            saved_counts = await ingest_websites(db, config, crawler)
+        logger.info(f"Completed scheduled crawling at {datetime.now(timezone.utc)}, new articles: {saved_counts}")
     except Exception as e:
         logger.error(f"Error during scheduled crawling: {e}")
         db.rollback()
@@ -85,19 +65,35 @@ async def startup_event():
     # Create database tables if they don't exist
     init_db()
     logger.info("Database tables created")
+    db = SessionLocal()
+    try:
+        ensure_status(db)
+    finally:
+        db.close()
     
-    # Set up scheduler
     config = load_config()
+    # One client for the life of the app, so every crawl reuses its connections
+    crawler = Crawler(config.get("crawler", {}))
+    app.state.crawler = crawler
+
+    # Set up scheduler on the server's event loop, where the shared client lives
     crawl_interval = config.get("crawl_interval_minutes", 30)
     
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(scheduled_crawling, 'interval', minutes=crawl_interval)
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(scheduled_crawling, 'interval', minutes=crawl_interval, args=[crawler])
     scheduler.start()
+    app.state.scheduler = scheduler
     logger.info(f"Scheduler started with interval of {crawl_interval} minutes")
     
     # Run initial crawl
     logger.info("Starting initial crawl...")
-    scheduled_crawling()
+    await scheduled_crawling(crawler)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the scheduler and close the shared HTTP client"""
+    app.state.scheduler.shutdown(wait=False)
+    await app.state.crawler.aclose()
 
 @app.get("/")
 async def root():
@@ -1,10 +1,13 @@
 import logging
-from fastapi import APIRouter, Depends, BackgroundTasks
-from sqlalchemy.orm import Session
-from datetime import datetime, timezone
+import threading
+import time
+from fastapi import APIRouter, BackgroundTasks, Request
 
-from db.database import SessionLocal, CrawledData
-from utils.crawler import load_config, crawl_website
+from db.database import SessionLocal
+from utils.crawler import Crawler, load_config
+from utils.ingest import ingest_websites
+from utils.metrics import JOB_SECONDS
+from utils.status import read_status
 
 router = APIRouter()
 
@@ -15,6 +18,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger("crawler_router")
 
+# Health checks and dashboards poll the status often, so it is kept for a few seconds
+STATUS_TTL_SECONDS = 5
+
+_status_cache = None
+_status_lock = threading.Lock()
+
 def get_db():
     db = SessionLocal()
     try:
@@ -23,65 +32,53 @@ def get_db():
         db.close()
 
 @router.post("/crawl")
-async def start_crawling(background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def start_crawling(background_tasks: BackgroundTasks, request: Request):
     """
     Start the crawling process in the background.
     Returns immediately while crawling runs in the background.
     """
-    background_tasks.add_task(crawl_all_websites, db)
+    background_tasks.add_task(crawl_all_websites, request.app.state.crawler)
     return {"detail": "Crawling started in the background"}
 
 @router.get("/status")
-async def get_status(db: Session = Depends(get_db)):
+def get_status():
     """
-    Get the current status of crawled articles
+    Get the current status of crawled and analyzed articles.
+    Served from the per-day counters maintained at ingest and analysis time
+    and cached in process for STATUS_TTL_SECONDS.
     """
-    total_count = db.query(CrawledData).count()
-    today_count = db.query(CrawledData).filter(
-        CrawledData.crawled_at >= datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    ).count()
-    
-    return {
-        "total_articles_crawled": total_count,
-        "articles_crawled_today": today_count,
-        "last_check": datetime.now(timezone.utc)
-    }
+    global _status_cache
+    now = time.monotonic()
+    with _status_lock:
+        if _status_cache and _status_cache[0] > now:
+            return _status_cache[1]
+    db = SessionLocal()
+    try:
+        status = read_status(db)
+    finally:
+        db.close()
+    with _status_lock:
+        _status_cache = (now + STATUS_TTL_SECONDS, status)
+    return status
 
-def crawl_all_websites(db: Session):
+async def crawl_all_websites(crawler: Crawler):
     """
     Crawl all websites in the config file and store the URLs in the database.
+    Uses its own session, since the request's session is closed once the response is sent.
+    Returns the number of new articles saved per website.
     """
+    db = SessionLocal()
     try:
         config = load_config()
         
-        for website in config["websites"]:
-            if website.get("active", True):
-                base_url = website["base_url"]
-                logger.info(f"Starting crawl for {website['name']} ({base_url})")
-                
-                article_urls = crawl_website(base_url)
-                
-                saved_count = 0
-                for url in article_urls:
-                    # Check if URL already exists in the database
-                    existing = db.query(CrawledData).filter(CrawledData.url == url).first()
-                    if not existing:
-                        # Create new entry
-                        new_entry = CrawledData(
-                            url=url,
-                            crawled_at=datetime.now(timezone.utc),
-                            is_analyzed=False
-                        )
-                        db.add(new_entry)
-                        saved_count += 1
-                
-                # Commit after each website to avoid losing all data if one fails
-                db.commit()
-                logger.info(f"Saved {saved_count} new articles from {website['name']}")
-                
-        logger.info("Completed crawling all websites")
+        with JOB_SECONDS.labels("manual_crawl").time():
+            saved_counts = await ingest_websites(db, config, crawler)
+        logger.info(f"Completed crawling all websites, new articles: {saved_counts}")
+        return saved_counts
     except Exception as e:
         logger.error(f"Error during crawling: {e}")
         # Make sure to roll back on error
         db.rollback()
-        raise
\ No newline at end of file
+        raise
+    finally:
+        db.close()
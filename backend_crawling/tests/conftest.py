@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# db/ creates its engine from DATABASE_URL on import; tests use a temporary SQLite file
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+# Modules import db/, utils/ and benchmarks/ relative to backend_crawling, as when the service runs
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
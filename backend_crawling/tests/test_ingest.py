@@ -0,0 +1,44 @@
+import asyncio
+
+from db.database import CrawledData, SessionLocal, init_db
+from utils.content import PAGE_PREFIX
+from utils.ingest import store_website_urls
+
+WEBSITE = {"name": "VnExpress", "base_url": "https://vnexpress.net"}
+URLS = [f"https://vnexpress.net/bai-viet-{i}.html" for i in range(5)]
+
+
+class FakeCrawler:
+    """Checks at every capture that the analysis service could not see the article yet"""
+
+    def __init__(self, db):
+        self.db = db
+        self.fetched = []
+
+    async def fetch(self, url, timeout=None, retries=None):
+        assert self.db.query(CrawledData).filter(CrawledData.url == url).count() == 0
+        self.fetched.append(url)
+        if url.endswith("-4.html"):
+            raise RuntimeError("timeout")
+        return f"<html><body><p>{url}</p></body></html>".encode(), "utf-8"
+
+
+def test_rows_are_inserted_with_their_contents():
+    init_db()
+    db = SessionLocal()
+    db.add(CrawledData(url=URLS[0], is_analyzed=True))
+    db.commit()
+    crawler = FakeCrawler(db)
+    config = {"capture_content": {"enabled": True, "concurrency": 2}}
+
+    inserted = asyncio.run(store_website_urls(db, asyncio.Lock(), crawler, WEBSITE, URLS, config))
+
+    assert inserted == 4
+    # Already stored URLs are not downloaded again
+    assert sorted(crawler.fetched) == URLS[1:]
+    contents = dict(db.query(CrawledData.url, CrawledData.contents))
+    assert contents[URLS[0]] is None
+    assert all(contents[url].startswith(PAGE_PREFIX) for url in URLS[1:4])
+    # A failed capture still stores the URL, analysis downloads it itself
+    assert contents[URLS[4]] is None
+    db.close()
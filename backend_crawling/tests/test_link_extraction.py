@@ -0,0 +1,28 @@
+import os
+from urllib.parse import urlsplit
+
+import pytest
+
+from benchmarks.bench_link_extraction import _file_name, legacy_extract_article_urls
+from utils.crawler import extract_article_urls, load_config
+from utils.url_rules import site_rules
+
+HOMEPAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "homepages")
+
+CONFIG = load_config()
+WEBSITES = [website for website in CONFIG.get("websites", []) if website.get("active", True)]
+
+
+@pytest.mark.parametrize("website", WEBSITES, ids=lambda website: website["name"])
+def test_same_urls_as_beautifulsoup_extractor(website):
+    base_url = website["base_url"]
+    with open(os.path.join(HOMEPAGES, _file_name(base_url)), "rb") as f:
+        content = f.read()
+    rules = site_rules(website, CONFIG.get("crawler"))
+
+    urls = extract_article_urls(content, base_url, rules)
+
+    assert urls
+    assert len(urls) == len(set(urls))
+    assert all(urlsplit(url).netloc == urlsplit(base_url).netloc for url in urls)
+    assert set(urls) == set(legacy_extract_article_urls(content, base_url, rules))
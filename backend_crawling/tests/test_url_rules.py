@@ -0,0 +1,30 @@
+import pytest
+
+from utils.url_rules import site_rules
+
+
+@pytest.mark.parametrize("url", [
+    "https://vnexpress.net/feedback-cua-doc-gia-ve-lan-xe-buyt-4801234.html",
+    "https://vnexpress.net/rss-reader-tro-lai-tren-dien-thoai-4801235.html",
+    "https://vnexpress.net/login-bang-van-tay-co-an-toan-4801236.html",
+    "https://dantri.com.vn/kinh-doanh/search-engine-viet-gianh-thi-phan-20261018093512345.htm",
+])
+def test_article_slug_starting_with_denied_word(url):
+    rules = site_rules()
+
+    assert rules.is_article(rules.canonicalize(url))
+
+
+@pytest.mark.parametrize("url", [
+    "https://vnexpress.net/search?q=xe-buyt",
+    "https://vnexpress.net/rss/",
+    "https://vnexpress.net/rss/thoi-su.rss",
+    "https://vietnamnet.vn/feed",
+    "https://dantri.com.vn/tim-kiem/xe-buyt-123456.htm",
+    "https://vnexpress.net/login/",
+    "https://vnexpress.net/search/tin-tuc/xe-buyt-4801234.html",
+])
+def test_search_login_and_feed_pages_are_denied(url):
+    rules = site_rules()
+
+    assert not rules.is_article(rules.canonicalize(url))
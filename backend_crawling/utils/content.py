@@ -0,0 +1,67 @@
+import asyncio
+import base64
+import logging
+import zlib
+from typing import Dict, Any, List, Optional
+
+from utils.crawler import Crawler
+from utils.links import sniff_charset
+from utils.metrics import CONTENTS_CAPTURED
+
+logger = logging.getLogger("content")
+
+# Prefix marking a compressed article page in the `contents` column. The analysis service
+# extracts the text with the selectors of config/websites.json (backend_analysis/services/extractors.py),
+# so captured and downloaded articles go through the same extractor.
+PAGE_PREFIX = "zhtml:"
+
+def compress_page(html: str) -> str:
+    """Compress an article page (stored as UTF-8) so it fits in the String `contents` column"""
+    packed = base64.b64encode(zlib.compress(html.encode("utf-8"), 9)).decode("ascii")
+    return PAGE_PREFIX + packed
+
+def decode_page(content: bytes, encoding: Optional[str] = None) -> str:
+    """Decode a page with the Content-Type charset, else its <meta> charset, else UTF-8"""
+    try:
+        return content.decode(encoding or sniff_charset(content) or "utf-8", errors="replace")
+    except LookupError:
+        return content.decode("utf-8", errors="replace")
+
+async def fetch_article_page(crawler: Crawler, url: str, timeout: float = 10) -> str:
+    """Download an article page through the shared crawler. Returns "" on failure"""
+    try:
+        content, encoding = await crawler.fetch(url, timeout)
+        return decode_page(content, encoding)
+    except Exception as e:
+        logger.error(f"[Content] Error fetching {url}: {e}")
+        return ""
+
+async def fetch_contents(crawler: Crawler, urls: List[str], config: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Download the pages of newly discovered articles, `concurrency` at a time.
+    The crawler's HostLimiter also applies, so captures respect per_host_concurrency
+    and per_host_delay_seconds like homepage fetches.
+    Returns the compressed page of each URL that could be fetched, ready for the
+    `contents` column; the others are left out so the analysis service downloads them itself.
+    """
+    if not urls or not config.get("enabled", False):
+        return {}
+    semaphore = asyncio.Semaphore(config.get("concurrency", 8))
+    timeout = config.get("timeout", 10)
+
+    async def fetch(url: str) -> str:
+        async with semaphore:
+            page = await fetch_article_page(crawler, url, timeout)
+        # zlib releases the GIL, so compression runs alongside the other downloads
+        return await asyncio.to_thread(compress_page, page) if page else ""
+
+    pages = await asyncio.gather(*(fetch(url) for url in urls))
+    contents = {}
+    for url, page in zip(urls, pages):
+        if not page:
+            CONTENTS_CAPTURED.labels("empty").inc()
+            continue
+        CONTENTS_CAPTURED.labels("ok").inc()
+        contents[url] = page
+    logger.info(f"Captured contents for {len(contents)}/{len(urls)} articles")
+    return contents
@@ -1,14 +1,16 @@
+import asyncio
 import json
 import logging
 import os
-import re
-from datetime import datetime, timezone
-from typing import List, Dict, Any
-from ..db.database import SessionLocal  # Adjusted import path to match relative structure
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Tuple, Union
 
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+import httpx
+from urllib.parse import urlparse
+
+from utils.links import LinkExtractor
+from utils.metrics import FETCH_ERRORS, STAGE_SECONDS, URLS_DISCOVERED
+from utils.url_rules import UrlRules, site_rules
 
 # Set up logging
 logging.basicConfig(
@@ -29,85 +31,152 @@ def load_config() -> Dict[str, Any]:
         return {"websites": [], "crawl_interval_minutes": 30}
 
 def is_article_url(url: str) -> bool:
-    """Check if the URL is likely an article URL based on patterns"""
-    # Common article URL patterns in Vietnamese news sites
-    article_patterns = [
-        r"/\d{4}/\d{2}/",  # Date patterns like /2023/04/
-        r"/tin-tuc/",
-        r"/bai-viet/",
-        r"/suc-khoe/",
-        r"/the-gioi/",
-        r"/kinh-doanh/",
-        r"/giai-tri/",
-        r"/the-thao/",
-        r"/phap-luat/",
-        r"/giao-duc/",
-        r"/du-lich/"
-    ]
-    
-    for pattern in article_patterns:
-        if re.search(pattern, url):
-            return True
-    
-    # Ignore common non-article URLs
-    ignore_patterns = [
-        r"/tag/",
-        r"/tags/",
-        r"/search/",
-        r"/login/",
-        r"/register/",
-        r"/rss/",
-        r"/feed/",
-        r"\.(jpg|jpeg|png|gif|pdf|mp3|mp4)$"
-    ]
-    
-    for pattern in ignore_patterns:
-        if re.search(pattern, url):
-            return False
-    
-    return True  # Default to True for URLs that don't match any pattern
-
-def crawl_website(base_url: str) -> List[str]:
-    """Crawl a website for article URLs"""
-    article_urls = set()
-    
+    """Check if the URL is likely an article URL using the default URL rules"""
+    return site_rules().article_url(url) is not None
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# Defaults for the "crawler" section of config/websites.json
+DEFAULT_CRAWLER_CONFIG = {
+    "per_host_concurrency": 2,
+    "per_host_delay_seconds": 0.5,
+    "timeout": 10,
+    "retries": 2,
+    "retry_backoff_seconds": 1.0,
+    "max_connections": 20,
+    "http2": True,
+}
+
+def extract_article_urls(html: Union[str, bytes], base_url: str, rules: Optional[UrlRules] = None, encoding: Optional[str] = None) -> List[str]:
+    """Extract canonical same-domain article URLs from a homepage (raw bytes or decoded text)"""
+    if isinstance(html, str):
+        html, encoding = html.encode("utf-8"), "utf-8"
+    return LinkExtractor(base_url, rules).extract(html, encoding)
+
+class HostLimiter:
+    """Per-host politeness: bounded concurrency and a minimum delay between requests"""
+
+    def __init__(self, concurrency: int, delay: float):
+        self.concurrency = max(1, concurrency)
+        self.delay = delay
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._last_request: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def slot(self, host: str):
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.concurrency))
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with semaphore:
+            async with lock:
+                loop = asyncio.get_running_loop()
+                wait = self._last_request.get(host, 0.0) + self.delay - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._last_request[host] = loop.time()
+            yield
+
+def _http2_available() -> bool:
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(base_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # Find all links in the page
-        for link in soup.find_all("a", href=True):
-            href = link["href"]
-            full_url = urljoin(base_url, href)
-            
-            # Skip URLs from other domains
-            if urlparse(full_url).netloc != urlparse(base_url).netloc:
-                continue
-                
-            # Check if it's an article URL
-            if is_article_url(full_url):
-                article_urls.add(full_url)
-        
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def create_client(crawler_config: Dict[str, Any]) -> httpx.AsyncClient:
+    """Create the keep-alive client shared by all crawl cycles"""
+    max_connections = crawler_config["max_connections"]
+    return httpx.AsyncClient(
+        headers=HEADERS,
+        http2=crawler_config["http2"] and _http2_available(),
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+    )
+
+async def fetch_page(client: httpx.AsyncClient, limiter: HostLimiter, url: str, timeout: float, retries: int, backoff: float) -> Tuple[bytes, Optional[str]]:
+    """
+    GET a page with per-host politeness, retrying transient failures.
+    Returns the raw body and the charset from the Content-Type header, if any,
+    so the parser decodes the page once instead of httpx decoding it first.
+    """
+    host = urlparse(url).netloc
+    for attempt in range(retries + 1):
+        try:
+            async with limiter.slot(host):
+                response = await client.get(url, timeout=timeout)
+            response.raise_for_status()
+            return response.content, response.charset_encoding
+        except httpx.HTTPStatusError as e:
+            # Client errors other than rate limiting will not go away on retry
+            if e.response.status_code < 500 and e.response.status_code != 429:
+                raise
+            if attempt == retries:
+                raise
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+        await asyncio.sleep(backoff * (2 ** attempt))
+    return b"", None
+
+class Crawler:
+    """
+    Long-lived HTTP client and per-host limiter shared by every crawl cycle and content capture,
+    so connections are reused across cycles and politeness holds across concurrent crawls.
+    Created at app startup and closed at shutdown; it must be used on the event loop that created it.
+    """
+
+    def __init__(self, crawler_config: Optional[Dict[str, Any]] = None):
+        self.config = {**DEFAULT_CRAWLER_CONFIG, **(crawler_config or {})}
+        self.client = create_client(self.config)
+        self.limiter = HostLimiter(self.config["per_host_concurrency"], self.config["per_host_delay_seconds"])
+
+    async def fetch(self, url: str, timeout: Optional[float] = None, retries: Optional[int] = None) -> Tuple[bytes, Optional[str]]:
+        """GET a page through the shared client and limiter (see fetch_page)"""
+        return await fetch_page(
+            self.client, self.limiter, url,
+            self.config["timeout"] if timeout is None else timeout,
+            self.config["retries"] if retries is None else retries,
+            self.config["retry_backoff_seconds"]
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "Crawler":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+async def crawl_website_async(crawler: Crawler, website: Dict[str, Any]) -> List[str]:
+    """Crawl one website for article URLs using the shared client"""
+    base_url = website["base_url"]
+    site = urlparse(base_url).netloc
+    try:
+        with STAGE_SECONDS.labels("fetch").time():
+            content, encoding = await crawler.fetch(base_url, website.get("timeout"), website.get("retries"))
+        # Parsing is CPU-bound, keep it off the event loop so other sites keep downloading
+        loop = asyncio.get_running_loop()
+        with STAGE_SECONDS.labels("parse").time():
+            article_urls = await loop.run_in_executor(None, extract_article_urls, content, base_url, site_rules(website, crawler.config), encoding)
         logger.info(f"Found {len(article_urls)} article URLs from {base_url}")
-        return list(article_urls)
-        
+        URLS_DISCOVERED.labels(site).inc(len(article_urls))
+        return article_urls
     except Exception as e:
         logger.error(f"Error crawling {base_url}: {e}")
+        FETCH_ERRORS.labels(site).inc()
         return []
 
-def scheduled_crawling():
-    logger.info(f"Starting scheduled crawling at {datetime.now(timezone.utc)}")
-    db = SessionLocal()
-    try:
-        config = load_config()
-        # ...existing code...
-    except Exception as e:
-        logger.error(f"Error during scheduled crawling: {e}")
-        db.rollback()
-    finally:
-        db.close()
\ No newline at end of file
+async def crawl_websites_async(crawler: Crawler, websites: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Crawl all given websites concurrently over the crawler's connection pool.
+    Returns article URLs keyed by each website's base_url.
+    """
+    results = await asyncio.gather(*(crawl_website_async(crawler, website) for website in websites))
+    return {website["base_url"]: urls for website, urls in zip(websites, results)}
+
+async def crawl_website(crawler: Crawler, base_url: str) -> List[str]:
+    """Crawl a website for article URLs"""
+    return await crawl_website_async(crawler, {"base_url": base_url})
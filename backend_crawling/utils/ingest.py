@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from db.database import CrawledData
+from utils.crawler import Crawler, crawl_websites_async
+from utils.content import fetch_contents
+from utils.metrics import STAGE_SECONDS, URLS_INSERTED
+from utils.status import increment_status, utc_day
+from utils.url_rules import site_rules
+
+logger = logging.getLogger("ingest")
+
+# Maximum number of URLs written by a single INSERT statement
+BATCH_SIZE = 500
+
+# Channel the analysis worker LISTENs on to start analyzing new articles right away
+NOTIFY_CHANNEL = "crawled_data_new"
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL (see UrlRules.canonicalize) used as the unique key"""
+    return site_rules().canonicalize(url)
+
+def dedupe_urls(urls: Iterable[str]) -> List[str]:
+    """Normalize URLs and drop duplicates, keeping the first-seen order"""
+    seen = set()
+    unique = []
+    for url in urls:
+        if not url:
+            continue
+        normalized = normalize_url(url)
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            unique.append(normalized)
+    return unique
+
+def _insert(db: Session):
+    """Pick the INSERT construct supporting ON CONFLICT for the bound database"""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(CrawledData)
+    return postgresql.insert(CrawledData)
+
+def unknown_urls(db: Session, urls: Iterable[str]) -> List[str]:
+    """Normalized URLs that are not in the database yet, in first-seen order"""
+    unique = dedupe_urls(urls)
+    known = set()
+    for start in range(0, len(unique), BATCH_SIZE):
+        batch = unique[start:start + BATCH_SIZE]
+        known.update(db.scalars(select(CrawledData.url).where(CrawledData.url.in_(batch))))
+    # End the read transaction: the session stays idle while the pages are captured
+    db.commit()
+    return [url for url in unique if url not in known]
+
+def ingest_urls(db: Session, urls: Iterable[str], contents: Optional[Dict[str, str]] = None) -> List[Tuple[int, str]]:
+    """
+    Store discovered URLs, skipping the ones already in the database.
+    Each batch is written with a single INSERT ... ON CONFLICT (url) DO NOTHING
+    RETURNING id, so concurrent crawls never fail on the unique index.
+    `contents` maps a normalized URL to its captured page, written in the same row,
+    so the analysis service never sees the article before its contents.
+    Returns (id, url) of the rows that were actually inserted.
+    """
+    unique = dedupe_urls(urls)
+    contents = contents or {}
+    inserted: List[Tuple[int, str]] = []
+    now = datetime.now(timezone.utc)
+    for start in range(0, len(unique), BATCH_SIZE):
+        batch = unique[start:start + BATCH_SIZE]
+        stmt = (
+            _insert(db)
+            .values([{"url": url, "contents": contents.get(url), "crawled_at": now, "is_analyzed": False} for url in batch])
+            .on_conflict_do_nothing(index_elements=["url"])
+            .returning(CrawledData.id, CrawledData.url)
+        )
+        rows = [(row.id, row.url) for row in db.execute(stmt)]
+        if rows:
+            increment_status(db, utc_day(now), crawled=len(rows))
+        inserted.extend(rows)
+        # Commit after each batch to avoid losing all data if one fails
+        db.commit()
+    return inserted
+
+def notify_new_articles(db: Session, count: int):
+    """Wake the analysis workers (PostgreSQL only; they fall back to polling elsewhere)"""
+    if count <= 0 or db.get_bind().dialect.name != "postgresql":
+        return
+    try:
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": NOTIFY_CHANNEL, "payload": str(count)})
+        db.commit()
+    except Exception as e:
+        logger.error(f"Error notifying analysis workers: {e}")
+        db.rollback()
+
+def insert_website_urls(db: Session, website: Dict[str, Any], article_urls: List[str], contents: Dict[str, str]) -> List[Tuple[int, str]]:
+    """Store the article URLs found on one website with their captured pages; returns (id, url) of the new ones"""
+    with STAGE_SECONDS.labels("db_insert").time():
+        new_articles = ingest_urls(db, article_urls, contents)
+    logger.info(f"Saved {len(new_articles)} new articles from {website['name']} ({len(article_urls)} URLs found)")
+    URLS_INSERTED.labels(urlsplit(website["base_url"]).netloc).inc(len(new_articles))
+    notify_new_articles(db, len(new_articles))
+    return new_articles
+
+async def store_website_urls(db: Session, db_lock: asyncio.Lock, crawler: Crawler, website: Dict[str, Any],
+                             article_urls: List[str], config: Dict[str, Any]) -> int:
+    """
+    Store the article URLs found on one website, optionally with their pages.
+    Pages of the URLs not in the database yet are captured first and inserted in the
+    same rows, so the analysis service (woken by the NOTIFY of another website, or polling)
+    can never claim an article whose contents are still being downloaded.
+    The session is shared by all websites, so database work holds db_lock and runs in a
+    worker thread; downloads run on the event loop concurrently with the other websites.
+    Returns the exact number of new URLs inserted.
+    """
+    capture = config.get("capture_content", {})
+    contents: Dict[str, str] = {}
+    if capture.get("enabled", False):
+        async with db_lock:
+            new_urls = await asyncio.to_thread(unknown_urls, db, article_urls)
+        with STAGE_SECONDS.labels("capture_content").time():
+            contents = await fetch_contents(crawler, new_urls, capture)
+    async with db_lock:
+        new_articles = await asyncio.to_thread(insert_website_urls, db, website, article_urls, contents)
+    return len(new_articles)
+
+async def ingest_websites(db: Session, config: Dict[str, Any], crawler: Crawler) -> Dict[str, int]:
+    """
+    Crawl all active websites concurrently with the shared crawler, then store their new
+    article URLs and capture their contents, all websites at once.
+    Returns the number of new URLs inserted per website name.
+    """
+    websites = [website for website in config.get("websites", []) if website.get("active", True)]
+    logger.info(f"Starting crawl for {len(websites)} websites: {[website['name'] for website in websites]}")
+    found = await crawl_websites_async(crawler, websites)
+
+    db_lock = asyncio.Lock()
+    # Let every website finish with the session before an error reaches the caller, which rolls it back
+    counts = await asyncio.gather(*(
+        store_website_urls(db, db_lock, crawler, website, found[website["base_url"]], config) for website in websites
+    ), return_exceptions=True)
+    for count in counts:
+        if isinstance(count, BaseException):
+            raise count
+    return {website["name"]: count for website, count in zip(websites, counts)}
@@ -0,0 +1,81 @@
+import re
+from typing import List, Optional
+from urllib.parse import urljoin, urlsplit
+
+from lxml import etree
+
+from utils.url_rules import UrlRules, site_rules
+
+# Pages without a charset in the Content-Type header usually declare it in a <meta> tag near the top
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+_SNIFF_BYTES = 4096
+
+# Characters that urljoin would clean up or resolve; hrefs containing them take the slow path
+_NEEDS_JOIN = re.compile(r"[\s\\]|/\.|//")
+
+class _HrefCollector:
+    """lxml parser target that keeps the href of every anchor and builds no tree"""
+
+    def __init__(self):
+        self.hrefs: List[str] = []
+
+    def start(self, tag, attrib):
+        if tag == "a":
+            href = attrib.get("href")
+            if href is not None:
+                self.hrefs.append(href)
+
+    def close(self) -> List[str]:
+        return self.hrefs
+
+def sniff_charset(content: bytes) -> Optional[str]:
+    match = _META_CHARSET.search(content, 0, _SNIFF_BYTES)
+    return match.group(1).decode("ascii") if match else None
+
+def anchor_hrefs(content: bytes, encoding: Optional[str] = None) -> List[str]:
+    """href values of all <a> tags, parsed straight from the raw response bytes"""
+    if not content.strip():
+        return []
+    encoding = encoding or sniff_charset(content) or "utf-8"
+    try:
+        parser = etree.HTMLParser(target=_HrefCollector(), encoding=encoding)
+    except LookupError:
+        parser = etree.HTMLParser(target=_HrefCollector(), encoding="utf-8")
+    return etree.fromstring(content, parser) or []
+
+class LinkExtractor:
+    """
+    Same-host article links of one homepage. Everything that depends only on the
+    base URL is computed once, so the per-link work is a string check for the
+    common root-relative hrefs, with urljoin only for the rest.
+    """
+
+    def __init__(self, base_url: str, rules: Optional[UrlRules] = None):
+        self.base_url = base_url
+        self.rules = rules or site_rules()
+        base = urlsplit(base_url)
+        self.netloc = base.netloc
+        self.origin = f"{base.scheme}://{base.netloc}"
+
+    def absolute(self, href: str) -> Optional[str]:
+        """Absolute URL of an href if it points to the base host, otherwise None"""
+        if href[:1] == "/" and href[1:2] != "/":
+            path = href.split("?", 1)[0].split("#", 1)[0]
+            if not _NEEDS_JOIN.search(path):
+                return self.origin + href
+        full_url = urljoin(self.base_url, href)
+        return full_url if urlsplit(full_url).netloc == self.netloc else None
+
+    def extract(self, content: bytes, encoding: Optional[str] = None) -> List[str]:
+        article_urls = set()
+        absolute = self.absolute
+        article_url = self.rules.article_url
+        for href in anchor_hrefs(content, encoding):
+            full_url = absolute(href)
+            if full_url is None:
+                continue
+            # Collapse tracking, fragment and AMP variants before classifying
+            canonical = article_url(full_url)
+            if canonical:
+                article_urls.add(canonical)
+        return list(article_urls)
@@ -0,0 +1,42 @@
+"""
+Prometheus metrics for the crawler, exposed on GET /metrics.
+Metric objects are module-level so the hot path only pays for a label
+lookup and an atomic add.
+"""
+from prometheus_client import Counter, Histogram
+
+# Request and parse times are mostly in the 10 ms - 10 s range
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "crawler_stage_seconds",
+    "Time spent in each crawl stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+URLS_DISCOVERED = Counter(
+    "crawler_urls_discovered_total",
+    "Article URLs found on website homepages",
+    ["site"],
+)
+URLS_INSERTED = Counter(
+    "crawler_urls_inserted_total",
+    "New article URLs stored in the database",
+    ["site"],
+)
+FETCH_ERRORS = Counter(
+    "crawler_fetch_errors_total",
+    "Homepage fetches that failed after all retries",
+    ["site"],
+)
+CONTENTS_CAPTURED = Counter(
+    "crawler_contents_captured_total",
+    "Article pages downloaded at crawl time, by result",
+    ["result"],
+)
+JOB_SECONDS = Histogram(
+    "crawler_job_seconds",
+    "Duration of scheduled and manually triggered jobs",
+    ["job"],
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
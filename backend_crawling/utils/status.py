@@ -0,0 +1,147 @@
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Dict
+
+from sqlalchemy import case, func, literal, select, text, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from db.database import AppliedMigration, CrawledData, StatusCounter
+
+logger = logging.getLogger("status")
+
+def utc_day(moment: datetime) -> date:
+    """UTC calendar day of a timestamp; naive timestamps are already UTC"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.date()
+
+def _insert(db: Session):
+    """Pick the INSERT construct supporting ON CONFLICT for the bound database"""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(StatusCounter)
+    return postgresql.insert(StatusCounter)
+
+def increment_status(db: Session, day: date, crawled: int = 0, analyzed: int = 0, failed: int = 0):
+    """Add to the counters of one day (not committed, so it shares the caller's transaction)"""
+    stmt = _insert(db).values(day=day, crawled=crawled, analyzed=analyzed, failed=failed)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["day"],
+        set_={
+            "crawled": StatusCounter.crawled + stmt.excluded.crawled,
+            "analyzed": StatusCounter.analyzed + stmt.excluded.analyzed,
+            "failed": StatusCounter.failed + stmt.excluded.failed,
+        }
+    )
+    db.execute(stmt)
+
+# Name of the one-time backfill in applied_migrations
+STATUS_BACKFILL = "status_counters_backfill"
+
+def _recount():
+    """Per-day crawled / analyzed / failed counts computed from crawled_data"""
+    crawled_day = func.date(CrawledData.crawled_at)
+    crawled = select(
+        crawled_day.label("day"),
+        func.count().label("crawled"),
+        literal(0).label("analyzed"),
+        literal(0).label("failed")
+    ).where(CrawledData.crawled_at.isnot(None)).group_by(crawled_day)
+    analyzed_day = func.date(CrawledData.analyzed_at)
+    success = case((CrawledData.analyze_success == True, 1), else_=0)
+    analyzed = select(
+        analyzed_day.label("day"),
+        literal(0).label("crawled"),
+        func.sum(success).label("analyzed"),
+        func.sum(1 - success).label("failed")
+    ).where(
+        CrawledData.is_analyzed == True,
+        CrawledData.analyzed_at.isnot(None)
+    ).group_by(analyzed_day)
+    counts = union_all(crawled, analyzed).subquery()
+    return select(
+        counts.c.day,
+        func.sum(counts.c.crawled),
+        func.sum(counts.c.analyzed),
+        func.sum(counts.c.failed)
+    ).group_by(counts.c.day)
+
+def _lock(db: Session):
+    """
+    Block writes to crawled_data and status_counters until the transaction ends, so ingest and the
+    analysis service (which update both in one transaction) cannot change them during a recount.
+    SQLite already serializes writers.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE crawled_data, status_counters IN SHARE ROW EXCLUSIVE MODE"))
+
+def rebuild_status(db: Session) -> int:
+    """
+    Recompute all counters from crawled_data in the caller's transaction (not committed).
+    Holds the table locks, then overwrites every day with one INSERT ... SELECT ... ON CONFLICT DO UPDATE;
+    returns the number of days.
+    """
+    _lock(db)
+    db.execute(update(StatusCounter).values(crawled=0, analyzed=0, failed=0))
+    stmt = _insert(db).from_select(["day", "crawled", "analyzed", "failed"], _recount())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["day"],
+        set_={
+            "crawled": stmt.excluded.crawled,
+            "analyzed": stmt.excluded.analyzed,
+            "failed": stmt.excluded.failed,
+        }
+    )
+    db.execute(stmt)
+    return db.query(func.count()).select_from(StatusCounter).scalar()
+
+def ensure_status(db: Session):
+    """
+    Build the counters from existing rows once per database, whichever service wrote counters first.
+    The applied_migrations marker is checked again under the lock so concurrent starts backfill once.
+    """
+    if db.get(AppliedMigration, STATUS_BACKFILL) is not None:
+        return
+    try:
+        _lock(db)
+        if db.get(AppliedMigration, STATUS_BACKFILL) is not None:
+            db.rollback()
+            return
+        days = rebuild_status(db)
+        db.add(AppliedMigration(name=STATUS_BACKFILL))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    logger.info(f"Built status counters for {days} days from existing articles")
+
+def read_status(db: Session) -> Dict[str, Any]:
+    """
+    Article totals from the per-day counters plus the age of the oldest pending article.
+    Reads a few hundred counter rows and one index lookup instead of counting crawled_data.
+    """
+    now = datetime.now(timezone.utc)
+    totals = db.query(
+        func.coalesce(func.sum(StatusCounter.crawled), 0),
+        func.coalesce(func.sum(StatusCounter.analyzed), 0),
+        func.coalesce(func.sum(StatusCounter.failed), 0)
+    ).one()
+    crawled, analyzed, failed = (int(value) for value in totals)
+    today = db.get(StatusCounter, now.date())
+    # Served by the partial index on unanalyzed rows created by the analysis service
+    oldest_pending = db.query(func.min(CrawledData.crawled_at)).filter(CrawledData.is_analyzed == False).scalar()
+    backlog_age = None
+    if oldest_pending is not None:
+        if oldest_pending.tzinfo is None:
+            oldest_pending = oldest_pending.replace(tzinfo=timezone.utc)
+        backlog_age = max(0.0, (now - oldest_pending).total_seconds())
+    return {
+        "total_articles_crawled": crawled,
+        "articles_crawled_today": today.crawled if today else 0,
+        "articles_analyzed": analyzed,
+        "articles_failed": failed,
+        "articles_pending": max(0, crawled - analyzed - failed),
+        "oldest_pending_crawled_at": oldest_pending,
+        "backlog_age_seconds": backlog_age,
+        "last_check": now
+    }
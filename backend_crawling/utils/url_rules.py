@@ -0,0 +1,112 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Defaults for the "url_rules" section of the "crawler" config; each website entry
+# may add its own "url_rules" with "allow" (replaces the default allow list) and
+# "deny" / "strip_params" (added to the defaults)
+DEFAULT_URL_RULES = {
+    "allow": [
+        r"/\d{4}/\d{2}/",  # Date patterns like /2023/04/
+        r"/tin-tuc/",
+        r"/bai-viet/",
+        r"/suc-khoe/",
+        r"/the-gioi/",
+        r"/kinh-doanh/",
+        r"/giai-tri/",
+        r"/the-thao/",
+        r"/phap-luat/",
+        r"/giao-duc/",
+        r"/du-lich/",
+        r"-\d{6,}\.html?$",  # Slug ending in an article id, e.g. ...-4801234.html
+    ],
+    "deny": [
+        r"/tags?/",
+        # Whole path segments only: canonical paths have no trailing slash, and article
+        # slugs may start with these words (/feedback-cua-doc-gia-...-4801234.html)
+        r"/(?:search|tim-kiem|login|register|rss|feed)(?:/|$)",
+        r"\.(?:jpe?g|png|gif|webp|svg|pdf|mp3|mp4)$",
+    ],
+    "strip_params": [
+        "utm_*", "fbclid", "gclid", "zarsrc", "gidzl", "_ga", "ref", "amp", "s_cid",
+    ],
+}
+
+# Path markers of the AMP copy of an article
+_AMP_PREFIX = re.compile(r"^/amp(?=/)")
+_AMP_SUFFIX = re.compile(r"/amp/?$")
+_AMP_EXTENSION = re.compile(r"\.amp(\.html?)$")
+
+class UrlRules:
+    """
+    Allow and deny patterns of one site, each compiled into a single regex.
+    Deny wins over allow, and a URL matching no allow pattern is not an article.
+    """
+
+    def __init__(self, allow: Iterable[str], deny: Iterable[str], strip_params: Iterable[str]):
+        self.allow = _combine(allow)
+        self.deny = _combine(deny)
+        exact = {param.lower() for param in strip_params if not param.endswith("*")}
+        prefixes = tuple(param[:-1].lower() for param in strip_params if param.endswith("*"))
+        self._strip_exact = frozenset(exact)
+        self._strip_prefixes = prefixes
+
+    def is_article(self, url: str) -> bool:
+        """Classify a canonical URL (see canonicalize)"""
+        return self._is_article_path(urlsplit(url).path)
+
+    def _is_article_path(self, path: str) -> bool:
+        if self.deny is not None and self.deny.search(path):
+            return False
+        return self.allow is not None and self.allow.search(path) is not None
+
+    def _keep_param(self, name: str) -> bool:
+        name = name.lower()
+        return name not in self._strip_exact and not name.startswith(self._strip_prefixes)
+
+    def _canonical_parts(self, url: str) -> Tuple[str, str]:
+        parts = urlsplit(url.strip())
+        path = parts.path or "/"
+        # Most homepage links are already canonical; only pay for the rewrites that apply
+        if "amp" in path:
+            path = _AMP_PREFIX.sub("", path)
+            path = _AMP_SUFFIX.sub("", path) or "/"
+            path = _AMP_EXTENSION.sub(r"\1", path)
+        if len(path) > 1 and path.endswith("/"):
+            path = path.rstrip("/") or "/"
+        query = parts.query
+        if query:
+            query = urlencode([(k, v) for k, v in parse_qsl(query, keep_blank_values=True) if self._keep_param(k)])
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, "")), path
+
+    def canonicalize(self, url: str) -> str:
+        """
+        One spelling per article: lowercase scheme and host, no fragment, no tracking
+        parameters, no AMP variant and no trailing slash (except for the root path)
+        """
+        return self._canonical_parts(url)[0]
+
+    def article_url(self, url: str) -> Optional[str]:
+        """Canonical form of the URL if it is an article, otherwise None"""
+        canonical, path = self._canonical_parts(url)
+        return canonical if self._is_article_path(path) else None
+
+def _combine(patterns: Iterable[str]) -> Optional["re.Pattern[str]"]:
+    patterns = list(patterns)
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+
+@lru_cache(maxsize=64)
+def _compile(allow: Tuple[str, ...], deny: Tuple[str, ...], strip_params: Tuple[str, ...]) -> UrlRules:
+    return UrlRules(allow, deny, strip_params)
+
+def site_rules(website: Optional[Dict[str, Any]] = None, crawler_config: Optional[Dict[str, Any]] = None) -> UrlRules:
+    """Compiled rules of one website entry, merged with the crawler-wide defaults"""
+    defaults = {**DEFAULT_URL_RULES, **((crawler_config or {}).get("url_rules") or {})}
+    own = (website or {}).get("url_rules") or {}
+    allow = own.get("allow", defaults.get("allow", []))
+    deny = [*defaults.get("deny", []), *own.get("deny", [])]
+    strip_params = [*defaults.get("strip_params", []), *own.get("strip_params", [])]
+    return _compile(tuple(allow), tuple(deny), tuple(strip_params))
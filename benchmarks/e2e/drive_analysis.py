@@ -0,0 +1,84 @@
+"""
+Chạy phía backend_analysis của benchmark (trong tiến trình riêng, cwd = backend_analysis):
+analyze_articles trên các bài đã crawl, rồi send_report_email tới SMTP sink.
+In kết quả JSON trên dòng bắt đầu bằng "RESULT ".
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+sys.path.insert(1, os.path.dirname(os.path.abspath(__file__)))
+
+from stats import histogram_stages, summarize  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", required=True)
+    parser.add_argument("--report-config", required=True)
+    parser.add_argument("--llm-url", required=True)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from services import deepseek, reporting, settings
+    settings.CONFIG_PATH = args.config
+    reporting.CONFIG_PATH = args.report_config
+    deepseek.DEEPSEEK_URL = args.llm_url
+
+    from db.database import SessionLocal, dispose_async_engine, init_db
+    from db.models import CrawledData
+    from routers.analysis import analyze_articles
+
+    async def analyze():
+        try:
+            return await analyze_articles()
+        finally:
+            # Kết nối của engine async gắn với event loop của asyncio.run
+            await dispose_async_engine()
+
+    init_db()
+    start = time.perf_counter()
+    response = asyncio.run(analyze())
+    elapsed = time.perf_counter() - start
+
+    db = SessionLocal()
+    analyzed = db.query(CrawledData.id).filter(CrawledData.analyze_success == True).count()
+    failed = db.query(CrawledData.id).filter(CrawledData.analyze_success == False).count()
+    pending = db.query(CrawledData.id).filter(CrawledData.is_analyzed == False).count()
+    db.close()
+
+    report_times = []
+    rows = sum(1 for _ in reporting.iter_report_data("day"))
+    for _ in range(args.repeat):
+        start_report = time.perf_counter()
+        reporting.send_report_email("day")
+        report_times.append(time.perf_counter() - start_report)
+
+    result = {
+        "calls": {
+            "analyze_articles": summarize([elapsed]),
+            "send_report_email": summarize(report_times),
+        },
+        "stages": histogram_stages("analysis_stage_seconds"),
+        "llm_result": histogram_stages("analysis_llm_result_seconds", "event"),
+        "counts": {
+            "analyzed": analyzed,
+            "failed": failed,
+            "pending": pending,
+            "report_rows": rows,
+        },
+        "throughput": {
+            "analyze_articles_per_second": (analyzed + failed) / elapsed if elapsed else None,
+            "report_rows_per_second": rows / summarize(report_times)["p50"] if report_times and rows else None,
+        },
+        "detail": response.get("detail"),
+    }
+    print("RESULT " + json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
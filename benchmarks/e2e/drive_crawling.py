@@ -0,0 +1,74 @@
+"""
+Chạy phía backend_crawling của benchmark (trong tiến trình riêng, cwd = backend_crawling):
+crawl_website cho từng báo, rồi một lượt scheduled_crawling (crawl + ghi DB + lấy nội dung),
+tất cả dùng chung một Crawler (client HTTP) như app.
+In kết quả JSON trên dòng bắt đầu bằng "RESULT ".
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+sys.path.insert(1, os.path.dirname(os.path.abspath(__file__)))
+
+from stats import histogram_stages, summarize  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", required=True)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from utils import crawler
+    crawler.CONFIG_PATH = args.config
+
+    import main as app_main
+    from db.database import CrawledData, SessionLocal, init_db
+
+    init_db()
+    websites = [website for website in crawler.load_config()["websites"] if website.get("active", True)]
+
+    async def run():
+        crawl_times = []
+        discovered = 0
+        async with crawler.Crawler(crawler.load_config().get("crawler", {})) as shared:
+            for _ in range(args.repeat):
+                for website in websites:
+                    start = time.perf_counter()
+                    discovered = len(await crawler.crawl_website(shared, website["base_url"]))
+                    crawl_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            await app_main.scheduled_crawling(shared)
+            return crawl_times, discovered, time.perf_counter() - start
+
+    db = SessionLocal()
+    before = db.query(CrawledData.id).count()
+    crawl_times, discovered, elapsed = asyncio.run(run())
+    inserted = db.query(CrawledData.id).count() - before
+    with_contents = db.query(CrawledData.id).filter(CrawledData.contents.isnot(None)).count()
+    db.close()
+
+    result = {
+        "calls": {
+            "crawl_website": summarize(crawl_times),
+            "scheduled_crawling": summarize([elapsed]),
+        },
+        "stages": histogram_stages("crawler_stage_seconds"),
+        "counts": {
+            "urls_per_site": discovered,
+            "inserted": inserted,
+            "with_contents": with_contents,
+        },
+        "throughput": {
+            "ingest_articles_per_second": inserted / elapsed if elapsed else None,
+        },
+    }
+    print("RESULT " + json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
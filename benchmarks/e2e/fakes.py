@@ -0,0 +1,284 @@
+"""
+Các server giả lập chạy local cho benchmark end-to-end:
+  - NewsSite: trang chủ và bài báo tổng hợp của một báo (Dân Trí, VnExpress, VietnamNet),
+  - FakeDeepSeek: endpoint chat/completions (cả stream SSE) với độ trễ, tốc độ sinh token, tỉ lệ lỗi 429
+    và giới hạn đồng thời cấu hình được,
+  - SmtpSink: SMTP server nhận và bỏ email báo cáo (hỗ trợ AUTH để login() thành công).
+Mỗi server chạy trong thread riêng, xử lý mỗi kết nối bằng một thread.
+"""
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMOTIONS = ["Tích cực", "Tiêu cực", "Trung lập", "Hài hước", "Phẫn nộ", "Bất ngờ", "Buồn bã"]
+
+SITES = [
+    ("Dan Tri", "dantri"),
+    ("VnExpress", "vnexpress"),
+    ("VietnamNet", "vietnamnet"),
+]
+
+SECTIONS = ["tin-tuc", "kinh-doanh", "the-thao", "giai-tri", "suc-khoe", "phap-luat"]
+
+WORDS = [
+    "người", "dân", "chính", "phủ", "kinh", "tế", "thị", "trường", "giá", "vàng", "tăng", "giảm",
+    "học", "sinh", "bóng", "đá", "đội", "tuyển", "thời", "tiết", "mưa", "bão", "tai", "nạn",
+    "giao", "thông", "bệnh", "viện", "bác", "sĩ", "công", "an", "điều", "tra", "doanh", "nghiệp",
+]
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _start(server) -> threading.Thread:
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+class NewsSite:
+    """Một báo giả: trang chủ liệt kê `articles` bài, mỗi bài có vài đoạn văn riêng."""
+
+    def __init__(self, slug: str, articles: int, latency_ms: float = 0, paragraphs: int = 6, seed: int = 0):
+        self.slug = slug
+        self.articles = articles
+        self.latency = latency_ms / 1000
+        self.paragraphs = paragraphs
+        self.seed = seed
+        self.requests = 0
+        site = self
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                site.requests += 1
+                if site.latency:
+                    time.sleep(site.latency)
+                status, body = site.render(self.path)
+                self._send(status, body.encode("utf-8"), "text/html; charset=utf-8")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def article_path(self, index: int) -> str:
+        return f"/{SECTIONS[index % len(SECTIONS)]}/{self.slug}-bai-viet-so-{index}.html"
+
+    def render(self, path: str):
+        if path == "/":
+            links = "\n".join(f'<li><a href="{self.article_path(i)}">Bài {i}</a></li>' for i in range(self.articles))
+            return 200, f'<html><body><nav><a href="/tag/nong/">Nóng</a></nav><ul>{links}</ul></body></html>'
+        match = re.search(r"-bai-viet-so-(\d+)\.html$", path)
+        if not match or int(match.group(1)) >= self.articles:
+            return 404, "<html><body>Not found</body></html>"
+        index = int(match.group(1))
+        rng = random.Random(f"{self.seed}:{self.slug}:{index}")
+        paragraphs = "".join(
+            f"<p>{' '.join(rng.choices(WORDS, k=rng.randint(20, 60)))}.</p>" for _ in range(self.paragraphs)
+        )
+        return 200, (
+            f"<html><head><title>{self.slug} {index}</title></head><body>"
+            f"<article><h1>Bài viết số {index} của {self.slug}</h1>{paragraphs}</article></body></html>"
+        )
+
+    def start(self):
+        _start(self.server)
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeDeepSeek:
+    """
+    Endpoint /chat/completions giả: token đầu tiên sau `latency_ms`, mỗi token tiếp theo sau
+    `token_ms`; trả 429 với xác suất `rate_429`, và trả 429 kèm Retry-After khi đang xử lý quá
+    `max_concurrency` yêu cầu (0 = không giới hạn). Hỗ trợ yêu cầu một bài (text, có thể stream SSE)
+    và yêu cầu gộp (response_format json_object). Câu trả lời một bài dài dòng như model thật:
+    nhãn, hai câu nhận xét rồi thêm một đoạn giải thích, nên stream có thể dừng sớm.
+    """
+
+    def __init__(self, latency_ms: float = 200, rate_429: float = 0.0, seed: int = 0, max_concurrency: int = 0, token_ms: float = 0):
+        self.latency = latency_ms / 1000
+        self.token_delay = token_ms / 1000
+        self.rate_429 = rate_429
+        self.max_concurrency = max_concurrency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.inflight = 0
+        self.completion_tokens = 0  # số token đã thực sự gửi đi (stream bị đóng sớm thì ít hơn)
+        api = self
+
+        class Handler(_QuietHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with api.lock:
+                    over_limit = api.max_concurrency and api.inflight >= api.max_concurrency
+                    if over_limit:
+                        api.requests += 1
+                        api.throttled += 1
+                    else:
+                        api.inflight += 1
+                if over_limit:
+                    body = {"error": {"message": "Too many concurrent requests", "type": "rate_limit_error"}}
+                    self._send(429, json.dumps(body).encode("utf-8"), "application/json", {"Retry-After": "1"})
+                    return
+                try:
+                    status, body = api.respond(payload)
+                    if api.latency:
+                        time.sleep(api.latency)
+                    if status == 200 and payload.get("stream"):
+                        self._stream(payload, body)
+                        return
+                    tokens = body.get("usage", {}).get("completion_tokens", 0)
+                    if api.token_delay and tokens:
+                        time.sleep(api.token_delay * tokens)
+                    with api.lock:
+                        api.completion_tokens += tokens
+                finally:
+                    with api.lock:
+                        api.inflight -= 1
+                self._send(status, json.dumps(body, ensure_ascii=False).encode("utf-8"), "application/json")
+
+            def _chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self, payload: dict, body: dict):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                content = body["choices"][0]["message"]["content"]
+                try:
+                    for token in re.findall(r"\s*\S+", content):
+                        if api.token_delay:
+                            time.sleep(api.token_delay)
+                        event = {"choices": [{"index": 0, "delta": {"content": token}}]}
+                        self._chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                        with api.lock:
+                            api.completion_tokens += 1
+                    if (payload.get("stream_options") or {}).get("include_usage"):
+                        self._chunk(f"data: {json.dumps({'choices': [], 'usage': body['usage']})}\n\n".encode("utf-8"))
+                    self._chunk(b"data: [DONE]\n\n")
+                    self._chunk(b"")
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client đã đóng stream khi có đủ kết quả: model thật cũng dừng sinh token
+                    self.close_connection = True
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/chat/completions"
+
+    def respond(self, payload: dict):
+        with self.lock:
+            self.requests += 1
+            if self.random.random() < self.rate_429:
+                self.throttled += 1
+                return 429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}
+            rng = random.Random(self.random.random())
+        messages = payload.get("messages") or [{}]
+        prompt = "".join(m.get("content", "") for m in messages)
+        if (payload.get("response_format") or {}).get("type") == "json_object":
+            ids = [int(i) for i in re.findall(r"^### Bài (\d+)$", messages[-1].get("content", ""), re.M)]
+            content = json.dumps({"results": [
+                {"id": i, "emotion": rng.choice(EMOTIONS), "summary": "Bài báo phản ánh diễn biến trong ngày."}
+                for i in ids
+            ]}, ensure_ascii=False)
+        else:
+            explanation = " ".join(" ".join(rng.choices(WORDS, k=rng.randint(10, 18))).capitalize() + "." for _ in range(rng.randint(3, 6)))
+            content = (
+                f"Cảm xúc chủ đạo: **{rng.choice(EMOTIONS)}**\n\n"
+                "Nhận xét: Bài báo phản ánh diễn biến đáng chú ý trong ngày. Nội dung cho thấy tác động rõ rệt tới đời sống người dân.\n\n"
+                f"Giải thích: {explanation}"
+            )
+            tokens = re.findall(r"\s*\S+", content)
+            if len(tokens) > payload.get("max_tokens", len(tokens)):
+                content = "".join(tokens[:payload["max_tokens"]])
+        return 200, {
+            "id": "bench",
+            "object": "chat.completion",
+            "model": payload.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 3 + 1, "completion_tokens": len(re.findall(r"\s*\S+", content))},
+        }
+
+    def start(self):
+        _start(self.server)
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SmtpSink:
+    """SMTP server tối giản: chấp nhận mọi lệnh, đếm số email và dung lượng nhận được."""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.lock = threading.Lock()
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line: str):
+                self.wfile.write((line + "\r\n").encode("ascii"))
+
+            def handle(self):
+                self.reply("220 localhost benchmark sink")
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode("utf-8", "replace").strip().upper()
+                    if command.startswith(("EHLO", "HELO")):
+                        self.wfile.write(b"250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+                    elif command.startswith("AUTH"):
+                        self.reply("235 Authentication successful")
+                    elif command == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        size = 0
+                        for data_line in self.rfile:
+                            if data_line in (b".\r\n", b".\n"):
+                                break
+                            size += len(data_line)
+                        with sink.lock:
+                            sink.messages += 1
+                            sink.bytes += size
+                        self.reply("250 OK queued")
+                    elif command == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("250 OK")
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.port = self.server.server_address[1]
+
+    def start(self):
+        _start(self.server)
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,190 @@
+"""
+Benchmark end-to-end crawl -> ghi DB -> phân tích -> báo cáo, không cần mạng hay API trả phí.
+
+Khởi động các server giả lập (3 báo, DeepSeek chat/completions, SMTP sink), tạo config và DB
+tạm (SQLite, hoặc Postgres qua --database-url), rồi chạy từng service trong tiến trình riêng
+(hai service đều có package `db` nên không import chung được):
+  - backend_crawling: crawl_website, scheduled_crawling
+  - backend_analysis: analyze_articles, send_report_email
+In bài/giây và p50/p99 của từng giai đoạn, lưu kết quả JSON vào --output-dir và so với lần chạy
+trước để phát hiện suy giảm hiệu năng. Chạy từ thư mục gốc repo:
+
+    python benchmarks/e2e/run.py --articles-per-site 200 --llm-latency-ms 200 --llm-429-rate 0.05
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from fakes import SITES, FakeDeepSeek, NewsSite, SmtpSink
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+CRAWLING_DIR = os.path.join(ROOT, "backend_crawling")
+ANALYSIS_DIR = os.path.join(ROOT, "backend_analysis")
+SHARED_CONFIG = os.path.join(ROOT, "config", "websites.json")
+
+def write_configs(workdir: str, sites, llm: FakeDeepSeek, smtp: SmtpSink):
+    with open(SHARED_CONFIG, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    config["websites"] = [{"name": name, "base_url": site.url, "active": True} for (name, _), site in zip(SITES, sites)]
+    # Không giới hạn tốc độ với server local, để đo chính phần xử lý
+    config.setdefault("crawler", {})["per_host_delay_seconds"] = 0
+    config.setdefault("capture_content", {})["enabled"] = True
+    websites_path = os.path.join(workdir, "websites.json")
+    with open(websites_path, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+    report_path = os.path.join(workdir, "report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "admin_emails": ["bench@example.com"],
+            "smtp": {"host": "127.0.0.1", "port": smtp.port, "user": "bench", "password": "bench", "use_tls": False},
+        }, f)
+    return websites_path, report_path
+
+
+def run_driver(script: str, cwd: str, env: dict, *args: str) -> dict:
+    command = [sys.executable, os.path.join(HERE, script), *args]
+    completed = subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True)
+    for line in completed.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    sys.stderr.write(completed.stdout[-4000:])
+    sys.stderr.write(completed.stderr[-4000:])
+    raise RuntimeError(f"{script} thất bại (exit code {completed.returncode})")
+
+
+def flatten(result: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in result.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(current: dict, previous: dict, threshold: float):
+    """Trả về danh sách (chỉ số, trước, sau) bị suy giảm quá `threshold`."""
+    now, before = flatten(current["results"]), flatten(previous["results"])
+    regressions = []
+    for name, value in now.items():
+        old = before.get(name)
+        if not old:
+            continue
+        change = (value - old) / old
+        if "throughput." in name:
+            worse = change < -threshold
+        elif name.endswith((".p50", ".p99")):
+            worse = change > threshold
+        else:
+            continue
+        if worse:
+            regressions.append((name, old, value))
+    return regressions
+
+
+def print_report(results: dict):
+    print(f"\n{'giai đoạn':<44}{'số lần':>8}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    for service in ("crawling", "analysis"):
+        for kind in ("calls", "stages", "llm_result"):
+            for stage, data in sorted(results[service].get(kind, {}).items()):
+                p50 = "-" if data["p50"] is None else f"{data['p50'] * 1000:.1f}"
+                p99 = "-" if data["p99"] is None else f"{data['p99'] * 1000:.1f}"
+                print(f"{service + '.' + kind + '.' + stage:<44}{data['count']:>8}{p50:>12}{p99:>12}")
+    print()
+    for service in ("crawling", "analysis"):
+        for name, value in results[service]["throughput"].items():
+            if value is not None:
+                print(f"{service}.{name:<40}{value:>10.1f}")
+        print(f"{service}.counts: {results[service]['counts']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles-per-site", type=int, default=200)
+    parser.add_argument("--site-latency-ms", type=float, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--llm-token-ms", type=float, default=0, help="thời gian sinh mỗi token đầu ra sau token đầu tiên")
+    parser.add_argument("--llm-429-rate", type=float, default=0.0)
+    parser.add_argument("--llm-max-concurrency", type=int, default=0, help="số yêu cầu LLM đồng thời tối đa, vượt thì trả 429 (0 = không giới hạn)")
+    parser.add_argument("--repeat", type=int, default=3, help="số lần gọi crawl_website/send_report_email để lấy p50/p99")
+    parser.add_argument("--database-url", default=None, help="mặc định: file SQLite tạm; với Postgres nên dùng DB trống")
+    parser.add_argument("--output-dir", default=os.path.join(HERE, "results"))
+    parser.add_argument("--threshold", type=float, default=0.2, help="mức thay đổi coi là suy giảm (0.2 = 20%%)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    sites = [NewsSite(slug, args.articles_per_site, args.site_latency_ms).start() for _, slug in SITES]
+    llm = FakeDeepSeek(args.llm_latency_ms, args.llm_429_rate, max_concurrency=args.llm_max_concurrency, token_ms=args.llm_token_ms).start()
+    smtp = SmtpSink().start()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            websites_path, report_path = write_configs(workdir, sites, llm, smtp)
+            env = dict(os.environ)
+            env["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+            env["DEEPSEEK_API"] = "bench"
+
+            started = time.perf_counter()
+            crawling = run_driver("drive_crawling.py", CRAWLING_DIR, env,
+                                  "--config", websites_path, "--repeat", str(args.repeat))
+            analysis = run_driver("drive_analysis.py", ANALYSIS_DIR, env,
+                                  "--config", websites_path, "--report-config", report_path,
+                                  "--llm-url", llm.url, "--repeat", str(args.repeat))
+            total = time.perf_counter() - started
+    finally:
+        for server in (*sites, llm, smtp):
+            server.stop()
+
+    articles = crawling["counts"]["inserted"]
+    results = {
+        "crawling": crawling,
+        "analysis": analysis,
+        "throughput": {"end_to_end_articles_per_second": articles / total if total else None},
+        "servers": {
+            "news_requests": sum(site.requests for site in sites),
+            "llm_requests": llm.requests,
+            "llm_throttled": llm.throttled,
+            "llm_completion_tokens": llm.completion_tokens,
+            "emails": smtp.messages,
+        },
+    }
+    print_report(results)
+    print(f"end_to_end: {articles} bài trong {total:.1f}s ({results['throughput']['end_to_end_articles_per_second']:.1f} bài/giây)")
+    print(f"servers: {results['servers']}")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    previous_files = sorted(glob.glob(os.path.join(args.output_dir, "e2e-*.json")))
+    record = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "params": vars(args),
+        "results": results,
+    }
+    output = os.path.join(args.output_dir, f"e2e-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False, indent=2)
+    print(f"\nĐã lưu kết quả: {output}")
+
+    if previous_files:
+        with open(previous_files[-1], "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        if {k: v for k, v in previous["params"].items() if k != "output_dir"} != {k: v for k, v in record["params"].items() if k != "output_dir"}:
+            print(f"Bỏ qua so sánh với {os.path.basename(previous_files[-1])}: tham số khác nhau.")
+            return
+        regressions = compare(record, previous, args.threshold)
+        print(f"So với {os.path.basename(previous_files[-1])}: {len(regressions)} chỉ số suy giảm quá {args.threshold:.0%}.")
+        for name, old, new in regressions:
+            print(f"  {name}: {old:.4f} -> {new:.4f}")
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
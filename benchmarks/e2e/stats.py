@@ -0,0 +1,67 @@
+"""Tính p50/p99 từ danh sách thời gian đo trực tiếp hoặc từ histogram Prometheus của service."""
+import math
+from typing import Dict, List, Optional
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, math.ceil(q * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 0.5),
+        "p99": percentile(values, 0.99),
+        "mean": sum(values) / len(values) if values else None,
+    }
+
+
+def _bucket_quantile(buckets: List[tuple], count: float, q: float) -> Optional[float]:
+    """Nội suy tuyến tính trong bucket chứa quantile, giống histogram_quantile của Prometheus."""
+    if not count:
+        return None
+    target = q * count
+    previous_bound, previous_count = 0.0, 0.0
+    for bound, cumulative in buckets:
+        if cumulative >= target:
+            if math.isinf(bound):
+                return previous_bound
+            in_bucket = cumulative - previous_count
+            fraction = (target - previous_count) / in_bucket if in_bucket else 0
+            return previous_bound + (bound - previous_bound) * fraction
+        previous_bound, previous_count = bound, cumulative
+    return previous_bound
+
+
+def histogram_stages(metric_name: str, label: str = "stage") -> Dict[str, Dict[str, float]]:
+    """Đọc histogram `metric_name{<label>=...}` trong registry mặc định, trả về thống kê theo giá trị label."""
+    from prometheus_client import REGISTRY
+
+    stages: Dict[str, Dict[str, list]] = {}
+    for metric in REGISTRY.collect():
+        if metric.name != metric_name:
+            continue
+        for sample in metric.samples:
+            stage = sample.labels.get(label)
+            data = stages.setdefault(stage, {"buckets": [], "count": 0.0, "sum": 0.0})
+            if sample.name.endswith("_bucket"):
+                data["buckets"].append((float(sample.labels["le"]), sample.value))
+            elif sample.name.endswith("_count"):
+                data["count"] = sample.value
+            elif sample.name.endswith("_sum"):
+                data["sum"] = sample.value
+    result = {}
+    for stage, data in stages.items():
+        buckets = sorted(data["buckets"])
+        count = data["count"]
+        result[stage] = {
+            "count": int(count),
+            "p50": _bucket_quantile(buckets, count, 0.5),
+            "p99": _bucket_quantile(buckets, count, 0.99),
+            "mean": data["sum"] / count if count else None,
+        }
+    return result